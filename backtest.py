@@ -0,0 +1,191 @@
+from dataclasses import dataclass, field
+from decimal import Decimal
+from uuid import uuid4
+from agent import Agent
+from generics import Asset, Order, OrderSide, OrderType, OrderStatus
+from market import Market
+from tickfile import iter_tick_chunks, DEFAULT_CHUNK_SIZE
+import math
+import time
+
+class ExternalLiquidity :
+    """
+    Stand-in for the rest of the market : quotes one bid and one ask around every recorded
+    price so behaviors have something to trade against. Previous quotes are pulled first.
+
+    Quotes go through Market.place, past the funds checks, so the liquidity agent needs no
+    cash or inventory; its balances go negative as it takes the other side.
+    """
+
+    def __init__(self, agent : Agent, half_spread : Decimal = Decimal("0.01"), size : Decimal = Decimal(100)) -> None:
+        self.agent = agent
+        self.half_spread = half_spread
+        self.size = size
+
+    def requote(self, market : Market, asset : Asset, price : Decimal) -> None :
+        market.cancel_all(self.agent, asset)
+
+        bid = self._quote(asset, OrderSide.Buy, max(price - self.half_spread, Decimal("0.01")))
+        ask = self._quote(asset, OrderSide.Sell, price + self.half_spread)
+        market.place(asset, bid)
+        market.place(asset, ask)
+
+    def _quote(self, asset : Asset, side : OrderSide, price : Decimal) -> Order :
+        return Order(
+            id=str(uuid4()),
+            asset=asset,
+            agent=self.agent,
+            quantity=self.size,
+            offer=price,
+            side=side,
+            type=OrderType.Limit,
+            status=OrderStatus.WAITING
+        )
+
+
+@dataclass
+class BehaviorStats :
+    agents : int = 0
+    mean_pnl : float = 0.0
+    min_pnl : float = 0.0
+    max_pnl : float = 0.0
+
+@dataclass
+class BacktestStats :
+    ticks : int = 0
+    trades : dict[str, int] = field(default_factory=dict)
+    volume : dict[str, float] = field(default_factory=dict)
+    notional : dict[str, float] = field(default_factory=dict)
+    vwap : dict[str, float] = field(default_factory=dict) # symbols that traded
+    first_price : dict[str, float] = field(default_factory=dict)
+    last_price : dict[str, float] = field(default_factory=dict)
+    volatility : dict[str, float] = field(default_factory=dict) # std of tick log returns
+    pnl_by_behavior : dict[str, BehaviorStats] = field(default_factory=dict)
+    elapsed : float = 0.0
+
+
+class Backtest :
+    """
+    Replays recorded prices into a Market and lets the agents' behaviors trade against them.
+
+    Every tick sets the matching `Asset.price`, requotes the optional external liquidity and
+    asks each agent for a decision on that asset (every `decide_every` ticks of it). Trades
+    are folded into running statistics and cleared from `market.history` once per chunk so a
+    multi-day file runs in bounded memory.
+    """
+
+    def __init__(self, market : Market, agents : list[Agent], symbols : dict[str, Asset],
+                 liquidity : ExternalLiquidity | None = None, decide_every : int = 1) -> None:
+        self.market = market
+        self.agents = agents
+        self.symbols = symbols
+        self.liquidity = liquidity
+        self.decide_every = decide_every
+
+    def _equity(self, agent : Agent) -> Decimal :
+        equity = agent.cash
+        for asset in self.symbols.values() :
+            equity += agent.portfolio.get(asset.id, Decimal(0)) * asset.price
+        return equity
+
+    def run(self, path : str, chunk_size : int = DEFAULT_CHUNK_SIZE) -> BacktestStats :
+        stats = BacktestStats()
+        market = self.market
+        history = market.history
+        buy = market.buy
+        sell = market.sell
+        liquidity = self.liquidity
+        signals = market.signals
+        decide_every = self.decide_every
+        agents = [(agent, agent.behavior.decide) for agent in self.agents if agent.behavior is not None]
+        symbols = self.symbols
+        symbol_of = {asset.id : symbol for symbol, asset in symbols.items()}
+
+        # running sums of tick log returns per symbol : count, sum, sum of squares
+        returns = {symbol : [0, 0.0, 0.0] for symbol in symbols}
+        seen = {symbol : 0 for symbol in symbols}
+        last = {}
+        initial_equity = None
+        volume = {symbol : 0.0 for symbol in symbols}
+        notional = {symbol : 0.0 for symbol in symbols}
+        trades = {symbol : 0 for symbol in symbols}
+        started = time.perf_counter()
+
+        for chunk in iter_tick_chunks(path, chunk_size) :
+            for tick in chunk :
+                asset = symbols.get(tick.symbol)
+                if asset is None :
+                    continue
+
+                price = tick.price
+                stats.ticks += 1
+                previous = last.get(tick.symbol)
+                if previous is None :
+                    stats.first_price[tick.symbol] = float(price)
+                elif previous > 0 and price > 0 :
+                    r = math.log(float(price / previous))
+                    acc = returns[tick.symbol]
+                    acc[0] += 1
+                    acc[1] += r
+                    acc[2] += r * r
+                last[tick.symbol] = price
+                asset.price = price
+
+                if liquidity is not None :
+                    liquidity.requote(market, asset, price)
+
+                seen[tick.symbol] += 1
+                if seen[tick.symbol] % decide_every :
+                    continue
+
+                if initial_equity is None :
+                    # symbols that haven't ticked yet are marked at their starting price
+                    initial_equity = [self._equity(agent) for agent, _ in agents]
+
+                for agent, decide in agents :
+                    order = decide(agent, asset, signals)
+                    if order is None :
+                        continue
+                    if order.side == OrderSide.Buy :
+                        buy(asset, agent, order)
+                    else :
+                        sell(asset, agent, order)
+
+                # every decision round is a step of this asset for the shared signals
+                if signals is not None :
+                    signals.sample(asset.id)
+
+            for trade in history :
+                symbol = symbol_of.get(trade.trade_asset.id)
+                if symbol is None :
+                    continue
+                volume[symbol] += float(trade.quantity)
+                notional[symbol] += float(trade.amount_exchanged)
+                trades[symbol] += 1
+            history.clear()
+
+        stats.elapsed = time.perf_counter() - started
+        stats.trades = trades
+        stats.volume = volume
+        stats.notional = notional
+        stats.vwap = {symbol : notional[symbol] / volume[symbol] for symbol in symbols if volume[symbol]}
+        stats.last_price = {symbol : float(price) for symbol, price in last.items()}
+
+        for symbol, (n, total, total_sq) in returns.items() :
+            if n > 1 :
+                mean = total / n
+                stats.volatility[symbol] = math.sqrt(max(0.0, total_sq / n - mean * mean))
+
+        if initial_equity is not None :
+            for (agent, _), start in zip(agents, initial_equity) :
+                pnl = float(self._equity(agent) - start)
+                name = agent.behavior.__class__.__name__
+                group = stats.pnl_by_behavior.get(name)
+                if group is None :
+                    group = stats.pnl_by_behavior[name] = BehaviorStats(min_pnl=pnl, max_pnl=pnl)
+                group.agents += 1
+                group.mean_pnl += (pnl - group.mean_pnl) / group.agents
+                group.min_pnl = min(group.min_pnl, pnl)
+                group.max_pnl = max(group.max_pnl, pnl)
+
+        return stats
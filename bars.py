@@ -0,0 +1,179 @@
+# OHLCV and VWAP bars built from the trade stream as it is settled, O(1) per trade. Every series
+# keeps its bars in fixed size numpy ring buffers, the oldest bars are overwritten once full.
+#
+# A bar closes on one of three clocks :
+#   STEP    every `size` simulation steps, driven by BarAggregator.step()
+#   TRADES  every `size` trades
+#   TIME    every `size` seconds of the aggregator clock, bars are aligned to multiples of size
+from dataclasses import dataclass
+from typing import Callable
+from uuid import UUID
+import numpy as np
+import time
+
+STEP = "step"
+TRADES = "trades"
+TIME = "time"
+
+FIELDS = ("start", "open", "high", "low", "close", "volume", "notional", "trades")
+
+@dataclass(frozen=True)
+class Resolution :
+    kind : str
+    size : float = 1
+
+    def __post_init__(self) :
+        if self.kind not in (STEP, TRADES, TIME) :
+            raise ValueError(f"Unknown bar resolution {self.kind}")
+        if self.size <= 0 :
+            raise ValueError(f"Bar size must be positive, got {self.size}")
+
+
+class BarSeries :
+
+    """
+    BarSeries aggregates one asset's trades into bars of one resolution.
+
+    `start` of a bar is the step index, the index of its first trade or its bucket start time.
+    Bars without trades have nan prices and zero volume.
+
+    Public Methods:
+        - add(price, quantity): Fold a trade into the current bar, opening a new one first if due.
+        - step(): Count a simulation step, only STEP series act on it.
+        - last(field): Field of the current (newest) bar.
+        - as_arrays(): Chronological copies of every field plus vwap, for charting and export.
+    """
+
+    def __init__(self, resolution : Resolution, capacity : int = 1024, clock : Callable[[], float] = time.time, start : float = 0) -> None :
+        self.resolution = resolution
+        self.capacity = capacity
+        self.clock = clock
+        self._columns = {name : np.zeros(capacity) for name in FIELDS}
+        self._head = -1 # slot of the current bar
+        self._count = 0
+        self._steps = 0 # steps in the current STEP bar
+        self._total_trades = 0
+        if resolution.kind == TIME :
+            start = self._bucket(clock())
+        elif resolution.kind == TRADES :
+            start = 0
+        self._open_bar(start)
+
+    def _bucket(self, now : float) -> float :
+        size = self.resolution.size
+        return (now // size) * size
+
+    def _open_bar(self, start : float) -> None :
+        head = (self._head + 1) % self.capacity
+        columns = self._columns
+        columns["start"][head] = start
+        for name in ("open", "high", "low", "close") :
+            columns[name][head] = np.nan
+        for name in ("volume", "notional", "trades") :
+            columns[name][head] = 0
+        self._head = head
+        self._count = min(self._count + 1, self.capacity)
+
+    def add(self, price : float, quantity : float) -> None :
+        columns = self._columns
+        kind = self.resolution.kind
+        head = self._head
+
+        if kind == TRADES :
+            if columns["trades"][head] >= self.resolution.size :
+                self._open_bar(self._total_trades)
+                head = self._head
+        elif kind == TIME :
+            bucket = self._bucket(self.clock())
+            if bucket != columns["start"][head] :
+                self._open_bar(bucket)
+                head = self._head
+
+        if columns["trades"][head] == 0 :
+            columns["open"][head] = price
+            columns["high"][head] = price
+            columns["low"][head] = price
+        else :
+            if price > columns["high"][head] :
+                columns["high"][head] = price
+            if price < columns["low"][head] :
+                columns["low"][head] = price
+        columns["close"][head] = price
+        columns["volume"][head] += quantity
+        columns["notional"][head] += price * quantity
+        columns["trades"][head] += 1
+        self._total_trades += 1
+
+    def step(self) -> None :
+        if self.resolution.kind != STEP :
+            return
+        self._steps += 1
+        if self._steps >= self.resolution.size :
+            self._steps = 0
+            self._open_bar(self._columns["start"][self._head] + self.resolution.size)
+
+    def last(self, field : str) -> float :
+        if field == "vwap" :
+            volume = self._columns["volume"][self._head]
+            return self._columns["notional"][self._head] / volume if volume else np.nan
+        return float(self._columns[field][self._head])
+
+    def __len__(self) -> int :
+        return self._count
+
+    def as_arrays(self) -> dict[str, np.ndarray] :
+        # oldest bar first, the last entry is the current bar
+        order = np.arange(self._head - self._count + 1, self._head + 1) % self.capacity
+        arrays = {name : column[order] for name, column in self._columns.items()}
+        volume = arrays["volume"]
+        with np.errstate(invalid="ignore", divide="ignore") :
+            arrays["vwap"] = np.where(volume > 0, arrays["notional"] / volume, np.nan)
+        return arrays
+
+
+class BarAggregator :
+
+    """
+    BarAggregator keeps a BarSeries per asset and named resolution.
+
+    Public Methods:
+        - add(asset_id, price, quantity): Fold a settled trade into every series of the asset.
+        - step(): Advance the STEP series of every asset.
+        - series(asset_id, name): The series of an asset at a named resolution.
+    """
+
+    def __init__(self, resolutions : dict[str, Resolution], capacity : int = 1024, clock : Callable[[], float] = time.time) -> None :
+        self.resolutions = resolutions
+        self.capacity = capacity
+        self.clock = clock
+        self.steps = 0
+        self._series : dict[UUID, dict[str, BarSeries]] = {}
+
+    def _series_of(self, asset_id : UUID) -> dict[str, BarSeries] :
+        series = self._series.get(asset_id)
+        if series is None :
+            # STEP bars of a late asset line up with the others
+            series = {}
+            for name, resolution in self.resolutions.items() :
+                start = self.steps - self.steps % resolution.size if resolution.kind == STEP else 0
+                series[name] = BarSeries(resolution, self.capacity, self.clock, start)
+                if resolution.kind == STEP :
+                    series[name]._steps = int(self.steps % resolution.size)
+            series = self._series.setdefault(asset_id, series)
+        return series
+
+    def add(self, asset_id : UUID, price : float, quantity : float) -> None :
+        for series in self._series_of(asset_id).values() :
+            series.add(price, quantity)
+
+    def step(self) -> None :
+        self.steps += 1
+        for series in self._series.values() :
+            for bars in series.values() :
+                bars.step()
+
+    def series(self, asset_id : UUID, name : str) -> BarSeries :
+        return self._series_of(asset_id)[name]
+
+
+__all__ = ["Resolution", "BarSeries", "BarAggregator", "STEP", "TRADES", "TIME", "FIELDS"]
@@ -1,17 +1,20 @@
 from abc import ABC, abstractmethod
+from collections import deque
 from decimal import Decimal
 from uuid import uuid4
 from generics import Order, OrderSide, OrderType, OrderStatus
-from collections import deque
 import random
 
 class Behavior(ABC):
+    # signals : the market's shared SignalCache, None when the market has none attached
+    momentum_window = 0 # longest SignalCache.momentum window decide() asks for, checked on attach
+
     @abstractmethod
-    def decide(self, agent, asset):
+    def decide(self, agent, asset, signals=None):
         pass
 
 class RandomTrader(Behavior):
-    def decide(self, agent, asset):
+    def decide(self, agent, asset, signals=None):
         if random.random() < 0.7:
             return None
 
@@ -38,8 +41,10 @@ class MarketMaker(Behavior):
         self.spread = spread
         self.size = size
 
-    def decide(self, agent, asset):
-        mid = asset.price
+    def decide(self, agent, asset, signals=None):
+        mid = signals.mid(asset.id) if signals is not None else None
+        if mid is None:
+            mid = asset.price
         buy_price = mid - self.spread / 2
         sell_price = mid + self.spread / 2
 
@@ -57,19 +62,30 @@ class MarketMaker(Behavior):
             status=OrderStatus.WAITING
         )
 
-class MomentumTrader:
+class MomentumTrader(Behavior):
     def __init__(self, memory=5, threshold=Decimal(1)):
-        self.prices = deque(maxlen=memory)
+        self.memory = memory
         self.threshold = threshold
+        self._prices = {} # asset id -> recent prices, only used without a SignalCache
 
-    def decide(self, agent, asset):
-        self.prices.append(asset.price)
-        if len(self.prices) < 2:
-            return None
-
-        momentum = self.prices[-1] - self.prices[0]
+    @property
+    def momentum_window(self):
+        return self.memory
 
-        if abs(momentum) < self.threshold:
+    def decide(self, agent, asset, signals=None):
+        # momentum is the current price minus the price `memory - 1` steps ago, None until that
+        # many steps have passed; with a SignalCache a step is a Market.end_step() call,
+        # standalone it is a decide() call
+        if signals is not None:
+            momentum = signals.momentum(asset.id, self.memory)
+        else:
+            # standalone : remember the prices this trader has been asked about
+            prices = self._prices.get(asset.id)
+            if prices is None:
+                prices = self._prices[asset.id] = deque(maxlen=self.memory)
+            prices.append(asset.price)
+            momentum = prices[-1] - prices[0] if self.memory >= 2 and len(prices) == self.memory else None
+        if momentum is None or abs(momentum) < self.threshold:
             return None
 
         side = OrderSide.Buy if momentum > 0 else OrderSide.Sell
@@ -0,0 +1,50 @@
+# Replays a synthetic tick file through FileDataFeed at full speed while a consumer polls
+# run from the repository root : python -m benchmarks.bench_datafeed
+from decimal import Decimal
+from generics import Tick
+from datafeed import FileDataFeed
+from tickfile import write_ticks
+import os
+import random
+import tempfile
+import time
+
+NUM_SYMBOLS = 50
+NUM_TICKS = 500_000
+
+def make_tick_file(path : str, num_ticks : int, num_symbols : int) -> list[str] :
+    symbols = [f"SYM{i}" for i in range(num_symbols)]
+    prices = {symbol : 100.0 for symbol in symbols}
+
+    def ticks() :
+        for i in range(num_ticks) :
+            symbol = random.choice(symbols)
+            prices[symbol] = max(0.01, prices[symbol] + random.uniform(-0.05, 0.05))
+            yield Tick(symbol=symbol, price=Decimal(f"{prices[symbol]:.2f}"), timestamp=i * 0.001)
+
+    write_ticks(path, ticks())
+    return symbols
+
+def main() :
+    random.seed(0)
+    with tempfile.TemporaryDirectory() as tmp :
+        path = os.path.join(tmp, "ticks.csv")
+        symbols = make_tick_file(path, NUM_TICKS, NUM_SYMBOLS)
+
+        feed = FileDataFeed(path, symbols, capacity=NUM_SYMBOLS)
+        delivered = 0
+        polls = 0
+        start = time.perf_counter()
+        feed.start()
+        while not feed.finished :
+            delivered += len(feed.poll())
+            polls += 1
+        delivered += len(feed.poll())
+        elapsed = time.perf_counter() - start
+
+    buffer = feed.buffer
+    print(f"replayed {buffer.received} ticks in {elapsed:.2f}s ({buffer.received / elapsed:,.0f} ticks/s)")
+    print(f"delivered {delivered} coalesced ticks over {polls} polls, dropped {buffer.dropped}")
+
+if __name__ == "__main__" :
+    main()
@@ -0,0 +1,52 @@
+# Linked-list PriceLevel against ArrayPriceLevel on crowded levels : many small resting
+# orders, some canceled at random, then market orders walking the queues. Run with and without
+# cancels : mid-queue tombstones are what the array queue pays for on every walk
+# run from the repository root : python -m benchmarks.bench_levels
+from decimal import Decimal
+from uuid import uuid4
+from agent import Agent
+from generics import Asset, Order, OrderSide, OrderType, PriceLevel, ArrayPriceLevel
+from orderbook import OrderBook
+import random
+import time
+
+LEVELS = 20
+ORDERS_PER_LEVEL = 5_000
+CANCEL_RATIOS = (0.0, 0.3)
+
+def run(level_type : type, cancel_ratio : float) -> tuple[float, float, float] :
+    random.seed(0)
+    asset = Asset(type="stock", id=uuid4(), price=Decimal(100), quantity=Decimal(0))
+    agent = Agent(Decimal(0), {})
+    book = OrderBook(asset_type="stock", level_type=level_type)
+
+    ids = []
+    start = time.perf_counter()
+    for level in range(LEVELS) :
+        price = Decimal(101 + level)
+        for _ in range(ORDERS_PER_LEVEL) :
+            order = Order(OrderType.Limit, OrderSide.Sell, price, asset, Decimal(1), str(uuid4()), agent)
+            book.insert(order)
+            ids.append(order.id)
+    inserted = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for order_id in random.sample(ids, int(len(ids) * cancel_ratio)) :
+        book.cancel(order_id)
+    canceled = time.perf_counter() - start
+
+    start = time.perf_counter()
+    while book.get_best_ask() is not None :
+        book.match(Order(OrderType.Market, OrderSide.Buy, Decimal(0), asset, Decimal(500), str(uuid4()), agent))
+    matched = time.perf_counter() - start
+    return inserted, canceled, matched
+
+def main() :
+    for cancel_ratio in CANCEL_RATIOS :
+        print(f"{LEVELS} levels x {ORDERS_PER_LEVEL} orders, {cancel_ratio:.0%} canceled")
+        for level_type in (PriceLevel, ArrayPriceLevel) :
+            inserted, canceled, matched = run(level_type, cancel_ratio)
+            print(f"{level_type.__name__:>16} insert {inserted:.3f}s  cancel {canceled:.3f}s  match {matched:.3f}s")
+
+if __name__ == "__main__" :
+    main()
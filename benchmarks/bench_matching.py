@@ -0,0 +1,56 @@
+# FIFO against pro-rata matching on deep, crowded levels : many resting orders per level, then
+# market orders that each take a slice of the best level
+# run from the repository root : python -m benchmarks.bench_matching
+from decimal import Decimal
+from uuid import uuid4
+from agent import Agent
+from generics import Asset, Order, OrderSide, OrderType
+from matching import FifoPolicy, ProRataPolicy
+from orderbook import OrderBook
+import random
+import time
+
+LEVELS = 5
+ORDERS_PER_LEVEL = 5_000
+TAKERS = 200
+TAKE = Decimal(2_000)
+ALLOCATIONS = 50
+
+def build(policy) -> tuple[OrderBook, Asset, Agent] :
+    random.seed(0)
+    asset = Asset(type="stock", id=uuid4(), price=Decimal(100), quantity=Decimal(0))
+    agent = Agent(Decimal(0), {})
+    book = OrderBook(asset_type="stock", policy=policy)
+    for level in range(LEVELS) :
+        price = Decimal(101 + level)
+        for _ in range(ORDERS_PER_LEVEL) :
+            book.insert(Order(OrderType.Limit, OrderSide.Sell, price, asset, Decimal(random.randint(1, 100)), str(uuid4()), agent))
+    return book, asset, agent
+
+def allocate_only(policy) -> float :
+    # time to split one slice of the best level, nothing is booked
+    book, _, _ = build(policy)
+    level = book.get_best_ask()
+    start = time.perf_counter()
+    for _ in range(ALLOCATIONS) :
+        policy.allocate(level, TAKE)
+    return (time.perf_counter() - start) / ALLOCATIONS
+
+def run(policy) -> tuple[float, int] :
+    book, asset, agent = build(policy)
+    trades = 0
+    start = time.perf_counter()
+    for _ in range(TAKERS) :
+        trades += len(book.match(Order(OrderType.Market, OrderSide.Buy, Decimal(0), asset, TAKE, str(uuid4()), agent)))
+    return time.perf_counter() - start, trades
+
+def main() :
+    print(f"{LEVELS} levels x {ORDERS_PER_LEVEL} orders, market orders of {TAKE}")
+    for policy in (FifoPolicy(), ProRataPolicy()) :
+        print(f"{type(policy).__name__:>18} allocate one level {allocate_only(policy) * 1e3:.2f}ms")
+    for policy in (FifoPolicy(), ProRataPolicy()) :
+        elapsed, trades = run(policy)
+        print(f"{type(policy).__name__:>18} {TAKERS} market orders {elapsed:.3f}s  {trades} trades")
+
+if __name__ == "__main__" :
+    main()
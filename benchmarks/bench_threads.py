@@ -0,0 +1,65 @@
+# Market.submit_batch throughput against the number of worker threads : many assets,
+# each with its own book, and a fixed pre-generated order flow spread across them
+# the speedup only shows on a free-threaded build (python3.13t and later) where
+# sys._is_gil_enabled() is False, with the GIL the threads just take turns
+# run from the repository root : python -m benchmarks.bench_threads
+from decimal import Decimal
+from uuid import uuid4
+from agent import Agent
+from generics import Asset, Order, OrderSide, OrderType
+from market import Market
+import random
+import sys
+import time
+
+ASSETS = 32
+AGENTS = 256
+ORDERS = 40_000
+BATCH = 2_000
+THREADS = (1, 2, 4, 8)
+
+def build(threads : int) -> tuple[Market, list[Order]] :
+    random.seed(0)
+    assets = {}
+    for _ in range(ASSETS) :
+        asset = Asset(type="stock", id=uuid4(), price=Decimal(100), quantity=Decimal(0))
+        assets[asset.id] = asset
+    asset_list = list(assets.values())
+
+    agents = {}
+    for _ in range(AGENTS) :
+        portfolio = {asset_id : Decimal(1_000_000) for asset_id in assets}
+        agents[uuid4()] = Agent(Decimal(1_000_000_000), portfolio)
+    agent_list = list(agents.values())
+
+    market = Market(agents, assets, thread_safe=threads > 1, max_workers=threads)
+
+    orders = []
+    for _ in range(ORDERS) :
+        side = random.choice((OrderSide.Buy, OrderSide.Sell))
+        order_type = OrderType.Market if random.random() < 0.2 else OrderType.Limit
+        offer = Decimal(random.randint(95, 105))
+        orders.append(Order(order_type, side, offer, random.choice(asset_list), Decimal(random.randint(1, 10)),
+                            str(uuid4()), random.choice(agent_list)))
+    return market, orders
+
+def run(threads : int) -> float :
+    market, orders = build(threads)
+    start = time.perf_counter()
+    for i in range(0, len(orders), BATCH) :
+        market.submit_batch(orders[i:i + BATCH])
+    elapsed = time.perf_counter() - start
+    market.close()
+    return elapsed
+
+def main() :
+    gil = sys._is_gil_enabled() if hasattr(sys, "_is_gil_enabled") else True
+    print(f"python {sys.version.split()[0]}  gil {'on' if gil else 'off'}")
+    baseline = None
+    for threads in THREADS :
+        elapsed = run(threads)
+        baseline = baseline or elapsed
+        print(f"{threads:>2} threads  {ORDERS / elapsed:>9.0f} orders/s  speedup {baseline / elapsed:.2f}x")
+
+if __name__ == "__main__" :
+    main()
@@ -0,0 +1 @@
+# keeps the repository root importable for the tests under tests/, the modules are not a package
@@ -1,35 +1,155 @@
-# THIS IS THE SERVER WITH SIMULATED DELAY TIMES  
-from dotenv import load_dotenv
-from generics.asset import Asset
-from yfrlt import Client
-import time 
-import yfinance as yf 
-
-class DataFeed : 
-    def __init__(self, symbols_track : list[str]) -> None:
+# THIS IS THE SERVER WITH SIMULATED DELAY TIMES
+from abc import ABC, abstractmethod
+from decimal import Decimal
+from datastructures import TickBuffer
+from generics import Tick
+from tickfile import read_ticks
+import threading
+import time
+
+class BaseDataFeed(ABC) :
+    """
+    Price source that pushes ticks into a TickBuffer from its own thread.
+
+    The simulation reads with poll() (newest tick per symbol that changed since the last
+    poll) or get_current_price(), neither of which blocks on the source.
+    """
+
+    def __init__(self, symbols_track : list[str], capacity : int = 1024) -> None:
+        self.symbols = list(symbols_track)
+        self.buffer = TickBuffer(capacity)
+
+    def on_price_update(self, data) :
+        self.buffer.push(Tick(symbol=data.symbol, price=Decimal(str(data.price)), timestamp=time.time()))
+
+    def poll(self, limit : int | None = None) -> list[Tick] :
+        return self.buffer.drain(limit)
+
+    def get_current_price(self, symbol : str) -> Decimal | None :
+        # None until the symbol's first tick arrives
+        tick = self.buffer.latest(symbol)
+        return tick.price if tick is not None else None
+
+    @abstractmethod
+    def start(self) -> None :
+        pass
+
+    @abstractmethod
+    def stop(self) -> None :
+        pass
+
+    @abstractmethod
+    def add_symbol(self, symbol : str) -> None :
+        pass
+
+
+class DataFeed(BaseDataFeed) :
+    def __init__(self, symbols_track : list[str], capacity : int = 1024) -> None:
+        super().__init__(symbols_track, capacity)
+        from yfrlt import Client
+
         self.client = Client()
-        self.track : dict[str, Asset] = {} 
-        for symbol in symbols_track :
-            print(symbol)
-            self.client.subscribe([symbol], self.on_price_update)
-            self.track[symbol] = self.get_snapshot_price(symbol)
-        print(self.track)
+        self._snapshots : dict[str, Decimal] = {}
+        self._seeders : list[threading.Thread] = []
+        self.client.subscribe(self.symbols, self.on_price_update)
+        self.start()
+
+    def start(self) -> None :
         self.client.start()
+        self._seed_snapshots(self.symbols)
+
+    def stop(self) -> None :
+        self.client.stop()
+
+    def _seed_snapshots(self, symbols : list[str]) -> None :
+        # snapshot lookups are blocking http calls, keep them off the caller's thread
+        def seed() :
+            for symbol in symbols :
+                if self.buffer.latest(symbol) is None :
+                    self._snapshots[symbol] = self.get_snapshot_price(symbol)
 
-    def get_snapshot_price(self, symbol : str ) : 
-        t =  yf.Ticker(symbol) 
+        thread = threading.Thread(target=seed, daemon=True)
+        self._seeders.append(thread)
+        thread.start()
+
+    def wait_ready(self, timeout : float | None = None) -> bool :
+        # blocks until the snapshot lookups are done, True once every symbol has a price
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for thread in list(self._seeders) :
+            thread.join(None if deadline is None else max(deadline - time.monotonic(), 0))
+        return all(self.get_current_price(symbol) is not None for symbol in self.symbols)
+
+    def get_snapshot_price(self, symbol : str ) -> Decimal :
+        import yfinance as yf
+
+        t =  yf.Ticker(symbol)
         price = t.fast_info['last_price']
-        return price 
+        return Decimal(str(price))
+
+    def get_current_price(self, symbol : str) -> Decimal | None :
+        # falls back on the snapshot lookup until the first tick, see wait_ready()
+        price = super().get_current_price(symbol)
+        return price if price is not None else self._snapshots.get(symbol)
+
+    def add_symbol(self, symbol : str) :
+        self.symbols.append(symbol)
+        self.client.subscribe([symbol], self.on_price_update)
+        self._seed_snapshots([symbol])
+
+
+class FileDataFeed(BaseDataFeed) :
+    """
+    Offline stand-in for DataFeed that replays a recorded tick file (see tickfile.py).
+
+    `speed` scales the recorded inter-tick gaps, `speed=None` replays as fast as the
+    buffer accepts ticks. Ticks for symbols that are not tracked are skipped.
+    """
+
+    def __init__(self, path : str, symbols_track : list[str], capacity : int = 1024, speed : float | None = None) -> None:
+        super().__init__(symbols_track, capacity)
+        self.path = path
+        self.speed = speed
+        self._tracked = set(self.symbols)
+        self._stop = threading.Event()
+        self._thread : threading.Thread | None = None
+
+    def start(self) -> None :
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._replay, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None :
+        self._stop.set()
+        self.join()
+
+    def join(self, timeout : float | None = None) -> None :
+        if self._thread is not None :
+            self._thread.join(timeout)
+
+    @property
+    def finished(self) -> bool :
+        return self._thread is not None and not self._thread.is_alive()
+
+    def add_symbol(self, symbol : str) -> None :
+        self.symbols.append(symbol)
+        self._tracked = self._tracked | {symbol}
 
-    def on_price_update(self, data):
-        self.track[data.symbol] = data.price 
-        print(data.symbol, data.price, data.change_percent)
-        print(self.track)
+    def _replay(self) -> None :
+        push = self.buffer.push
+        first_recorded = None
+        started = time.perf_counter()
 
-    def get_current_price(self, symbol : str) : 
-        return self.track[symbol]
+        for tick in read_ticks(self.path) :
+            if self._stop.is_set() :
+                return
+            if tick.symbol not in self._tracked :
+                continue
 
-    def add_symbol(self, symbol : str) : 
-        self.client.subscribe(symbol)
-        self.track[symbol] = self.get_snapshot_price(symbol)
+            if self.speed is not None :
+                if first_recorded is None :
+                    first_recorded = tick.timestamp
+                delay = (tick.timestamp - first_recorded) / self.speed - (time.perf_counter() - started)
+                if delay > 0 :
+                    time.sleep(delay)
 
+            push(tick)
@@ -1,3 +1,6 @@
 from .avltree import AVLTree
+from .tickbuffer import TickBuffer
+from .triggerindex import TriggerIndex
+from .fenwick import SparseFenwickTree, DepthIndex
 
-__all__ = ["AVLTree"]
+__all__ = ["AVLTree", "TickBuffer", "TriggerIndex", "SparseFenwickTree", "DepthIndex"]
@@ -1,5 +1,6 @@
-from generics import TreeNode
+from generics import TreeNode, PriceLevel
 from decimal import Decimal
+from typing import Iterator
 
 class AVLTree:
 
@@ -8,170 +9,371 @@ class AVLTree:
 
     Public Methods:
         - insert(node): Insert a TreeNode into the AVL tree.
+        - delete(price): Remove the level at price, returns False when there is none.
         - search(price): Search for a PriceLevel by price using binary search.
+        - min_level() / max_level(): Lowest and highest priced PriceLevel, None when empty.
+        - from_sorted(levels): Build a perfectly balanced tree from ascending PriceLevels in O(n).
+        - ascending(start): Lazily yield the PriceLevels priced at or above `start` (all by
+          default), lowest first.
+        - descending(start): Lazily yield the PriceLevels priced at or below `start` (all by
+          default), highest first.
+        - __iter__() / __reversed__(): ascending() / descending() over every level.
+        - add_quantity(price, delta): Adjust the resting quantity of an existing level.
+        - quantity_up_to(price): Total quantity of the levels priced at or below `price`.
+        - quantity_from(price): Total quantity of the levels priced at or above `price`.
+        - total_quantity(): Total quantity across all levels.
+        - total_notional(): Total quantity * price across all levels.
+        - fill_cost(quantity, descending): (notional, level) of taking `quantity` from the
+          lowest priced levels up (highest down when descending), the level being the one where
+          it is reached, None when the tree holds less than `quantity`.
+
+    Every node carries the summed quantity and notional of its subtree, which is what lets
+    the quantity queries run in O(log n). Callers must report level quantity changes via
+    add_quantity.
+
+    Nodes link to their parent, so insert, delete and rebalancing walk back up without
+    recursion and the ordered generators step to the next level in O(1) amortized. A level
+    keeps its node for as long as it is in the tree.
 
     Internal Methods:
-        _insert(node, root): Recursive helper for insertion with rebalancing.
-        _balance_tree(root): Rebalances the subtree rooted at the given node.
+        _find(price): Node holding the level at price.
+        _rebalance_from(node): Updates and rebalances every node from node up to the root.
+        _balance(node): Rebalances the subtree rooted at the given node.
         _rotate_left(node): Performs a left rotation around the given node.
         _rotate_right(node): Performs a right rotation around the given node.
+        _replace_child(parent, old, new): Points parent (or the root) at new instead of old.
         _get_balance(node): Computes the balance factor of a node.
         _get_height(node): Returns the height of a node.
-        _search(price, root): Recursive binary search by price.
- 
+        _update(node): Recomputes the height and subtree sums of a node from its children.
+
     """
 
     def __init__(self, root : TreeNode | None = None ) -> None:
-        self.root = root 
-    
-    def delete(self, node : TreeNode) : 
-        self.root = self._delete(node, self.root) 
-
-    def _delete(self, node : TreeNode, root : TreeNode | None ) :
-
-        if root is None : 
-            return root  
-
-        if node.value < root.value : 
-            root.left = self._delete(node, root.left)
-
-        elif node.value > root.value : 
-            root.right = self._delete(node, root.right)
-
-        else : 
-            if root.left is None : 
-                return root.right 
-            elif root.right is None :
-                return root.left 
-
-            pred = self._greatest_child(root.left)
-            root.value = pred.value 
-            root.left = self._delete(pred, root.left)
-
-        return self._balance_tree(root)
-       
-    def _greatest_child(self, start : TreeNode) : 
-
-        if start.left is None and start.right is None : 
-            return start 
-        
-        if start.right: 
-            return self._greatest_child(start.right) 
-        
-        return start 
-
-    def insert(self, node : TreeNode) : 
-        self.root = self._insert(node, self.root)
-
-    def _insert(self, node : TreeNode, root : TreeNode | None): 
-        if root is None:
-            node.height = 0 # ensure height is zero 
+        self.root = root
+
+    @classmethod
+    def from_sorted(cls, levels : list[PriceLevel]) -> "AVLTree" :
+        # the middle level of every slice becomes the subtree root, heights differ by at most one
+        def build(lo : int, hi : int, parent : TreeNode | None) -> TreeNode | None :
+            if lo > hi :
+                return None
+            mid = (lo + hi) // 2
+            node = TreeNode(value=levels[mid], parent=parent)
+            node.left = build(lo, mid - 1, node)
+            node.right = build(mid + 1, hi, node)
+            cls._update(node)
             return node
-        
-        if node.value <= root.value : 
-            root.left = self._insert(node, root.left)
-        else : 
-            root.right = self._insert(node, root.right)
-
-        left_height = self._get_height(root.left) 
-        right_height = self._get_height(root.right)     
-        root.height = 1 + max(left_height, right_height)
 
-        # once added 
-        # check my balance factor 
+        return cls(build(0, len(levels) - 1, None))
 
-        balance_factor = self._get_balance(root) 
-        if abs(balance_factor) > 1 : 
-            # This guarntees that there are two other node below the root and we can balance 
-            root = self._balance_tree(root)
+    @staticmethod
+    def _leftmost(node : TreeNode | None) -> TreeNode | None :
+        if node :
+            while node.left :
+                node = node.left
+        return node
 
-        return root
+    @staticmethod
+    def _rightmost(node : TreeNode | None) -> TreeNode | None :
+        if node :
+            while node.right :
+                node = node.right
+        return node
 
-    def _get_balance(self, node : TreeNode | None ) : 
-        if node is None : 
-            return -1 
+    @staticmethod
+    def _successor(node : TreeNode) -> TreeNode | None :
+        if node.right :
+            return AVLTree._leftmost(node.right)
+        while node.parent and node is node.parent.right :
+            node = node.parent
+        return node.parent
+
+    @staticmethod
+    def _predecessor(node : TreeNode) -> TreeNode | None :
+        if node.left :
+            return AVLTree._rightmost(node.left)
+        while node.parent and node is node.parent.left :
+            node = node.parent
+        return node.parent
+
+    def _ceiling(self, price : Decimal) -> TreeNode | None :
+        # lowest node priced at or above price
+        found = None
+        node = self.root
+        while node :
+            if node.value.price >= price :
+                found = node
+                node = node.left
+            else :
+                node = node.right
+        return found
+
+    def _floor(self, price : Decimal) -> TreeNode | None :
+        # highest node priced at or below price
+        found = None
+        node = self.root
+        while node :
+            if node.value.price <= price :
+                found = node
+                node = node.right
+            else :
+                node = node.left
+        return found
+
+    def ascending(self, start : Decimal | None = None) -> Iterator[PriceLevel] :
+        # the next node is only looked up once the caller asks for it
+        node = self._leftmost(self.root) if start is None else self._ceiling(start)
+        while node :
+            yield node.value
+            node = self._successor(node)
+
+    def descending(self, start : Decimal | None = None) -> Iterator[PriceLevel] :
+        node = self._rightmost(self.root) if start is None else self._floor(start)
+        while node :
+            yield node.value
+            node = self._predecessor(node)
+
+    def __iter__(self) -> Iterator[PriceLevel] :
+        return self.ascending()
+
+    def __reversed__(self) -> Iterator[PriceLevel] :
+        return self.descending()
+
+    def min_level(self) -> PriceLevel | None :
+        node = self._leftmost(self.root)
+        return node.value if node else None
+
+    def max_level(self) -> PriceLevel | None :
+        node = self._rightmost(self.root)
+        return node.value if node else None
+
+    @staticmethod
+    def _update(node : TreeNode) -> None :
+        left = node.left
+        right = node.right
+        node.height = 1 + max(left.height if left else -1, right.height if right else -1)
+        level = node.value
+        quantity = level.quantity
+        notional = quantity * level.price
+        if left :
+            quantity += left.subtree_quantity
+            notional += left.subtree_notional
+        if right :
+            quantity += right.subtree_quantity
+            notional += right.subtree_notional
+        node.subtree_quantity = quantity
+        node.subtree_notional = notional
+
+    def add_quantity(self, price : Decimal, delta : Decimal) -> None :
+        # the level itself is updated by the caller, only the subtree sums on its path change here
+        notional = delta * price
+        node = self.root
+        while node :
+            node.subtree_quantity += delta
+            node.subtree_notional += notional
+            if price == node.value.price :
+                return
+            node = node.left if price < node.value.price else node.right
+        raise KeyError(f"No price level at {price}")
+
+    def total_quantity(self) -> Decimal :
+        return self.root.subtree_quantity if self.root else Decimal(0)
+
+    def total_notional(self) -> Decimal :
+        return self.root.subtree_notional if self.root else Decimal(0)
+
+    def fill_cost(self, quantity : Decimal, descending : bool = False) -> tuple[Decimal, PriceLevel] | None :
+        # whole subtrees on the near side are taken by their sums, one root to leaf walk
+        if quantity <= 0 or self.total_quantity() < quantity :
+            return None
+        notional = Decimal(0)
+        node = self.root
+        while node :
+            near, far = (node.right, node.left) if descending else (node.left, node.right)
+            if near is not None :
+                if near.subtree_quantity >= quantity :
+                    node = near
+                    continue
+                quantity -= near.subtree_quantity
+                notional += near.subtree_notional
+
+            level = node.value
+            if level.quantity >= quantity :
+                return notional + quantity * level.price, level
+            quantity -= level.quantity
+            notional += level.quantity * level.price
+            node = far
+        raise RuntimeError("Subtree quantities don't add up to the total")
+
+    def quantity_up_to(self, price : Decimal) -> Decimal :
+        total = Decimal(0)
+        node = self.root
+        while node :
+            if node.value.price <= price :
+                total += node.value.quantity
+                if node.left :
+                    total += node.left.subtree_quantity
+                node = node.right
+            else :
+                node = node.left
+        return total
+
+    def quantity_from(self, price : Decimal) -> Decimal :
+        total = Decimal(0)
+        node = self.root
+        while node :
+            if node.value.price >= price :
+                total += node.value.quantity
+                if node.right :
+                    total += node.right.subtree_quantity
+                node = node.left
+            else :
+                node = node.right
+        return total
+
+    def insert(self, node : TreeNode) -> None :
+        node.left = node.right = node.parent = None
+        self._update(node) # height zero, subtree quantity is the level's own
+        if self.root is None :
+            self.root = node
+            return
+
+        price = node.value.price
+        parent = self.root
+        while True :
+            if price <= parent.value.price :
+                if parent.left is None :
+                    parent.left = node
+                    break
+                parent = parent.left
+            else :
+                if parent.right is None :
+                    parent.right = node
+                    break
+                parent = parent.right
+
+        node.parent = parent
+        self._rebalance_from(parent)
+
+    def delete(self, price : Decimal) -> bool :
+        node = self._find(price)
+        if node is None :
+            return False
+
+        if node.left is None or node.right is None :
+            child = node.left or node.right
+            if child :
+                child.parent = node.parent
+            self._replace_child(node.parent, node, child)
+            start = node.parent
+        else :
+            # the in-order predecessor takes the node's place
+            pred = self._rightmost(node.left)
+            if pred.parent is node :
+                start = pred
+            else :
+                start = pred.parent
+                start.right = pred.left
+                if pred.left :
+                    pred.left.parent = start
+                pred.left = node.left
+                node.left.parent = pred
+            pred.right = node.right
+            node.right.parent = pred
+            pred.parent = node.parent
+            self._replace_child(node.parent, node, pred)
+
+        node.left = node.right = node.parent = None
+        self._rebalance_from(start)
+        return True
+
+    def _rebalance_from(self, node : TreeNode | None) -> None :
+        # every ancestor's height and subtree quantity may have changed, walk all the way up
+        while node :
+            self._update(node)
+            node = self._balance(node).parent
+
+    def _get_balance(self, node : TreeNode | None ) :
+        if node is None :
+            return -1
 
         left_height = self._get_height(node.left)
         right_height = self._get_height(node.right)
 
-        return left_height - right_height 
-
-    def _balance_tree(self, root : TreeNode | None) : 
-        if root : 
-            
-            balance = self._get_balance(root)
+        return left_height - right_height
 
-            if balance > 1 :
-                # Left Heavy tree  
-                if self._get_balance(root.left) < 0 :
-                    root.left = self._rotate_left(root.left)
+    def _balance(self, root : TreeNode) -> TreeNode :
+        balance = self._get_balance(root)
 
-                return self._rotate_right(root)
+        if balance > 1 :
+            # Left Heavy tree
+            if self._get_balance(root.left) < 0 :
+                self._rotate_left(root.left)
+            return self._rotate_right(root)
 
-            if balance < -1 : 
-                # Right heavy tree 
-                if self._get_balance(root.right) > 0 : 
-                    root.right = self._rotate_right(root.right)
+        if balance < -1 :
+            # Right heavy tree
+            if self._get_balance(root.right) > 0 :
+                self._rotate_right(root.right)
+            return self._rotate_left(root)
 
-                return self._rotate_left(root)
-
-        return root 
+        return root
 
-    
     def _get_height(self, node: TreeNode | None) -> int:
         return node.height if node else -1
 
-
-    def _rotate_left(self, node : TreeNode | None) :
-        if node :  
-
-            right_node = node.right 
-            if not right_node : 
-                return node 
-
-            subtree = right_node.left 
-
-            right_node.left = node
-            node.right = subtree
-
-            node.height = 1 + max(self._get_height(node.left), self._get_height(node.right)) 
-            right_node.height = 1 + max( self._get_height(right_node.left), self._get_height(right_node.right))
-
-            return right_node
-
-        return node 
-            
-    
-    def _rotate_right(self, node : TreeNode | None) : 
-        if node : 
-            left_node = node.left 
-            if not left_node : 
-                return node 
-
-            subtree = left_node.right 
-
-            left_node.right = node 
-            node.left = subtree
-
-            node.height = 1 + max(self._get_height(node.left), self._get_height(node.right)) 
-            left_node.height = 1 + max(self._get_height(left_node.left), self._get_height(left_node.right)) 
-
-            return left_node
-        
-        return node
-
-    def search(self, price : Decimal) : 
-        return self._search(price, self.root)
-
-    def _search(self, price : Decimal, root : TreeNode | None ) : 
-        if root is None : 
-            return None 
-        if root.value.price == price :
-            return root.value 
-        
-        if price <= root.value.price : 
-            return self._search(price, root.left)
-        return self._search(price, root.right)
+    def _replace_child(self, parent : TreeNode | None, old : TreeNode, new : TreeNode | None) -> None :
+        if parent is None :
+            self.root = new
+        elif parent.left is old :
+            parent.left = new
+        else :
+            parent.right = new
+
+    def _rotate_left(self, node : TreeNode) -> TreeNode :
+        right_node = node.right
+        subtree = right_node.left
+
+        node.right = subtree
+        if subtree :
+            subtree.parent = node
+        right_node.parent = node.parent
+        self._replace_child(node.parent, node, right_node)
+        right_node.left = node
+        node.parent = right_node
+
+        self._update(node)
+        self._update(right_node)
+        return right_node
+
+    def _rotate_right(self, node : TreeNode) -> TreeNode :
+        left_node = node.left
+        subtree = left_node.right
+
+        node.left = subtree
+        if subtree :
+            subtree.parent = node
+        left_node.parent = node.parent
+        self._replace_child(node.parent, node, left_node)
+        left_node.right = node
+        node.parent = left_node
+
+        self._update(node)
+        self._update(left_node)
+        return left_node
+
+    def _find(self, price : Decimal) -> TreeNode | None :
+        node = self.root
+        while node :
+            node_price = node.value.price
+            if price == node_price :
+                return node
+            node = node.left if price < node_price else node.right
+        return None
+
+    def search(self, price : Decimal) -> PriceLevel | None :
+        node = self._find(price)
+        return node.value if node else None
 
 
 __all__ = ["AVLTree"]
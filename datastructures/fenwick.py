@@ -0,0 +1,182 @@
+from decimal import Decimal, ROUND_FLOOR
+
+class SparseFenwickTree:
+
+    """
+    FenwickTree over slots 0..2**bits-1 that only stores the nodes covering non-zero slots,
+    so the slot range can be far larger than the number of slots in use.
+
+    Public Methods:
+        - add(i, delta): Add delta to slot i in O(bits).
+        - prefix(i): Sum of slots 0..i in O(bits).
+        - search(target): Smallest slot whose prefix sum reaches target in O(bits),
+          valid while every slot is non-negative.
+        - total(): Sum of every slot.
+
+    Nodes whose sum falls back to zero are dropped, which with non-negative slots means
+    every slot they cover is empty : memory is O(bits) per non-zero slot.
+    """
+
+    def __init__(self, bits : int = 40) -> None:
+        self.bits = bits
+        self.size = 1 << bits
+        self._tree : dict[int, Decimal] = {}
+        self._total = Decimal(0)
+
+    def add(self, i : int, delta : Decimal) -> None :
+        if not 0 <= i < self.size :
+            raise IndexError(f"Slot {i} is outside 0..{self.size - 1}")
+        tree = self._tree
+        size = self.size
+        i += 1
+        while i <= size :
+            value = tree.get(i, 0) + delta
+            if value :
+                tree[i] = value
+            else :
+                tree.pop(i, None)
+            i += i & -i
+        self._total += delta
+
+    def prefix(self, i : int) -> Decimal :
+        tree = self._tree
+        total = Decimal(0)
+        i = min(i + 1, self.size)
+        while i > 0 :
+            total += tree.get(i, 0)
+            i -= i & -i
+        return total
+
+    def total(self) -> Decimal :
+        return self._total
+
+    def search(self, target : Decimal) -> int :
+        # returns `size` when the total is below target
+        if self._total < target :
+            return self.size
+        tree = self._tree
+        position = 0
+        step = self.size >> 1
+        while step :
+            value = tree.get(position + step, 0)
+            if value < target :
+                position += step
+                target -= value
+            step >>= 1
+        return position
+
+
+class DepthIndex:
+
+    """
+    DepthIndex keeps the resting quantity and notional of one side of a book per price tick
+    in two SparseFenwickTrees indexed by tick, ordered from the best price outwards
+    (ascending for asks, descending for bids), so cumulative depth, the cost of taking a
+    size and the price at which cumulative depth reaches a size are all O(bits).
+
+    The trees are centred on the first tick seen and span 2**bits ticks, starting small and
+    doubling their span whenever a price lands outside it, so bits follows the log of the
+    price range actually used. Only nodes over ticks with resting quantity are stored.
+
+    Prices are bucketed by `tick_size` onto the tick at or below them, on both sides.
+    Quantities and notionals stay exact, but a query at price p covers the whole bucket of
+    p : depth_to is exact for prices on the tick grid and may count off-grid orders up to
+    one tick worse than p.
+
+    Public Methods:
+        - add(price, quantity): Record a resting quantity change at price.
+        - depth_to(price): Quantity at prices at or better than price, by bucket.
+        - cost_to_fill(quantity): (quantity available up to `quantity`, notional paid for it).
+        - price_at_depth(quantity): Average price of the tick where cumulative depth reaches quantity.
+        - total(): Total resting quantity.
+    """
+
+    def __init__(self, tick_size : Decimal = Decimal("0.01"), descending : bool = False, bits : int = 12) -> None:
+        self.tick_size = tick_size
+        self.descending = descending
+        self._origin : int | None = None # key of the middle slot
+        self._ticks : dict[int, list[Decimal]] = {} # key -> [quantity, notional], live ticks only
+        self._quantity_tree = SparseFenwickTree(bits)
+        self._notional_tree = SparseFenwickTree(bits)
+
+    def _key(self, price : Decimal) -> int :
+        ticks = int((price / self.tick_size).to_integral_value(rounding=ROUND_FLOOR))
+        return -ticks if self.descending else ticks
+
+    def _slot(self, key : int) -> int :
+        # may fall outside 0..size-1, add() grows the trees before using it
+        return key - self._origin + (self._quantity_tree.size >> 1)
+
+    def _grow(self, key : int) -> None :
+        # widens the span until key fits and reinserts the live ticks, O(ticks * bits)
+        bits = self._quantity_tree.bits
+        offset = key - self._origin
+        while not -(1 << (bits - 1)) <= offset < (1 << (bits - 1)) :
+            bits += 1
+        self._quantity_tree = SparseFenwickTree(bits)
+        self._notional_tree = SparseFenwickTree(bits)
+        for tick_key, (quantity, notional) in self._ticks.items() :
+            slot = self._slot(tick_key)
+            self._quantity_tree.add(slot, quantity)
+            self._notional_tree.add(slot, notional)
+
+    def add(self, price : Decimal, quantity : Decimal) -> None :
+        key = self._key(price)
+        if self._origin is None :
+            self._origin = key
+        slot = self._slot(key)
+        if not 0 <= slot < self._quantity_tree.size :
+            self._grow(key)
+            slot = self._slot(key)
+
+        notional = quantity * price
+        self._quantity_tree.add(slot, quantity)
+        self._notional_tree.add(slot, notional)
+
+        tick = self._ticks.get(key)
+        if tick is None :
+            self._ticks[key] = [quantity, notional]
+        elif tick[0] + quantity :
+            tick[0] += quantity
+            tick[1] += notional
+        else :
+            del self._ticks[key]
+
+    def total(self) -> Decimal :
+        return self._quantity_tree.total()
+
+    def depth_to(self, price : Decimal) -> Decimal :
+        if self._origin is None :
+            return Decimal(0)
+        slot = self._slot(self._key(price))
+        if slot < 0 :
+            return Decimal(0)
+        return self._quantity_tree.prefix(slot)
+
+    def _tick_at(self, slot : int) -> list[Decimal] :
+        return self._ticks[slot - (self._quantity_tree.size >> 1) + self._origin]
+
+    def cost_to_fill(self, quantity : Decimal) -> tuple[Decimal, Decimal] :
+        if quantity <= 0 or not self._ticks :
+            return Decimal(0), Decimal(0)
+
+        tree = self._quantity_tree
+        if tree.total() < quantity :
+            return tree.total(), self._notional_tree.total()
+
+        slot = tree.search(quantity)
+        before = tree.prefix(slot - 1)
+        notional = self._notional_tree.prefix(slot - 1)
+        # the last tick is only partly taken, at its average price
+        tick_quantity, tick_notional = self._tick_at(slot)
+        notional += (quantity - before) * tick_notional / tick_quantity
+        return quantity, notional
+
+    def price_at_depth(self, quantity : Decimal) -> Decimal | None :
+        if quantity <= 0 or self._quantity_tree.total() < quantity :
+            return None
+        tick_quantity, tick_notional = self._tick_at(self._quantity_tree.search(quantity))
+        return tick_notional / tick_quantity
+
+
+__all__ = ["SparseFenwickTree", "DepthIndex"]
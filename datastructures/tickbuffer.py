@@ -0,0 +1,92 @@
+from generics import Tick
+from decimal import Decimal
+
+class TickBuffer:
+
+    """
+    TickBuffer is a bounded single-producer / single-consumer ring buffer of price ticks
+    that coalesces updates per symbol.
+
+    The producer (a feed callback thread) calls push(), the consumer (the simulation) calls
+    drain(). Neither side takes a lock: the producer only ever advances `_tail`, the consumer
+    only ever advances `_head`, and each symbol occupies at most one ring slot at a time.
+    A symbol that ticks again before the consumer reached it simply overwrites its entry in
+    `_latest`, so a burst of updates is delivered as one tick carrying the newest price.
+
+    Public Methods:
+        - push(tick): Record a tick, queueing its symbol unless it is already pending.
+        - drain(limit): Pop pending symbols in arrival order and return their newest ticks.
+        - latest(symbol): Newest tick seen for a symbol, pending or not.
+        - price(symbol): Newest price seen for a symbol.
+
+    When the ring is full the tick is still stored in `_latest` (so price() stays current)
+    but its symbol is not queued and `dropped` is incremented.
+    """
+
+    def __init__(self, capacity : int = 1024) -> None:
+        if capacity <= 0 :
+            raise ValueError(f"TickBuffer capacity must be positive, got {capacity}")
+        self.capacity = capacity
+        self._ring : list[str | None] = [None] * capacity
+        self._head = 0 # next slot the consumer reads, written by the consumer only
+        self._tail = 0 # next slot the producer fills, written by the producer only
+        self._latest : dict[str, Tick] = {}
+        self._pending : dict[str, bool] = {}
+        self.received = 0
+        self.dropped = 0
+
+    def __len__(self) -> int :
+        return self._tail - self._head
+
+    def push(self, tick : Tick) -> None :
+        symbol = tick.symbol
+        # publish the value before looking at the pending flag, drain() clears the flag
+        # before reading the value so one of the two always sees the newest tick
+        self._latest[symbol] = tick
+        self.received += 1
+
+        if self._pending.get(symbol) :
+            return
+
+        tail = self._tail
+        if tail - self._head >= self.capacity :
+            self.dropped += 1
+            return
+
+        self._pending[symbol] = True
+        self._ring[tail % self.capacity] = symbol
+        self._tail = tail + 1
+
+    def drain(self, limit : int | None = None) -> list[Tick] :
+        ticks : list[Tick] = []
+        head = self._head
+        tail = self._tail
+        if limit is not None :
+            tail = min(tail, head + limit)
+
+        ring = self._ring
+        capacity = self.capacity
+        pending = self._pending
+        latest = self._latest
+
+        while head < tail :
+            symbol = ring[head % capacity]
+            ring[head % capacity] = None
+            head += 1
+            self._head = head
+            pending[symbol] = False
+            ticks.append(latest[symbol])
+
+        return ticks
+
+    def latest(self, symbol : str) -> Tick | None :
+        return self._latest.get(symbol)
+
+    def price(self, symbol : str) -> Decimal :
+        return self._latest[symbol].price
+
+    def symbols(self) -> list[str] :
+        return list(self._latest)
+
+
+__all__ = ["TickBuffer"]
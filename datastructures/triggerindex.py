@@ -0,0 +1,93 @@
+from generics import Order, OrderSide
+from decimal import Decimal
+import heapq
+
+class TriggerIndex:
+
+    """
+    TriggerIndex holds the pending stop orders of one book ordered by trigger price.
+
+    Buy stops fire once the last price rises to their trigger, so they sit in a min-heap;
+    sell stops fire once it falls to their trigger and sit in a max-heap (negated keys).
+    Orders with the same trigger fire in the order they were added.
+
+    Public Methods:
+        - add(order): Queue a stop order under its trigger price.
+        - cancel(order_id): Remove a pending stop, returns the order or None.
+        - release(price): Pop every stop crossed by `price`, cost is O(k log n) for k released.
+        - orders(): The pending stop orders.
+
+    Cancels are lazy : the heap entry stays until it surfaces and is skipped then. An entry
+    is live only while its sequence number is the one recorded for the order id, so an order
+    that is canceled and added again (new trigger) does not fire from its old entry. Stops
+    whose trigger is never reached would leave their entries behind for good, so the heaps
+    are rebuilt from the live entries once dead ones outnumber them, O(1) amortized.
+    """
+
+    def __init__(self) -> None:
+        self._buy : list[tuple[Decimal, int, Order]] = []
+        self._sell : list[tuple[Decimal, int, Order]] = []
+        self._live : dict[str, tuple[int, Order]] = {} # order id -> (sequence, order)
+        self._seq = 0
+
+    def __len__(self) -> int :
+        return len(self._live)
+
+    def __contains__(self, order_id : str) -> bool :
+        return order_id in self._live
+
+    def add(self, order : Order) -> None :
+        if order.trigger is None :
+            raise ValueError(f"Stop order {order.id} has no trigger price")
+
+        self._seq += 1
+        if order.side == OrderSide.Buy :
+            heapq.heappush(self._buy, (order.trigger, self._seq, order))
+        else :
+            heapq.heappush(self._sell, (-order.trigger, self._seq, order))
+        replaced = order.id in self._live
+        self._live[order.id] = (self._seq, order)
+        if replaced :
+            self._compact()
+
+    def cancel(self, order_id : str) -> Order | None :
+        entry = self._live.pop(order_id, None)
+        if entry is None :
+            return None
+        self._compact()
+        return entry[1]
+
+    def _compact(self) -> None :
+        live = self._live
+        if len(self._buy) + len(self._sell) <= 2 * len(live) :
+            return
+        self._buy = [entry for entry in self._buy if live.get(entry[2].id, (None,))[0] == entry[1]]
+        self._sell = [entry for entry in self._sell if live.get(entry[2].id, (None,))[0] == entry[1]]
+        heapq.heapify(self._buy)
+        heapq.heapify(self._sell)
+
+    def orders(self) -> list[Order] :
+        return [order for _, order in self._live.values()]
+
+    def release(self, price : Decimal) -> list[Order] :
+        released : list[Order] = []
+        live = self._live
+
+        buy = self._buy
+        while buy and buy[0][0] <= price :
+            _, seq, order = heapq.heappop(buy)
+            if live.get(order.id, (None,))[0] == seq :
+                del live[order.id]
+                released.append(order)
+
+        sell = self._sell
+        while sell and -sell[0][0] >= price :
+            _, seq, order = heapq.heappop(sell)
+            if live.get(order.id, (None,))[0] == seq :
+                del live[order.id]
+                released.append(order)
+
+        return released
+
+
+__all__ = ["TriggerIndex"]
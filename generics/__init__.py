@@ -1,9 +1,9 @@
 from .asset import Asset
-from .orders import Order, OrderSide, OrderType, OrderStatus
-from .datatypes import TreeNode, LinkedListNode, PriceLevel, Trade
+from .orders import Order, OrderSide, OrderType, OrderStatus, TimeInForce
+from .datatypes import TreeNode, LinkedListNode, PriceLevel, ArrayPriceLevel, Trade, Tick
 
 __all__ = [
-    'TreeNode', 'LinkedListNode', 'PriceLevel', 'Trade',
-    'Order', 'OrderSide', 'OrderType', 'OrderStatus',
+    'TreeNode', 'LinkedListNode', 'PriceLevel', 'ArrayPriceLevel', 'Trade', 'Tick',
+    'Order', 'OrderSide', 'OrderType', 'OrderStatus', 'TimeInForce',
     'Asset'
 ]
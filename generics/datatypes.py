@@ -1,7 +1,9 @@
 from __future__ import annotations
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from decimal import Decimal
-from .orders import Order
+from itertools import islice
+from typing import Iterator
+from .orders import Order, OrderStatus
 from .asset import Asset
 from typing import TYPE_CHECKING
 
@@ -19,15 +21,19 @@ class PriceLevel :
     price : Decimal 
     levels : LinkedListNode | None = None 
     tail : LinkedListNode | None = None
+    quantity : Decimal = Decimal(0) # total resting quantity at this price 
 
     def __post_init__(self)  :
         if self.tail is None and self.levels is not None : 
             runner = self.levels 
+            self.quantity = runner.value.quantity 
             while runner.next :
                 runner = runner.next
+                self.quantity += runner.value.quantity 
             self.tail = runner  
 
-    def insert_order(self, order : Order) : 
+    def insert_order(self, order : Order) -> LinkedListNode : 
+        self.quantity += order.quantity 
         to_add = LinkedListNode(value=order)
         if self.tail : # levels could be uninitialized 
             to_add.prev = self.tail 
@@ -36,6 +42,33 @@ class PriceLevel :
             self.levels = to_add
 
         self.tail = to_add
+        return to_add
+
+    def remove_order(self, node : LinkedListNode) -> None : 
+        # the caller settles `quantity`, this only unlinks 
+        if node.prev : 
+            node.prev.next = node.next 
+        else : 
+            self.levels = node.next 
+
+        if node.next : 
+            node.next.prev = node.prev 
+        else : 
+            self.tail = node.prev 
+
+    def is_empty(self) -> bool : 
+        return self.levels is None 
+
+    def __iter__(self) -> Iterator[tuple[LinkedListNode, Order]] : 
+        # FIFO (handle, order) pairs, the current node may be removed while iterating 
+        node = self.levels 
+        while node : 
+            yield node, node.value 
+            node = node.next 
+
+    @staticmethod
+    def order_of(node : LinkedListNode) -> Order : 
+        return node.value 
 
     def __eq__(self, other: object, /) -> bool:
         if not isinstance(other, PriceLevel) : 
@@ -52,12 +85,107 @@ class PriceLevel :
             return NotImplemented 
         return self.price <= other.price
 
+@dataclass 
+class ArrayPriceLevel : 
+    """
+    PriceLevel alternative that keeps its FIFO queue in a growable list instead of linked nodes.
+
+    The order itself is the handle stored in OrderBook.order_map. Removing an order only
+    tombstones it : the caller marks it FILLED or CANCELED first, the head index skips past
+    dead slots at the front and the list is compacted once dead slots outnumber live ones.
+
+    It saves a node object and two references per resting order and inserts are cheaper.
+    Under CPython, matching is no faster than with the linked PriceLevel. The per-order match
+    work dominates, and a walk over a level with mid-queue cancels must skip their tombstones
+    (see benchmarks/bench_levels.py).
+    """
+    price : Decimal 
+    slots : list[Order] = field(default_factory=list)
+    head : int = 0 # first slot that may still be live 
+    live : int = 0 
+    quantity : Decimal = Decimal(0) # total resting quantity at this price 
+
+    def insert_order(self, order : Order) -> Order : 
+        self.slots.append(order)
+        self.live += 1 
+        self.quantity += order.quantity 
+        return order 
+
+    def remove_order(self, order : Order) -> None : 
+        # `head` always points at the first live slot while the level is not empty 
+        live = self.live - 1 
+        self.live = live 
+        if live == 0 : 
+            self.slots = []
+            self.head = 0 
+            return 
+
+        slots = self.slots 
+        head = self.head 
+        if slots[head] is order : 
+            # filled or canceled from the front, step to the next live slot 
+            head += 1 
+            while slots[head].status is not OrderStatus.WAITING : 
+                head += 1 
+            self.head = head 
+
+        end = len(slots)
+        if end - live > live and end > 32 : 
+            if end - head == live : 
+                # every dead slot is in front of the head 
+                self.slots = slots[head:]
+            else : 
+                self.slots = [order for order in slots[head:] if order.status is OrderStatus.WAITING]
+            self.head = 0 
+
+    def is_empty(self) -> bool : 
+        return self.live == 0 
+
+    def __iter__(self) -> Iterator[tuple[Order, Order]] : 
+        # FIFO (handle, order) pairs over live slots, the current order may be removed while iterating 
+        slots = self.slots 
+        head = self.head 
+        if len(slots) - head == self.live : 
+            # no tombstones past the head, walk the list without looking at statuses 
+            return zip(islice(slots, head, None), islice(slots, head, None))
+        return self._live_slots(slots, head)
+
+    @staticmethod
+    def _live_slots(slots : list[Order], head : int) -> Iterator[tuple[Order, Order]] : 
+        waiting = OrderStatus.WAITING 
+        for i in range(head, len(slots)) : 
+            order = slots[i]
+            if order.status is waiting : 
+                yield order, order 
+
+    @staticmethod
+    def order_of(order : Order) -> Order : 
+        return order 
+
+    def __eq__(self, other: object, /) -> bool:
+        if not isinstance(other, ArrayPriceLevel) : 
+            return NotImplemented
+        return self.price == other.price 
+
+    def __lt__(self, other : object, /) -> bool : 
+        if not isinstance(other, ArrayPriceLevel) : 
+            return NotImplemented 
+        return self.price < other.price
+
+    def __le__(self, other : object, /) -> bool : 
+        if not isinstance(other, ArrayPriceLevel) : 
+            return NotImplemented 
+        return self.price <= other.price
+
 @dataclass 
 class TreeNode : 
     value : PriceLevel
     left : TreeNode | None = None
     right : TreeNode | None = None  
     height : int = 0
+    subtree_quantity : Decimal = Decimal(0) # quantity of this level plus both subtrees 
+    subtree_notional : Decimal = Decimal(0) # quantity * price of this level plus both subtrees 
+    parent : TreeNode | None = field(default=None, repr=False, compare=False) 
 
 @dataclass 
 class Trade : 
@@ -68,6 +196,11 @@ class Trade :
     quantity : Decimal 
     amount_exchanged : Decimal 
 
+@dataclass 
+class Tick : 
+    symbol : str 
+    price : Decimal 
+    timestamp : float = 0.0 
 
 
-__all__ = ['TreeNode', 'LinkedListNode', 'PriceLevel', "Trade"]
+__all__ = ['TreeNode', 'LinkedListNode', 'PriceLevel', 'ArrayPriceLevel', "Trade", "Tick"]
@@ -11,6 +11,13 @@ class OrderType(Enum) :
     GoodTillCancel = auto() 
     Market = auto() 
     Limit = auto()
+    Stop = auto() # becomes a Market order once the last price crosses `trigger` 
+    StopLimit = auto() # becomes a Limit order at `offer` once the last price crosses `trigger` 
+
+class TimeInForce(Enum) : 
+    GoodTillCancel = auto() # any remainder rests in the book 
+    ImmediateOrCancel = auto() # fill what crosses now, drop the remainder 
+    FillOrKill = auto() # fill completely now or not at all 
 
 class OrderSide(Enum) : 
     Buy = auto() 
@@ -31,5 +38,7 @@ class Order :
     id : str
     agent : "Agent"
     status : OrderStatus = OrderStatus.WAITING
+    trigger : Decimal | None = None # stop price for Stop and StopLimit orders 
+    time_in_force : TimeInForce = TimeInForce.GoodTillCancel 
 
-__all__ =  ["Order", "OrderSide", "OrderType", "OrderStatus"]
+__all__ =  ["Order", "OrderSide", "OrderType", "OrderStatus", "TimeInForce"]
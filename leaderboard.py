@@ -0,0 +1,205 @@
+# Mark-to-market ranking of agents by equity = cash + sum(position * Asset.price), kept up to
+# date from settled trades instead of sorting the whole population on every query.
+#
+# Agents are kept in a list sorted by their equity marked at reference prices. A trade only
+# re-marks its buyer and seller. Price moves don't touch the list : an agent's equity can have
+# drifted from its mark by at most sum(|price - reference| * largest |position|) over assets,
+# so top(k) walks down from the best mark and stops once no lower mark can beat the k-th
+# exact equity. rank and percentile use the same bound : only agents whose mark lies within
+# the drift of the answer can be ordered differently by their exact equity, so only that band
+# is valued at current prices. When prices have drifted far enough that the walk or the band
+# gets long, every agent is re-marked at current prices; the list is then nearly sorted
+# already and the adaptive sort is close to linear.
+from contextlib import nullcontext
+from decimal import Decimal
+from typing import Callable, ContextManager
+from uuid import UUID
+from bisect import bisect_left, insort
+from generics import Asset
+from agent import Agent
+import heapq
+import threading
+
+_NO_LOCK = nullcontext()
+
+def _no_lock(agent : Agent) -> ContextManager :
+    return _NO_LOCK
+
+class Leaderboard :
+
+    """
+    Leaderboard ranks agents by mark-to-market equity.
+
+    Public Methods:
+        - update(agent): Re-mark agent after its cash or positions changed, O(n) worst case memmove.
+        - equity(agent): Current equity of agent at the latest asset prices.
+        - top(k): The k richest (agent, equity) pairs, best first.
+        - rank(agent): Number of agents with a strictly higher equity.
+        - percentile(p): Equity below which p percent of the agents fall.
+        - remark(): Re-mark every agent at current prices.
+    """
+
+    def __init__(self, agents : list[Agent], assets : dict[UUID, Asset], max_walk : int = 256) -> None :
+        self.assets = assets
+        self.max_walk = max_walk # entries top(k) may look at beyond k before re-marking everything
+        # lock guarding an agent's cash and portfolio, set by a thread safe Market
+        self.agent_lock : Callable[[Agent], ContextManager] = _no_lock
+        self._agents : list[Agent] = list(agents)
+        self._slot : dict[int, int] = {id(agent) : i for i, agent in enumerate(self._agents)}
+        self._marks : list[float] = [0.0] * len(self._agents)
+        self._sorted : list[tuple[float, int]] = [] # (marked equity, slot), ascending
+        self._reference : dict[UUID, float] = {}    # asset price the marks were taken at
+        self._max_position : dict[UUID, float] = {} # largest |position| held since the last re-mark
+        self._lock = threading.Lock()
+        self.remark()
+
+    def _marked_equity(self, agent : Agent) -> float :
+        with self.agent_lock(agent) :
+            cash = agent.cash
+            positions = list(agent.portfolio.items())
+        equity = float(cash)
+        reference = self._reference
+        max_position = self._max_position
+        for asset_id, quantity in positions :
+            position = float(quantity)
+            if asset_id not in reference :
+                reference[asset_id] = float(self.assets[asset_id].price)
+            equity += position * reference[asset_id]
+            if abs(position) > max_position.get(asset_id, 0.0) :
+                max_position[asset_id] = abs(position)
+        return equity
+
+    def _drift(self) -> float :
+        # upper bound on |equity - mark| over every agent
+        assets = self.assets
+        return sum(abs(float(assets[asset_id].price) - price) * self._max_position.get(asset_id, 0.0)
+                   for asset_id, price in self._reference.items())
+
+    def remark(self) -> None :
+        with self._lock :
+            self._remark()
+
+    def _remark(self) -> None :
+        self._reference = {asset_id : float(asset.price) for asset_id, asset in self.assets.items()}
+        self._max_position = {}
+        marks = [self._marked_equity(agent) for agent in self._agents]
+        self._marks = marks
+        order = self._sorted or [(0.0, slot) for slot in range(len(marks))]
+        # keep the previous order so the sort sees mostly sorted runs
+        self._sorted = [(marks[slot], slot) for _, slot in order]
+        self._sorted.sort()
+
+    def add_agent(self, agent : Agent) -> None :
+        with self._lock :
+            slot = len(self._agents)
+            self._agents.append(agent)
+            self._slot[id(agent)] = slot
+            mark = self._marked_equity(agent)
+            self._marks.append(mark)
+            insort(self._sorted, (mark, slot))
+
+    def update(self, agent : Agent) -> None :
+        with self._lock :
+            slot = self._slot.get(id(agent))
+            if slot is None :
+                return
+            old = (self._marks[slot], slot)
+            mark = self._marked_equity(agent)
+            if mark == old[0] :
+                return
+            del self._sorted[bisect_left(self._sorted, old)]
+            self._marks[slot] = mark
+            insort(self._sorted, (mark, slot))
+
+    def equity(self, agent : Agent) -> Decimal :
+        assets = self.assets
+        with self.agent_lock(agent) :
+            cash = agent.cash
+            positions = list(agent.portfolio.items())
+        return cash + sum((quantity * assets[asset_id].price for asset_id, quantity in positions), Decimal(0))
+
+    def _current(self, agent : Agent) -> float :
+        assets = self.assets
+        with self.agent_lock(agent) :
+            cash = agent.cash
+            positions = list(agent.portfolio.items())
+        return float(cash) + sum(float(quantity) * float(assets[asset_id].price) for asset_id, quantity in positions)
+
+    def top(self, k : int) -> list[tuple[Agent, Decimal]] :
+        with self._lock :
+            best = self._top(k)
+            if best is None :
+                self._remark()
+                best = self._top(k)
+        return [(self._agents[slot], self.equity(self._agents[slot])) for _, slot in best]
+
+    def _top(self, k : int) -> list[tuple[float, int]] | None :
+        # None when the walk went past max_walk, the marks are too stale to be useful
+        if k <= 0 :
+            return []
+        drift = self._drift()
+        heap : list[tuple[float, int]] = [] # k best exact equities, worst on top
+        walked = 0
+        for i in range(len(self._sorted) - 1, -1, -1) :
+            mark, slot = self._sorted[i]
+            if len(heap) == k and mark + drift < heap[0][0] :
+                break
+            walked += 1
+            if walked > k + self.max_walk and drift > 0 :
+                return None
+            entry = (self._current(self._agents[slot]), slot)
+            if len(heap) < k :
+                heapq.heappush(heap, entry)
+            elif entry > heap[0] :
+                heapq.heapreplace(heap, entry)
+        return sorted(heap, reverse=True)
+
+    def _band(self, low : float, high : float) -> tuple[int, int] | None :
+        # indices of the marks in [low, high], None when the band is too wide to be worth
+        # valuing agent by agent, the caller re-marks everyone instead
+        start = bisect_left(self._sorted, (low, -1))
+        end = bisect_left(self._sorted, (high, float("inf")))
+        if end - start > max(self.max_walk, len(self._sorted) // 8) :
+            return None
+        return start, end
+
+    def rank(self, agent : Agent) -> int :
+        with self._lock :
+            drift = self._drift()
+            if drift > 0 :
+                # marks above equity + drift are strictly richer, marks at or below
+                # equity - drift can't be, only the band in between is valued exactly
+                equity = self._current(agent)
+                band = self._band(equity - drift, equity + drift)
+                if band is not None :
+                    start, end = band
+                    above = len(self._sorted) - end
+                    agents = self._agents
+                    return above + sum(1 for _, slot in self._sorted[start:end] if self._current(agents[slot]) > equity)
+                self._remark()
+            mark = self._marks[self._slot[id(agent)]]
+            return len(self._sorted) - bisect_left(self._sorted, (mark, float("inf")))
+
+    def percentile(self, p : float) -> float :
+        if not 0 <= p <= 100 :
+            raise ValueError(f"Percentile must be within [0, 100], got {p}")
+        with self._lock :
+            if not self._sorted :
+                raise ValueError("Leaderboard has no agents")
+            index = min(int(p / 100 * len(self._sorted)), len(self._sorted) - 1)
+            drift = self._drift()
+            if drift > 0 :
+                # the exact equity at `index` is within drift of the mark at `index`, so marks
+                # more than twice the drift away are on the same side of it either way
+                mark = self._sorted[index][0]
+                band = self._band(mark - 2 * drift, mark + 2 * drift)
+                if band is not None :
+                    start, end = band
+                    agents = self._agents
+                    values = sorted(self._current(agents[slot]) for _, slot in self._sorted[start:end])
+                    return values[index - start]
+                self._remark()
+            return self._sorted[index][0]
+
+
+__all__ = ["Leaderboard"]
@@ -1,58 +1,238 @@
-from dataclasses import astuple
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from dataclasses import astuple, dataclass
 from decimal import Decimal
-from uuid import UUID, uuid4
+from uuid import UUID
 from generics import Asset
-from generics.datatypes import Trade
-from generics.orders import Order, OrderSide, OrderStatus
+from generics.datatypes import Trade, PriceLevel
+from generics.orders import Order, OrderSide, OrderStatus, OrderType
 from agent import Agent
-from orderbook import OrderBook
+from orderbook import OrderBook, DEFAULT_TICK_SIZE
+from topofbook import TopOfBookPublisher
+from leaderboard import Leaderboard
+from bars import BarAggregator
+from matching import MatchingPolicy
+from signals import SignalCache
+import numpy as np
+import threading
+
+STOP_TYPES = (OrderType.Stop, OrderType.StopLimit)
+AGENT_LOCK_STRIPES = 64
+
+_NO_LOCK = nullcontext()
+
+@dataclass
+class MarketSnapshot:
+    # row i of every array describes asset_ids[i], missing prices are nan and missing quantities 0
+    asset_ids: list[UUID]
+    last_price: np.ndarray      # (assets,)
+    best_bid: np.ndarray        # (assets,)
+    best_ask: np.ndarray        # (assets,)
+    bid_prices: np.ndarray      # (assets, depth), best first
+    bid_quantities: np.ndarray  # (assets, depth)
+    ask_prices: np.ndarray      # (assets, depth), best first
+    ask_quantities: np.ndarray  # (assets, depth)
+    volume: np.ndarray          # (assets,) cumulative traded quantity
+    trades: np.ndarray          # (assets,) cumulative trade count
 
 class Market:
     
-    def __init__(self, traders: dict[UUID, Agent], assets: dict[UUID, Asset]) -> None:
+    def __init__(self, traders: dict[UUID, Agent], assets: dict[UUID, Asset], level_type: type = PriceLevel,
+                 thread_safe: bool = False, max_workers: int | None = None, policy: MatchingPolicy | None = None,
+                 tick_sizes: dict[UUID, Decimal] | None = None, depth_index: bool = False) -> None:
         self.traders = traders
         self.assets = assets
+        self.level_type = level_type
+        self.policy = policy
+        # books keep a DepthIndex bucketed by the tick size of their asset, DEFAULT_TICK_SIZE
+        # for the others, only with depth_index
+        self.tick_sizes: dict[UUID, Decimal] = dict(tick_sizes or {})
+        self.depth_index = depth_index
+        self.thread_safe = thread_safe
 
         self.history: list[Trade] = []
         self.cash = Decimal(0)
 
         self.orderbook_asset_map: dict[UUID, OrderBook] = self._create_orderbooks(assets)
 
+        # per asset running totals, row order is self._asset_ids
+        self._asset_ids: list[UUID] = list(assets)
+        self._asset_index: dict[UUID, int] = {asset_id: i for i, asset_id in enumerate(self._asset_ids)}
+        self._volume = np.zeros(len(self._asset_ids))
+        self._trades = np.zeros(len(self._asset_ids), dtype=np.int64)
+        self._last_quantity = np.zeros(len(self._asset_ids))
+
+        self.publisher: TopOfBookPublisher | None = None
+        self.leaderboard: Leaderboard | None = None
+        self.bars: BarAggregator | None = None
+        self.signals: SignalCache | None = None
+
+        # thread safe mode : everything touching a book, its asset and its running totals
+        # happens under that book's lock; agent balances are guarded by striped locks that
+        # are always taken after the book lock and in stripe order, so no cycle can form
+        self._book_locks: dict[UUID, threading.RLock] | None = None
+        self._agent_locks: list[threading.Lock] | None = None
+        self._history_lock = _NO_LOCK
+        self._executor: ThreadPoolExecutor | None = None
+        if thread_safe:
+            self._book_locks = {asset_id: threading.RLock() for asset_id in self._asset_ids}
+            self._agent_locks = [threading.Lock() for _ in range(AGENT_LOCK_STRIPES)]
+            self._history_lock = threading.Lock()
+            self._executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    def _book_lock(self, asset_id: UUID):
+        return self._book_locks[asset_id] if self._book_locks is not None else _NO_LOCK
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
     def _create_orderbooks(self, assets: dict[UUID, Asset]) -> dict[UUID, OrderBook]:
         orderbook_map: dict[UUID, OrderBook] = {}
         for asset_id, asset in assets.items():
-            orderbook_map[asset_id] = OrderBook(asset_type=asset.type)
+            orderbook_map[asset_id] = self.create_orderbook(asset)
         return orderbook_map
 
+    def create_orderbook(self, asset: Asset) -> OrderBook:
+        return OrderBook(asset_type=asset.type, tick_size=self.tick_sizes.get(asset.id, DEFAULT_TICK_SIZE),
+                         level_type=self.level_type, policy=self.policy, depth_index=self.depth_index)
+
     def buy(self, asset: Asset, trader: Agent, order: Order):
         if order.side != OrderSide.Buy:
             return OrderStatus.CANCELED
 
+        if order.type in STOP_TYPES:
+            return self._place_stop(asset, order)
+
         if asset.price * order.quantity > trader.cash:
             return OrderStatus.CANCELED
 
-        asset_orderbook = self.orderbook_asset_map[asset.id]
-        trades = asset_orderbook.match(order)
-        self.process_trades(trades)
-
-        return order.status
+        return self.place(asset, order)
 
     def sell(self, asset: Asset, trader: Agent, order: Order):
         if order.side != OrderSide.Sell:
             return OrderStatus.CANCELED
 
-        asset_id = asset.id
-        if trader.portfolio.get(asset_id, Decimal(0)) < order.quantity:
+        if order.type in STOP_TYPES:
+            return self._place_stop(asset, order)
+
+        if trader.portfolio.get(asset.id, Decimal(0)) < order.quantity:
             return OrderStatus.CANCELED
 
-        asset_orderbook = self.orderbook_asset_map[asset_id]
-        trades = asset_orderbook.match(order)
-        self.process_trades(trades)
+        return self.place(asset, order)
+
+    def place(self, asset: Asset, order: Order):
+        # matches and settles an order without the funds checks of buy() and sell(), for
+        # liquidity that is not funded inside the simulation; its agent's cash and positions
+        # may go negative
+        asset_orderbook = self.orderbook_asset_map[asset.id]
+        with self._book_lock(asset.id):
+            trades = asset_orderbook.match(order)
+            self.process_trades(trades)
+            self._book_changed(asset.id)
 
         return order.status
 
-    
+    def submit_batch(self, orders: list[Order]) -> list[OrderStatus]:
+        # orders of the same asset run in submission order, different assets are dispatched
+        # to the thread pool in thread safe mode; returns the status of every order
+        groups: dict[UUID, list[int]] = {}
+        for i, order in enumerate(orders):
+            groups.setdefault(order.asset.id, []).append(i)
+
+        statuses: list[OrderStatus] = [OrderStatus.WAITING] * len(orders)
+
+        def run(indices: list[int]):
+            for i in indices:
+                order = orders[i]
+                submit = self.buy if order.side == OrderSide.Buy else self.sell
+                statuses[i] = submit(order.asset, order.agent, order)
+
+        if self._executor is None or len(groups) == 1:
+            for indices in groups.values():
+                run(indices)
+        else:
+            for future in [self._executor.submit(run, indices) for indices in groups.values()]:
+                future.result()
+
+        return statuses
+
+    def cancel_all(self, agent: Agent, asset: Asset | None = None) -> list[Order]:
+        # pulls every resting and stop order of `agent` on one asset, or on every asset
+        asset_ids = [asset.id] if asset is not None else list(self._asset_ids)
+        canceled: list[Order] = []
+        for asset_id in asset_ids:
+            orderbook = self.orderbook_asset_map[asset_id]
+            if id(agent) not in orderbook.agent_orders:
+                continue
+            with self._book_lock(asset_id):
+                canceled.extend(orderbook.cancel_all(agent))
+                self._book_changed(asset_id)
+        return canceled
+
+    def disconnect(self, agent: Agent) -> list[Order]:
+        # an agent whose session drops leaves nothing resting behind
+        return self.cancel_all(agent)
+
+    def start_auction(self, asset: Asset | None = None):
+        # orders for the asset (every asset by default) rest without matching until uncross()
+        asset_ids = [asset.id] if asset is not None else list(self._asset_ids)
+        for asset_id in asset_ids:
+            with self._book_lock(asset_id):
+                self.orderbook_asset_map[asset_id].start_auction()
+
+    def uncross(self, asset: Asset | None = None) -> list[Trade]:
+        # executes each book at its equilibrium price, the last price breaks ties, and
+        # settles all of its trades in one process_trades call
+        asset_ids = [asset.id] if asset is not None else list(self._asset_ids)
+        executed: list[Trade] = []
+        for asset_id in asset_ids:
+            with self._book_lock(asset_id):
+                trades = self.orderbook_asset_map[asset_id].uncross(reference=self.assets[asset_id].price)
+                self.process_trades(trades)
+                self._book_changed(asset_id)
+            executed.extend(trades)
+        return executed
+
+    def _place_stop(self, asset: Asset, order: Order):
+        # funds are checked when the stop fires, the trigger may already be crossed
+        asset_orderbook = self.orderbook_asset_map[asset.id]
+        with self._book_lock(asset.id):
+            asset_orderbook.add_stop(order)
+            self._run_stops(asset_orderbook.release_stops(asset.price))
+            self._book_changed(asset.id)
+        return order.status
+
+    def _run_stops(self, released: list[Order]):
+        # triggered orders can trade and trigger further stops, work through them
+        # breadth first in a single loop instead of recursing through process_trades
+        pending = deque(released)
+        while pending:
+            order = pending.popleft()
+            asset = order.asset
+            trader = order.agent
+            order.type = OrderType.Market if order.type == OrderType.Stop else OrderType.Limit
+
+            if order.side == OrderSide.Buy:
+                funded = asset.price * order.quantity <= trader.cash
+            else:
+                funded = trader.portfolio.get(asset.id, Decimal(0)) >= order.quantity
+            if not funded:
+                order.status = OrderStatus.CANCELED
+                continue
+
+            with self._book_lock(asset.id):
+                trades = self.orderbook_asset_map[asset.id].match(order)
+                pending.extend(self._settle(trades))
+
     def process_trades(self, trades: list[Trade]):
+        self._run_stops(self._settle(trades))
+
+    def _settle(self, trades: list[Trade]) -> list[Order]:
+        # returns the stop orders released by the new last prices
+        traded: dict[UUID, Asset] = {}
         for trade in trades:
             buyer = trade.buyer
             seller = trade.seller
@@ -62,19 +242,197 @@ class Market:
 
             asset_id = trade_asset.id
 
-            buyer.cash -= amount_exchanged
-            seller.cash += amount_exchanged
-            buyer.portfolio[asset_id] = buyer.portfolio.get(asset_id, Decimal(0)) + quantity
+            if self._agent_locks is None:
+                self._transfer(buyer, seller, asset_id, quantity, amount_exchanged)
+            else:
+                self._transfer_locked(buyer, seller, asset_id, quantity, amount_exchanged)
+
+            with self._book_lock(asset_id):
+                trade_asset.price = trade_asset.price = max(Decimal(0), amount_exchanged / quantity)
+                idx = self._asset_index[asset_id]
+                self._volume[idx] += float(quantity)
+                self._trades[idx] += 1
+                self._last_quantity[idx] = float(quantity)
+                if self.bars is not None:
+                    self.bars.add(asset_id, float(trade_asset.price), float(quantity))
+
+            with self._history_lock:
+                self.history.append(trade)
+            traded[asset_id] = trade_asset
 
-            seller.portfolio[asset_id] = seller.portfolio.get(asset_id, Decimal(0)) - quantity
-            if seller.portfolio[asset_id] == 0:
-                del seller.portfolio[asset_id]
+            if self.leaderboard is not None:
+                self.leaderboard.update(buyer)
+                self.leaderboard.update(seller)
 
-            trade_asset.price = trade_asset.price = max(Decimal(0), amount_exchanged / quantity)
+        released: list[Order] = []
+        for asset_id, trade_asset in traded.items():
+            with self._book_lock(asset_id):
+                released.extend(self.orderbook_asset_map[asset_id].release_stops(trade_asset.price))
+        return released
 
-            self.history.append(trade)
+    def _transfer(self, buyer: Agent, seller: Agent, asset_id: UUID, quantity: Decimal, amount_exchanged: Decimal):
+        buyer.cash -= amount_exchanged
+        seller.cash += amount_exchanged
+        buyer.portfolio[asset_id] = buyer.portfolio.get(asset_id, Decimal(0)) + quantity
 
-    def add_asset(self, asset: Asset):
-        asset_id = uuid4()
+        seller.portfolio[asset_id] = seller.portfolio.get(asset_id, Decimal(0)) - quantity
+        if seller.portfolio[asset_id] == 0:
+            del seller.portfolio[asset_id]
+
+    def _agent_lock(self, agent: Agent):
+        if self._agent_locks is None:
+            return _NO_LOCK
+        return self._agent_locks[(id(agent) >> 4) % AGENT_LOCK_STRIPES]
+
+    def _transfer_locked(self, buyer: Agent, seller: Agent, asset_id: UUID, quantity: Decimal, amount_exchanged: Decimal):
+        # object ids are 16 byte aligned, drop the low bits before picking a stripe
+        first = (id(buyer) >> 4) % AGENT_LOCK_STRIPES
+        second = (id(seller) >> 4) % AGENT_LOCK_STRIPES
+        if first > second:
+            first, second = second, first
+
+        with self._agent_locks[first]:
+            if first == second:
+                self._transfer(buyer, seller, asset_id, quantity, amount_exchanged)
+            else:
+                with self._agent_locks[second]:
+                    self._transfer(buyer, seller, asset_id, quantity, amount_exchanged)
+
+    def add_asset(self, asset: Asset, tick_size: Decimal | None = None):
+        asset_id = asset.id
         self.assets[asset_id] = asset
-        self.orderbook_asset_map[asset_id] = OrderBook(asset_type=asset.type)
+        if tick_size is not None:
+            self.tick_sizes[asset_id] = tick_size
+        self.orderbook_asset_map[asset_id] = self.create_orderbook(asset)
+
+        if self._book_locks is not None:
+            self._book_locks[asset_id] = threading.RLock()
+        self._asset_index[asset_id] = len(self._asset_ids)
+        self._asset_ids.append(asset_id)
+        self._volume = np.append(self._volume, 0.0)
+        self._trades = np.append(self._trades, 0)
+        self._last_quantity = np.append(self._last_quantity, 0.0)
+        if self.publisher is not None:
+            self.publisher.add_asset(asset_id)
+        self._book_changed(asset_id)
+
+    def attach_publisher(self, publisher: TopOfBookPublisher):
+        # top of book of every asset is written to `publisher` after each order that reaches a book
+        self.publisher = publisher
+        for asset_id in self._asset_ids:
+            publisher.add_asset(asset_id)
+            with self._book_lock(asset_id):
+                self._publish(asset_id)
+
+    def attach_leaderboard(self, leaderboard: Leaderboard):
+        # buyer and seller of every settled trade are re-marked on `leaderboard`, which reads
+        # balances under the agents' stripe locks (taken after its own lock, never before)
+        self.leaderboard = leaderboard
+        leaderboard.agent_lock = self._agent_lock
+        leaderboard.remark()
+
+    def attach_bars(self, bars: BarAggregator):
+        # every settled trade is folded into `bars`, end_step() drives its per step bars
+        self.bars = bars
+
+    def attach_signals(self, signals: SignalCache):
+        # `signals` gets the top of book after each order that reaches a book and a price
+        # sample of every asset per end_step(); fails up front if it keeps fewer samples than
+        # a trader's behavior needs
+        longest = max((getattr(agent.behavior, "momentum_window", 0) for agent in self.traders.values()), default=0)
+        signals.check_window(longest)
+        self.signals = signals
+        for asset_id in self._asset_ids:
+            with self._book_lock(asset_id):
+                self._observe(asset_id)
+
+    def end_step(self):
+        if self.bars is not None:
+            self.bars.step()
+        if self.signals is not None:
+            self.signals.step()
+
+    def _book_changed(self, asset_id: UUID):
+        if self.publisher is not None:
+            self._publish(asset_id)
+        if self.signals is not None:
+            self._observe(asset_id)
+
+    def _observe(self, asset_id: UUID):
+        orderbook = self.orderbook_asset_map[asset_id]
+        best_bid = orderbook.get_best_bid()
+        best_ask = orderbook.get_best_ask()
+        self.signals.on_book(
+            asset_id,
+            best_bid.price if best_bid else None,
+            best_bid.quantity if best_bid else Decimal(0),
+            best_ask.price if best_ask else None,
+            best_ask.quantity if best_ask else Decimal(0),
+        )
+
+    def _publish(self, asset_id: UUID):
+        orderbook = self.orderbook_asset_map[asset_id]
+        best_bid = orderbook.get_best_bid()
+        best_ask = orderbook.get_best_ask()
+        idx = self._asset_index[asset_id]
+        self.publisher.publish(
+            asset_id,
+            float(best_bid.price) if best_bid else np.nan,
+            float(best_bid.quantity) if best_bid else 0.0,
+            float(best_ask.price) if best_ask else np.nan,
+            float(best_ask.quantity) if best_ask else 0.0,
+            float(self.assets[asset_id].price),
+            float(self._last_quantity[idx]),
+            float(self._volume[idx]),
+            int(self._trades[idx]),
+        )
+
+    def snapshot(self, depth: int = 10) -> MarketSnapshot:
+        # top of book and the first `depth` levels of every asset, each book only walks
+        # the levels it reports and writes them straight into the output arrays
+        if depth < 1:
+            raise ValueError(f"Snapshot depth must be at least 1, got {depth}")
+
+        n = len(self._asset_ids)
+        last_price = np.empty(n)
+        bid_prices = np.full((n, depth), np.nan)
+        bid_quantities = np.zeros((n, depth))
+        ask_prices = np.full((n, depth), np.nan)
+        ask_quantities = np.zeros((n, depth))
+
+        for i, asset_id in enumerate(self._asset_ids):
+            with self._book_lock(asset_id):
+                self._snapshot_row(i, asset_id, depth, last_price, bid_prices, bid_quantities, ask_prices, ask_quantities)
+
+        return MarketSnapshot(
+            asset_ids=list(self._asset_ids),
+            last_price=last_price,
+            best_bid=bid_prices[:, 0].copy(),
+            best_ask=ask_prices[:, 0].copy(),
+            bid_prices=bid_prices,
+            bid_quantities=bid_quantities,
+            ask_prices=ask_prices,
+            ask_quantities=ask_quantities,
+            volume=self._volume.copy(),
+            trades=self._trades.copy(),
+        )
+
+    def _snapshot_row(self, i, asset_id, depth, last_price, bid_prices, bid_quantities, ask_prices, ask_quantities):
+        last_price[i] = self.assets[asset_id].price
+        orderbook = self.orderbook_asset_map[asset_id]
+
+        j = 0
+        for price_level in reversed(orderbook.buy_side_tree):
+            if j == depth:
+                break
+            bid_prices[i, j] = price_level.price
+            bid_quantities[i, j] = price_level.quantity
+            j += 1
+
+        j = 0
+        for price_level in orderbook.sell_side_tree:
+            if j == depth:
+                break
+            ask_prices[i, j] = price_level.price
+            ask_quantities[i, j] = price_level.quantity
+            j += 1
@@ -0,0 +1,81 @@
+# Matching policies decide how an incoming quantity is shared among the orders resting at one
+# price level. OrderBook walks the levels in price priority and asks its policy for the
+# allocation of each level, then books the trades and removes the filled orders.
+from abc import ABC, abstractmethod
+from decimal import Decimal
+from generics import Order
+
+class MatchingPolicy(ABC) :
+
+    @abstractmethod
+    def allocate(self, price_level, quantity : Decimal) -> list[tuple[object, Order, Decimal]] :
+        # (queue handle, resting order, quantity taken from it), every quantity > 0 and the
+        # total at most `quantity`; the level is not modified
+        pass
+
+
+class FifoPolicy(MatchingPolicy) :
+    """Price-time priority : the oldest order at the level is filled first."""
+
+    def allocate(self, price_level, quantity : Decimal) -> list[tuple[object, Order, Decimal]] :
+        allocations = []
+        for handle, order in price_level :
+            if quantity <= 0 :
+                break
+            take = min(order.quantity, quantity)
+            allocations.append((handle, order, take))
+            quantity -= take
+        return allocations
+
+
+class ProRataPolicy(MatchingPolicy) :
+    """
+    Every resting order at the level gets a share of the incoming quantity proportional to its
+    size, computed over whole lots in exact integer arithmetic.
+
+    Shares are rounded down to lots. The lots left over by rounding go one each to the oldest
+    orders, and anything below a lot is filled oldest first, so the outcome only depends on the
+    queue and never on floating point.
+    """
+
+    def __init__(self, lot : Decimal = Decimal(1)) -> None :
+        self.lot = lot
+
+    def allocate(self, price_level, quantity : Decimal) -> list[tuple[object, Order, Decimal]] :
+        entries = list(price_level)
+        if not entries or quantity <= 0 :
+            return []
+        if quantity >= price_level.quantity :
+            return [(handle, order, order.quantity) for handle, order in entries]
+
+        lot = self.lot
+        lots = [int(order.quantity // lot) for _, order in entries]
+        total = sum(lots)
+        # with fractional sizes the lots can run out before the quantity does
+        take = min(int(quantity // lot), total)
+        shares = [size * take // total for size in lots] if take else [0] * len(lots)
+
+        # rounding lost fewer lots than there are orders with room left, oldest first
+        left = take - sum(shares)
+        for i, size in enumerate(lots) :
+            if not left :
+                break
+            if size > shares[i] :
+                shares[i] += 1
+                left -= 1
+
+        amounts = [share * lot for share in shares]
+        remaining = quantity - take * lot
+        # sub-lot remainder, oldest first
+        for i, (_, order) in enumerate(entries) :
+            if remaining <= 0 :
+                break
+            extra = min(order.quantity - amounts[i], remaining)
+            if extra > 0 :
+                amounts[i] += extra
+                remaining -= extra
+
+        return [(handle, order, amount) for (handle, order), amount in zip(entries, amounts) if amount > 0]
+
+
+__all__ = ["MatchingPolicy", "FifoPolicy", "ProRataPolicy"]
@@ -1,39 +1,99 @@
 from agent import Agent
-from generics import TreeNode, Order, OrderType, OrderSide, Asset, LinkedListNode, PriceLevel, OrderStatus, Trade
+from generics import TreeNode, Order, OrderType, OrderSide, Asset, LinkedListNode, PriceLevel, OrderStatus, Trade, TimeInForce
 from decimal import Decimal
 from uuid import uuid4
-from datastructures import AVLTree
-from order_book_decoraters import fill_order
+from datastructures import AVLTree, TriggerIndex, DepthIndex
+from matching import MatchingPolicy, FifoPolicy
+
+DEFAULT_TICK_SIZE = Decimal("0.01")
 
 class OrderBook :
 
-    def __init__(self, asset_type : str) -> None:
+    def __init__(self, asset_type : str, tick_size : Decimal = DEFAULT_TICK_SIZE, level_type : type = PriceLevel,
+                 policy : MatchingPolicy | None = None, depth_index : bool = False) -> None:
+        # level_type is PriceLevel (linked FIFO queue) or ArrayPriceLevel (array queue with tombstones,
+        # fewer objects per order, not faster matching)
+        # policy shares an incoming order among the orders of a level, price-time FIFO by default
+        # depth queries come from the trees' subtree sums, exact per level; depth_index=True also
+        # keeps a DepthIndex per side and answers them per `tick_size` bucket instead, at the cost
+        # of two Fenwick updates on every insert, cancel and fill
         self.asset_type = asset_type
+        self.tick_size = tick_size
+        self.level_type = level_type
         self.buy_side_tree = AVLTree() 
         self.sell_side_tree = AVLTree()
-        self.order_map : dict[str, LinkedListNode] = {} 
-        self.dispatcher = self._init_dispatcher()
-
-    def _init_dispatcher(self) : 
-        # TODO make this dynamic 
-        return {
-                (OrderType.Market, OrderSide.Buy) : lambda root, order : self._fill_market_order(root, order), 
-                (OrderType.Market, OrderSide.Sell) : lambda root, order : self._fill_market_order(root, order),  
-                (OrderType.Limit, OrderSide.Buy) : lambda root, order : self._fill_limit_order(root, order),
-                (OrderType.Limit, OrderSide.Sell) : lambda root, order : self._fill_limit_order(root, order)}
+        self.depth_index = depth_index
+        self.bid_depth : DepthIndex | None = DepthIndex(tick_size, descending=True) if depth_index else None
+        self.ask_depth : DepthIndex | None = DepthIndex(tick_size) if depth_index else None
+        self.order_map : dict[str, LinkedListNode | Order] = {} # order id -> queue handle of its level type
+        self.agent_orders : dict[int, dict[str, Order]] = {} # id(agent) -> its resting and stop orders by id
+        self.stops = TriggerIndex()
+        self.policy = policy if policy is not None else FifoPolicy()
+
+        # call auction phase : orders accumulate without matching until uncross()
+        self.in_auction = False
+        self._auction_market_buys : list[Order] = []
+        self._auction_market_sells : list[Order] = []
+        self._auction_expiring : list[Order] = [] # resting IOC orders, canceled after the uncross
+
+    def _depth_of(self, tree : AVLTree) -> DepthIndex | None :
+        return self.bid_depth if tree is self.buy_side_tree else self.ask_depth
+
+    def _index_order(self, order : Order) -> None :
+        self.agent_orders.setdefault(id(order.agent), {})[order.id] = order
+
+    def _unindex_order(self, order : Order) -> None :
+        owned = self.agent_orders.get(id(order.agent))
+        if owned is not None :
+            owned.pop(order.id, None)
+            if not owned :
+                del self.agent_orders[id(order.agent)]
 
     def _insert_to_tree(self, order : Order, tree : AVLTree) -> None: 
+        # the indexes follow the tree, so nothing refers to the order unless it rests
         if price_level := tree.search(order.offer) : 
-            price_level.insert_order(order)
-            if price_level.tail : 
-                self.order_map[order.id] = price_level.tail 
+            handle = price_level.insert_order(order)
+            tree.add_quantity(price_level.price, order.quantity)
         else : 
-            new_price_level = PriceLevel(price=order.offer) 
-            new_price_level.insert_order(order)
+            new_price_level = self.level_type(price=order.offer) 
+            handle = new_price_level.insert_order(order)
             tree.insert(TreeNode(value=new_price_level))
-
-            if new_price_level.tail : 
-                self.order_map[order.id] = new_price_level.tail
+        self.order_map[order.id] = handle
+        self._index_order(order)
+        if (depth := self._depth_of(tree)) is not None :
+            depth.add(order.offer, order.quantity)
+
+    def restore(self, buy_levels : list[PriceLevel], sell_levels : list[PriceLevel], stops : TriggerIndex | None = None,
+                in_auction : bool = False, auction_market_orders : list[Order] | None = None) -> None :
+        # levels must be sorted by ascending price, replaces whatever the book held; a book
+        # restored in auction gets back the market orders it had queued for the uncross
+        self.buy_side_tree = AVLTree.from_sorted(buy_levels)
+        self.sell_side_tree = AVLTree.from_sorted(sell_levels)
+        if self.depth_index :
+            self.bid_depth = DepthIndex(self.tick_size, descending=True)
+            self.ask_depth = DepthIndex(self.tick_size)
+            for price_level in buy_levels :
+                self.bid_depth.add(price_level.price, price_level.quantity)
+            for price_level in sell_levels :
+                self.ask_depth.add(price_level.price, price_level.quantity)
+
+        self.stops = stops if stops is not None else TriggerIndex()
+        self.order_map = {}
+        self.agent_orders = {}
+        self.in_auction = in_auction
+        queued = auction_market_orders or []
+        self._auction_market_buys = [order for order in queued if order.side == OrderSide.Buy]
+        self._auction_market_sells = [order for order in queued if order.side == OrderSide.Sell]
+        self._auction_expiring = []
+        for price_level in (*buy_levels, *sell_levels) :
+            for handle, order in price_level :
+                self.order_map[order.id] = handle
+                self._index_order(order)
+                if order.time_in_force != TimeInForce.GoodTillCancel :
+                    # only rests during a call auction, still canceled by its uncross
+                    self._auction_expiring.append(order)
+        for order in self.stops.orders() :
+            self._index_order(order)
 
     def insert(self, order : Order) :
         
@@ -51,78 +111,103 @@ class OrderBook :
         else : 
             raise TypeError(f"Wrong Asset")
 
+    def add_stop(self, order : Order) -> None :
+        if order.asset.type != self.asset_type :
+            raise TypeError(f"Wrong Asset")
+        self.stops.add(order)
+        self._index_order(order)
+
+    def release_stops(self, last_price : Decimal) -> list[Order] :
+        released = self.stops.release(last_price)
+        for order in released :
+            self._unindex_order(order)
+        return released
+
     def cancel(self, order_id : str) -> bool :
         pointer = self.order_map.get(order_id)
         if pointer is None:
+            stop = self.stops.cancel(order_id)
+            if stop is not None :
+                stop.status = OrderStatus.CANCELED
+                self._unindex_order(stop)
+                return True
             return False
 
-        side = pointer.value.side
-        price = pointer.value.offer
+        order = self.level_type.order_of(pointer)
+        side = order.side
+        price = order.offer
 
-        if side == OrderSide.Buy:
-            price_level = self.buy_side_tree.search(price)
-        else:
-            price_level = self.sell_side_tree.search(price)
+        tree = self.buy_side_tree if side == OrderSide.Buy else self.sell_side_tree
+        price_level = tree.search(price)
         
         if price_level:  
+            remaining = order.quantity
+            price_level.quantity -= remaining
+            tree.add_quantity(price, -remaining)
+            if (depth := self._depth_of(tree)) is not None :
+                depth.add(price, -remaining)
 
-            if pointer.prev:
-                pointer.prev.next = pointer.next
-            else:
-                price_level.levels = pointer.next 
-
-            if pointer.next:
-                pointer.next.prev = pointer.prev
-            else:
-                price_level.tail = pointer.prev  
-
+            order.status = OrderStatus.CANCELED
+            price_level.remove_order(pointer)
             del self.order_map[order_id]
+            self._unindex_order(order)
 
             # If the price level is empty, remove from AVL tree
-            if price_level and price_level.levels is  None :
-                # TODO Stop using dummy nodes instead just use price to compare -> less memory  
-                if side == OrderSide.Buy:
-                    self.buy_side_tree.delete(TreeNode(value=PriceLevel(price=price))) 
-                else:
-                    self.sell_side_tree.delete(TreeNode(value=PriceLevel(price=price)))
+            if price_level.is_empty() :
+                tree.delete(price)
             
             return True 
 
          
         raise RuntimeError(f"Order exists but its price level doesn't")
 
+    def cancel_all(self, agent : Agent) -> list[Order] :
+        # cancels every resting and stop order of `agent`, O(orders owned); quantities and
+        # emptied levels are settled once per touched level instead of once per order
+        owned = self.agent_orders.pop(id(agent), None)
+        if not owned :
+            return []
+
+        canceled : list[Order] = []
+        touched : dict[tuple[OrderSide, Decimal], list] = {} # -> [tree, price level, quantity removed]
+        for order_id, order in owned.items() :
+            pointer = self.order_map.pop(order_id, None)
+            if pointer is None :
+                if self.stops.cancel(order_id) is not None :
+                    order.status = OrderStatus.CANCELED
+                    canceled.append(order)
+                continue
+
+            key = (order.side, order.offer)
+            entry = touched.get(key)
+            if entry is None :
+                tree = self.buy_side_tree if order.side == OrderSide.Buy else self.sell_side_tree
+                entry = touched[key] = [tree, tree.search(order.offer), Decimal(0)]
+            entry[2] += order.quantity
+            order.status = OrderStatus.CANCELED
+            entry[1].remove_order(pointer)
+            canceled.append(order)
 
-    def get_best_bid(self) -> PriceLevel | None : 
-        if self.buy_side_tree.root is not None : 
-            node = self._get_best_bid(self.buy_side_tree.root) 
-            price_level = node.value 
-            return price_level
-        return None 
-
-    def get_best_ask(self) -> PriceLevel | None: 
-        if self.sell_side_tree.root is not None: 
-            node = self._get_best_ask(self.sell_side_tree.root)
-            price_level = node.value
-            return price_level
-        return None
-
-    def _get_best_bid(self, node : TreeNode) -> TreeNode: 
-
-        while node.right : 
-            node = node.right 
+        for tree, price_level, removed in touched.values() :
+            price_level.quantity -= removed
+            tree.add_quantity(price_level.price, -removed)
+            if (depth := self._depth_of(tree)) is not None :
+                depth.add(price_level.price, -removed)
+            if price_level.is_empty() :
+                tree.delete(price_level.price)
 
-        return node
+        return canceled
 
-    def _get_best_ask(self, node : TreeNode) -> TreeNode:
 
-        while node.left : 
-            node = node.left 
+    def get_best_bid(self) -> PriceLevel | None : 
+        return self.buy_side_tree.max_level()
 
-        return node 
+    def get_best_ask(self) -> PriceLevel | None: 
+        return self.sell_side_tree.min_level()
         
     def get_order(self, order_id : str) -> Order | None: 
         pointer = self.order_map.get(order_id, None)
-        return pointer.value if pointer else None
+        return self.level_type.order_of(pointer) if pointer else None
     
 
     def _create_default_trade(self, buyer : Agent, seller : Agent, asset : Asset) -> Trade :
@@ -130,140 +215,287 @@ class OrderBook :
         return Trade(buyer, seller, str(uuid4()), asset, quantity=Decimal(0), amount_exchanged=Decimal(0))
  
     
-    def _fill_market_at_price_level(self, price_level : PriceLevel, order : Order) -> list[Trade]  :
-        
+    def _fill_at_price_level(self, price_level : PriceLevel, order : Order) -> list[Trade]  :
+        # the policy decides who trades, every trade is priced at the resting offer
         trades = [ ]
-        order_slot = price_level.levels
+        buying = order.side == OrderSide.Buy
 
-        while order_slot and order.quantity > 0: 
-            current_order = order_slot.value 
-            order_quantity_difference = current_order.quantity - order.quantity 
-            
-            if order.side == OrderSide.Buy : 
+        for order_slot, current_order, quantity in self.policy.allocate(price_level, order.quantity) :
+            if buying : 
                 trade = self._create_default_trade(buyer = order.agent, seller = current_order.agent, asset = order.asset)
             else : 
                 trade = self._create_default_trade(buyer = current_order.agent, seller = order.agent, asset = order.asset)
+            trade.quantity = quantity 
+            trade.amount_exchanged = quantity * current_order.offer 
+            trades.append(trade)
 
-            if order_quantity_difference >= 0 : 
-                # fill  
-                amount_exchanged = order.quantity * current_order.offer # could be either 
-                trade.quantity = order.quantity 
-                trade.amount_exchanged = amount_exchanged 
-                trades.append(trade) 
-                
-                current_order.quantity -= order.quantity 
-                order.quantity = Decimal(0) 
-                order.status = OrderStatus.FILLED
-                
-                if current_order.quantity == 0 : 
-                    current_order.status = OrderStatus.FILLED 
-                    self._delete_order_from_price_level(price_level, order_slot)
-
-                return trades 
-
-            else : 
-                #take                
-                amount_exchanged = current_order.offer * current_order.quantity # this quantity is less than 
-                trade.quantity = current_order.quantity 
-                trade.amount_exchanged = amount_exchanged
-                trades.append(trade)
-
-                order.quantity -= current_order.quantity
-                current_order.quantity = Decimal(0) 
+            order.quantity -= quantity 
+            current_order.quantity -= quantity 
+            if current_order.quantity == 0 : 
                 current_order.status = OrderStatus.FILLED 
                 self._delete_order_from_price_level(price_level, order_slot)
 
-            order_slot = order_slot.next 
-
+        if order.quantity == 0 : 
+            order.status = OrderStatus.FILLED 
         return trades 
     
-    def _delete_order_from_price_level(self, price_level : PriceLevel, node : LinkedListNode) -> None: 
-
-        if node.prev : 
-            node.prev.next = node.next 
-        else : 
-            price_level.levels = node.next 
-
-        if node.next : 
-            node.next.prev = node.prev 
-        else : 
-            price_level.tail = node.prev 
+    def _delete_order_from_price_level(self, price_level : PriceLevel, handle : LinkedListNode | Order) -> None: 
+        order = self.level_type.order_of(handle)
+        self.order_map.pop(order.id, None)
+        self._unindex_order(order)
+        price_level.remove_order(handle)
              
  
-    def market_order_matching_function(self, price_level : PriceLevel, order : Order, trades : list[Trade]) : 
-        trades.extend(self._fill_market_at_price_level(price_level, order))
-
-    def _fill_market_order(self, tree : AVLTree, order : Order) :
-        trades = [] 
-        root = tree.root
-        if tree.root is None :
-            order.status = OrderStatus.CANCELED
-            return trades 
-
-        side = OrderSide.Buy if order.side == OrderSide.Sell else OrderSide.Sell
-        fill_order(side)(matching_function=OrderBook.market_order_matching_function)(self, root, order, trades)
-        return trades 
-
-    def _fill_limit_order(self, tree : AVLTree, order : Order) : 
-        price_level = tree.search(order.offer) 
-        trades =  []
-        if price_level : 
-            self.market_order_matching_function(price_level, order, trades) 
-        return trades    
+    def _sweep(self, tree : AVLTree, order : Order, limit : Decimal | None) -> list[Trade] :
+        # walk the opposite side from its best level until the order is filled or the next
+        # level no longer crosses `limit`, emptied levels are unlinked once the walk is done
+        trades : list[Trade] = []
+        emptied : list[Decimal] = []
+        buying = order.side == OrderSide.Buy
+        levels = tree.ascending() if buying else tree.descending()
+        depth = self._depth_of(tree)
+
+        for price_level in levels :
+            if order.quantity <= 0 :
+                break
+            if limit is not None and (price_level.price > limit if buying else price_level.price < limit) :
+                break
+            if price_level.is_empty() :
+                continue
+
+            start = len(trades)
+            trades.extend(self._fill_at_price_level(price_level, order))
+            traded = sum((trade.quantity for trade in trades[start:]), Decimal(0))
+            price_level.quantity -= traded
+            tree.add_quantity(price_level.price, -traded)
+            if depth is not None :
+                depth.add(price_level.price, -traded)
+
+            if price_level.is_empty() :
+                emptied.append(price_level.price)
+
+        for price in emptied :
+            tree.delete(price)
+
+        return trades
+
+    def fillable_quantity(self, order : Order) -> Decimal :
+        # quantity resting on the opposite side that `order` could take right now, O(log levels)
+        tree = self.sell_side_tree if order.side == OrderSide.Buy else self.buy_side_tree 
+        if order.type == OrderType.Market :
+            return tree.total_quantity()
+        if order.type != OrderType.Limit :
+            return Decimal(0) # match() rejects it
+        if order.side == OrderSide.Buy :
+            return tree.quantity_up_to(order.offer)
+        return tree.quantity_from(order.offer)
  
     def match(self, order : Order) : 
         if order.asset.type != self.asset_type : 
             raise TypeError(f"Order asset type {order.asset} is not the same as the Orderbook asset type {self.asset_type}")
+
+        if order.type not in (OrderType.Limit, OrderType.Market) :
+            # stops only reach the book through add_stop; OrderType.GoodTillCancel predates
+            # TimeInForce and is not a matchable type, a resting limit is Limit + GoodTillCancel
+            order.status = OrderStatus.CANCELED
+            return []
+
+        if self.in_auction :
+            self._queue_for_auction(order)
+            return []
+
+        if order.time_in_force == TimeInForce.FillOrKill and self.fillable_quantity(order) < order.quantity :
+            order.status = OrderStatus.CANCELED
+            return []
         
         tree = self.sell_side_tree if order.side == OrderSide.Buy else self.buy_side_tree 
-        fill = self.dispatcher[(order.type, order.side)]
-        trades = fill(tree, order) 
+        trades = self._sweep(tree, order, limit=order.offer if order.type == OrderType.Limit else None)
         if order.status != OrderStatus.FILLED : 
-            self.insert(order)
+            if order.time_in_force == TimeInForce.GoodTillCancel :
+                self.insert(order)
+            else :
+                order.status = OrderStatus.CANCELED
         return trades 
+
+    def start_auction(self) -> None :
+        self.in_auction = True
+
+    def _queue_for_auction(self, order : Order) -> None :
+        # limit orders rest in the trees right away, so the book may be crossed until the uncross
+        if order.time_in_force == TimeInForce.FillOrKill :
+            # all or nothing can't be decided before the equilibrium is known
+            order.status = OrderStatus.CANCELED
+        elif order.type == OrderType.Market :
+            queue = self._auction_market_buys if order.side == OrderSide.Buy else self._auction_market_sells
+            queue.append(order)
+        else :
+            self.insert(order)
+            if order.time_in_force != TimeInForce.GoodTillCancel :
+                self._auction_expiring.append(order)
+
+    def equilibrium_price(self, reference : Decimal | None = None) -> tuple[Decimal | None, Decimal] :
+        # (price, volume) maximizing the executed volume min(demand, supply), ties go to the
+        # smallest imbalance then to the price closest to `reference`; one ascending pass over
+        # every level with demand = bids at or above the price, supply = asks at or below it
+        bids = [(level.price, level.quantity) for level in self.buy_side_tree if level.quantity > 0]
+        asks = [(level.price, level.quantity) for level in self.sell_side_tree if level.quantity > 0]
+        prices = {price for price, _ in bids} | {price for price, _ in asks}
+        if reference is not None :
+            prices.add(reference)
+
+        demand = sum((order.quantity for order in self._auction_market_buys), Decimal(0)) + self.buy_side_tree.total_quantity()
+        supply = sum((order.quantity for order in self._auction_market_sells), Decimal(0))
+
+        best_price : Decimal | None = None
+        best_key = None
+        i = j = 0
+        for price in sorted(prices) :
+            while j < len(asks) and asks[j][0] <= price :
+                supply += asks[j][1]
+                j += 1
+            while i < len(bids) and bids[i][0] < price :
+                demand -= bids[i][1]
+                i += 1
+
+            volume = min(demand, supply)
+            if volume <= 0 :
+                continue
+            distance = abs(price - reference) if reference is not None else Decimal(0)
+            key = (volume, -abs(demand - supply), -distance)
+            if best_key is None or key > best_key :
+                best_key = key
+                best_price = price
+
+        if best_price is None :
+            return None, Decimal(0)
+        return best_price, best_key[0]
+
+    def _auction_queue(self, market_orders : list[Order], tree : AVLTree, price : Decimal, buying : bool) :
+        # (level, handle, order) in execution priority : market orders, then price, then time
+        for order in market_orders :
+            yield None, None, order
+        for price_level in (tree.descending() if buying else tree.ascending()) :
+            if price_level.price < price if buying else price_level.price > price :
+                return
+            for handle, order in price_level :
+                yield price_level, handle, order
+
+    def uncross(self, reference : Decimal | None = None) -> list[Trade] :
+        # ends the call phase, every crossing order executes at the single equilibrium price
+        self.in_auction = False
+        price, volume = self.equilibrium_price(reference)
+
+        trades : list[Trade] = []
+        if price is not None :
+            buys = self._auction_queue(self._auction_market_buys, self.buy_side_tree, price, buying=True)
+            sells = self._auction_queue(self._auction_market_sells, self.sell_side_tree, price, buying=False)
+            emptied : list[tuple[AVLTree, Decimal]] = []
+            buy = next(buys)
+            sell = next(sells)
+
+            while volume > 0 :
+                buy_order = buy[2]
+                sell_order = sell[2]
+                quantity = min(buy_order.quantity, sell_order.quantity, volume)
+                trades.append(Trade(buy_order.agent, sell_order.agent, str(uuid4()), buy_order.asset, quantity, quantity * price))
+                volume -= quantity
+
+                if self._take_in_auction(self.buy_side_tree, buy, quantity, emptied) :
+                    buy = next(buys, None)
+                if self._take_in_auction(self.sell_side_tree, sell, quantity, emptied) :
+                    sell = next(sells, None)
+
+            for tree, level_price in emptied :
+                tree.delete(level_price)
+
+        for order in (*self._auction_market_buys, *self._auction_market_sells) :
+            if order.status != OrderStatus.FILLED :
+                order.status = OrderStatus.CANCELED
+        for order in self._auction_expiring :
+            if order.id in self.order_map :
+                self.cancel(order.id)
+        self._auction_market_buys = []
+        self._auction_market_sells = []
+        self._auction_expiring = []
+        return trades
+
+    def _take_in_auction(self, tree : AVLTree, entry : tuple, quantity : Decimal, emptied : list) -> bool :
+        # takes `quantity` from one queued order, True once it is filled
+        price_level, handle, order = entry
+        order.quantity -= quantity
+        if price_level is not None :
+            price_level.quantity -= quantity
+            tree.add_quantity(price_level.price, -quantity)
+            if (depth := self._depth_of(tree)) is not None :
+                depth.add(price_level.price, -quantity)
+
+        if order.quantity > 0 :
+            return False
+        order.status = OrderStatus.FILLED
+        if price_level is not None :
+            self._delete_order_from_price_level(price_level, handle)
+            if price_level.is_empty() :
+                emptied.append((tree, price_level.price))
+        return True
     
     def get_top_bids(self, n: int) -> list[tuple[Decimal, Decimal]]:
         results: list[tuple[Decimal, Decimal]] = []
-        def traverse(node):
-            if not node or len(results) >= n:
-                return
-            
-            traverse(node.right)
-
-            if len(results) < n:
-                price_level: PriceLevel = node.value
-                total_qty = Decimal(0)
-                current = price_level.levels
-                while current:
-                    total_qty += current.value.quantity
-                    current = current.next
-                if total_qty > 0:
-                    results.append((price_level.price, total_qty))
-
-            traverse(node.left)
-
-        traverse(self.buy_side_tree.root)
+        for price_level in self.buy_side_tree.descending():
+            if len(results) >= n:
+                break
+            if price_level.quantity > 0:
+                results.append((price_level.price, price_level.quantity))
         return results
 
     def get_top_asks(self, n: int) -> list[tuple[Decimal, Decimal]]:
         results: list[tuple[Decimal, Decimal]] = []
-        def traverse(node):
-            if not node or len(results) >= n:
-                return
-            
-            traverse(node.left)
-
-            if len(results) < n:
-                price_level: PriceLevel = node.value
-                total_qty = Decimal(0)
-                current = price_level.levels
-                while current:
-                    total_qty += current.value.quantity
-                    current = current.next
-                if total_qty > 0:
-                    results.append((price_level.price, total_qty))
-
-            traverse(node.right)
-
-        traverse(self.sell_side_tree.root)
+        for price_level in self.sell_side_tree.ascending():
+            if len(results) >= n:
+                break
+            if price_level.quantity > 0:
+                results.append((price_level.price, price_level.quantity))
         return results
+
+    # Depth queries, `side` is the resting side : OrderSide.Sell asks about the asks a buyer
+    # would take, OrderSide.Buy about the bids a seller would hit. All are O(log levels), or
+    # per tick bucket through the DepthIndex when the book keeps one.
+
+    def depth_to(self, side : OrderSide, price : Decimal) -> Decimal :
+        # resting quantity at prices at or better than `price`
+        depth = self.bid_depth if side == OrderSide.Buy else self.ask_depth
+        if depth is not None :
+            return depth.depth_to(price)
+        if side == OrderSide.Buy :
+            return self.buy_side_tree.quantity_from(price)
+        return self.sell_side_tree.quantity_up_to(price)
+
+    def cost_to_fill(self, side : OrderSide, quantity : Decimal) -> Decimal | None :
+        # notional paid (or received) taking `quantity` from `side`, None if the side is too thin
+        depth = self.bid_depth if side == OrderSide.Buy else self.ask_depth
+        if depth is not None :
+            filled, notional = depth.cost_to_fill(quantity)
+            return notional if filled == quantity and quantity > 0 else None
+        tree = self.buy_side_tree if side == OrderSide.Buy else self.sell_side_tree
+        taken = tree.fill_cost(quantity, descending=side == OrderSide.Buy)
+        return taken[0] if taken is not None else None
+
+    def vwap_to_fill(self, side : OrderSide, quantity : Decimal) -> Decimal | None :
+        notional = self.cost_to_fill(side, quantity)
+        return notional / quantity if notional is not None else None
+
+    def impact_cost(self, side : OrderSide, quantity : Decimal) -> Decimal | None :
+        # how far the average fill price is from the best price of `side`, per unit
+        vwap = self.vwap_to_fill(side, quantity)
+        best = self.get_best_bid() if side == OrderSide.Buy else self.get_best_ask()
+        if vwap is None or best is None :
+            return None
+        return best.price - vwap if side == OrderSide.Buy else vwap - best.price
+
+    def price_at_depth(self, side : OrderSide, quantity : Decimal) -> Decimal | None :
+        # price of the level where cumulative depth from the best price reaches `quantity`
+        depth = self.bid_depth if side == OrderSide.Buy else self.ask_depth
+        if depth is not None :
+            return depth.price_at_depth(quantity)
+        tree = self.buy_side_tree if side == OrderSide.Buy else self.sell_side_tree
+        taken = tree.fill_cost(quantity, descending=side == OrderSide.Buy)
+        return taken[1].price if taken is not None else None
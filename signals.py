@@ -0,0 +1,119 @@
+# Per-asset features shared by every behavior, so each is computed once per update instead of
+# once per agent. Prices are sampled once per step for momentum and realized volatility, the
+# top of book is pushed by the Market after every order that reaches a book.
+from collections import deque
+from dataclasses import dataclass, field
+from decimal import Decimal
+from uuid import UUID
+from generics import Asset
+import math
+
+@dataclass
+class AssetSignals :
+    best_bid : Decimal | None = None
+    bid_quantity : Decimal = Decimal(0)
+    best_ask : Decimal | None = None
+    ask_quantity : Decimal = Decimal(0)
+    samples : deque = field(default_factory=deque)  # sampled prices, newest last
+    returns : deque = field(default_factory=deque)  # log returns between samples, newest last
+    sum_squares : float = 0.0                       # of `returns`
+
+
+class SignalCache :
+
+    """
+    SignalCache keeps rolling features for every asset, each update is O(1).
+
+    Public Methods:
+        - on_book(asset_id, best_bid, bid_quantity, best_ask, ask_quantity): Record a new top of book.
+        - sample(asset_id) / step(): Record the current price of one / every asset.
+        - momentum(asset_id, window): Current price minus the price `window - 1` samples ago.
+        - check_window(window): Raise ValueError if momentum(window) can't be served.
+        - mid(asset_id): Midpoint of the best bid and ask.
+        - microprice(asset_id): Mid weighted towards the side with less resting quantity.
+        - imbalance(asset_id): (bid - ask) / (bid + ask) resting quantity at the top, in [-1, 1].
+        - volatility(asset_id): Realized volatility, sqrt of the summed squared log returns
+          over the last `volatility_window` samples.
+
+    Features that can't be computed yet (one sided book, too few samples) are None.
+    """
+
+    def __init__(self, assets : dict[UUID, Asset], max_window : int = 64, volatility_window : int = 20) -> None :
+        self.assets = assets
+        self.max_window = max_window
+        self.volatility_window = volatility_window
+        self._signals : dict[UUID, AssetSignals] = {}
+
+    def _of(self, asset_id : UUID) -> AssetSignals :
+        signals = self._signals.get(asset_id)
+        if signals is None :
+            signals = AssetSignals(samples=deque(maxlen=self.max_window), returns=deque(maxlen=self.volatility_window))
+            signals = self._signals.setdefault(asset_id, signals)
+        return signals
+
+    def on_book(self, asset_id : UUID, best_bid : Decimal | None, bid_quantity : Decimal,
+                best_ask : Decimal | None, ask_quantity : Decimal) -> None :
+        signals = self._of(asset_id)
+        signals.best_bid = best_bid
+        signals.bid_quantity = bid_quantity
+        signals.best_ask = best_ask
+        signals.ask_quantity = ask_quantity
+
+    def sample(self, asset_id : UUID) -> None :
+        signals = self._of(asset_id)
+        price = self.assets[asset_id].price
+        samples = signals.samples
+        if samples and samples[-1] > 0 and price > 0 :
+            r = math.log(float(price / samples[-1]))
+            returns = signals.returns
+            if len(returns) == returns.maxlen :
+                signals.sum_squares -= returns[0] * returns[0]
+            returns.append(r)
+            signals.sum_squares += r * r
+        samples.append(price)
+
+    def step(self) -> None :
+        for asset_id in self.assets :
+            self.sample(asset_id)
+
+    def check_window(self, window : int) -> None :
+        if window > self.max_window + 1 :
+            raise ValueError(f"Momentum window {window} is longer than the {self.max_window + 1} prices kept")
+
+    def momentum(self, asset_id : UUID, window : int) -> Decimal | None :
+        self.check_window(window)
+        samples = self._of(asset_id).samples
+        if window < 2 or len(samples) < window - 1 :
+            return None
+        return self.assets[asset_id].price - samples[-(window - 1)]
+
+    def mid(self, asset_id : UUID) -> Decimal | None :
+        signals = self._of(asset_id)
+        if signals.best_bid is None or signals.best_ask is None :
+            return None
+        return (signals.best_bid + signals.best_ask) / 2
+
+    def microprice(self, asset_id : UUID) -> Decimal | None :
+        signals = self._of(asset_id)
+        if signals.best_bid is None or signals.best_ask is None :
+            return None
+        total = signals.bid_quantity + signals.ask_quantity
+        if total == 0 :
+            return (signals.best_bid + signals.best_ask) / 2
+        return (signals.best_bid * signals.ask_quantity + signals.best_ask * signals.bid_quantity) / total
+
+    def imbalance(self, asset_id : UUID) -> float | None :
+        signals = self._of(asset_id)
+        total = signals.bid_quantity + signals.ask_quantity
+        if total == 0 :
+            return None
+        return float((signals.bid_quantity - signals.ask_quantity) / total)
+
+    def volatility(self, asset_id : UUID) -> float | None :
+        signals = self._of(asset_id)
+        if not signals.returns :
+            return None
+        return math.sqrt(max(signals.sum_squares, 0.0))
+
+
+__all__ = ["AssetSignals", "SignalCache"]
@@ -0,0 +1,94 @@
+from decimal import Decimal
+from uuid import uuid4
+from agent import Agent
+from generics import Asset, OrderSide
+from market import Market
+from behaviors import RandomTrader, MarketMaker, MomentumTrader
+from bars import BarAggregator, Resolution, STEP
+from signals import SignalCache
+import math
+import random
+
+NUM_AGENTS = 200
+SIMULATION_STEPS = 100
+TRADES_TO_SHOW = 50
+
+BEHAVIORS = {
+    "RandomTrader" : RandomTrader,
+    "MarketMaker" : MarketMaker,
+    "MomentumTrader" : MomentumTrader,
+}
+
+def setup_market(num_agents=NUM_AGENTS, behavior_mix=None, behavior_kwargs=None):
+    # behavior_mix : behavior name -> relative weight, defaults to an even split
+    # behavior_kwargs : behavior name -> constructor keyword arguments
+    behavior_mix = behavior_mix or {name : 1 for name in BEHAVIORS}
+    behavior_kwargs = behavior_kwargs or {}
+    names = list(behavior_mix)
+    weights = [behavior_mix[name] for name in names]
+
+    apple_stock = Asset(
+        type="stock",
+        id=uuid4(),
+        price=Decimal(150),
+        quantity=Decimal(1000)
+    )
+    agents = {}
+    for _ in range(num_agents):
+        cash = Decimal(random.randint(50_000, 150_000))
+        portfolio = {apple_stock.id: Decimal(random.randint(0, 100))} if random.random() < 0.3 else {}
+        name = random.choices(names, weights)[0]
+        behavior = BEHAVIORS[name](**behavior_kwargs.get(name, {}))
+        agent = Agent(cash, portfolio, behavior=behavior)
+        agents[uuid4()] = agent
+    market = Market(agents, {apple_stock.id: apple_stock})
+    max_window = max([64] + [kwargs.get("memory", 0) for kwargs in behavior_kwargs.values()])
+    market.attach_signals(SignalCache(market.assets, max_window=max_window))
+    return market, list(agents.values()), apple_stock
+
+def simulate_step(market, agents, asset, auction=False, end_step=True):
+    # auction : collect every decision of the step and execute them in one call auction
+    # end_step : close the step on the market, which samples the SignalCache the momentum
+    # traders read and rolls the per step bars; pass False to read the step's bars first and
+    # call market.end_step() yourself
+    if auction:
+        market.start_auction(asset)
+    for agent in agents:
+        order = agent.behavior.decide(agent, asset, market.signals)
+        if order is None:
+            continue
+        if order.side == OrderSide.Buy:
+            market.buy(asset, agent, order)
+        else:
+            market.sell(asset, agent, order)
+    if auction:
+        market.uncross(asset)
+    if end_step:
+        market.end_step()
+
+def run_simulation(market, agents, asset, steps):
+    price_history = []
+    bid_history = []
+    ask_history = []
+    volume_history = []
+
+    if market.bars is None:
+        market.attach_bars(BarAggregator({STEP: Resolution(STEP)}))
+    step_bars = market.bars.series(asset.id, STEP)
+
+    row = None
+    for step in range(steps):
+        simulate_step(market, agents, asset, end_step=False)
+
+        snapshot = market.snapshot(depth=1)
+        if row is None:
+            row = snapshot.asset_ids.index(asset.id)
+        best_bid = snapshot.best_bid[row]
+        best_ask = snapshot.best_ask[row]
+        price_history.append(float(snapshot.last_price[row]))
+        bid_history.append(None if math.isnan(best_bid) else float(best_bid))
+        ask_history.append(None if math.isnan(best_ask) else float(best_ask))
+        volume_history.append(step_bars.last("volume"))
+        market.end_step()
+
+        yield price_history, bid_history, ask_history, volume_history, market.history[-TRADES_TO_SHOW:], market
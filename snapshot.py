@@ -0,0 +1,312 @@
+# Compact binary snapshot of a Market : agent balances, asset prices and both sides of every
+# OrderBook with their FIFO queues. Restoring bulk-builds balanced trees from the sorted levels.
+#
+# Layout (little endian) :
+#   header      MAGIC, u32 decimals, u32 agents, u32 assets, u32 books
+#   decimals    u16 length + ascii per distinct Decimal, everything below refers to them by index
+#   agents      16s uuid, u32 cash, u32 positions, then (16s asset uuid, u32 quantity) per position
+#   assets      16s uuid, u32 price
+#   books       16s asset uuid, then buy side and sell side, each :
+#                 u32 levels, u32 orders, u8 id mode
+#                 levels  (u32 price, u32 orders) per level, ascending price
+#                 orders  (u32 agent, u32 quantity, u8 type, u8 time in force) per order, in level then FIFO order
+#                 ids     16 bytes per order when every id is a uuid string, else u16 length + utf8
+#               then the pending stop orders :
+#                 u32 stops, u8 id mode
+#                 stops   (u32 agent, u32 quantity, u8 type, u8 side, u8 time in force, u32 trigger, u32 offer) per stop
+#                 ids     as above
+#               then the call auction state :
+#                 u8 in auction, u32 queued, u8 id mode
+#                 queued  (u32 agent, u32 quantity, u8 side, u8 time in force) per market order waiting for
+#                         the uncross, buys then sells in arrival order
+#                 ids     as above
+from decimal import Decimal
+from uuid import UUID
+from generics import Order, OrderSide, OrderType, OrderStatus, PriceLevel, TimeInForce
+from market import Market
+from datastructures import TriggerIndex
+import struct
+
+MAGIC = b"EXSNAP04"
+
+_HEADER = struct.Struct("<8sIIII")
+_U16 = struct.Struct("<H")
+_AGENT = struct.Struct("<16sII")
+_POSITION = struct.Struct("<16sI")
+_ASSET = struct.Struct("<16sI")
+_SIDE = struct.Struct("<IIB")
+_LEVEL = struct.Struct("<II")
+_ORDER = struct.Struct("<IIBB")
+_STOPS = struct.Struct("<IB")
+_STOP = struct.Struct("<IIBBBII")
+_AUCTION = struct.Struct("<BIB")
+_QUEUED = struct.Struct("<IIBB")
+
+_ID_UUID = 0
+_ID_TEXT = 1
+
+_ORDER_TYPES = {order_type.value : order_type for order_type in OrderType}
+_ORDER_SIDES = {order_side.value : order_side for order_side in OrderSide}
+_TIMES_IN_FORCE = {time_in_force.value : time_in_force for time_in_force in TimeInForce}
+
+
+class _DecimalTable :
+    def __init__(self) -> None:
+        self.index : dict[str, int] = {}
+        self.values : list[str] = []
+
+    def __call__(self, value : Decimal) -> int :
+        # keyed by the string so 1 and 1.0 keep their own exponent
+        key = str(value)
+        idx = self.index.get(key)
+        if idx is None :
+            idx = self.index[key] = len(self.values)
+            self.values.append(key)
+        return idx
+
+
+def _is_uuid_text(order_id : str) -> bool :
+    try :
+        return str(UUID(order_id)) == order_id
+    except ValueError :
+        return False
+
+def _uuid_text(raw : bytes) -> str :
+    h = raw.hex()
+    return f"{h[:8]}-{h[8:12]}-{h[12:16]}-{h[16:20]}-{h[20:]}"
+
+
+def _encode_ids(ids : list[str]) -> tuple[int, bytes] :
+    if all(_is_uuid_text(order_id) for order_id in ids) :
+        return _ID_UUID, b"".join(UUID(order_id).bytes for order_id in ids)
+    encoded = [order_id.encode() for order_id in ids]
+    return _ID_TEXT, b"".join(_U16.pack(len(raw)) + raw for raw in encoded)
+
+def _decode_ids(data : memoryview, offset : int, count : int, id_mode : int) -> tuple[list[str], int] :
+    if id_mode == _ID_UUID :
+        raw = bytes(data[offset : offset + 16 * count])
+        return [_uuid_text(raw[i : i + 16]) for i in range(0, len(raw), 16)], offset + 16 * count
+
+    ids = []
+    for _ in range(count) :
+        (length,) = _U16.unpack_from(data, offset)
+        offset += _U16.size
+        ids.append(bytes(data[offset : offset + length]).decode())
+        offset += length
+    return ids, offset
+
+def _agent_of(order : Order, agent_index : dict[int, int]) -> int :
+    agent = agent_index.get(id(order.agent))
+    if agent is None :
+        raise ValueError(f"Order {order.id} belongs to an agent that is not a trader of this market")
+    return agent
+
+
+def _encode_side(levels : list[PriceLevel], decimal, agent_index : dict[int, int]) -> list[bytes] :
+    level_records = []
+    order_records = []
+    ids = []
+
+    for price_level in levels :
+        count = 0
+        for _, order in price_level :
+            order_records.append(_ORDER.pack(_agent_of(order, agent_index), decimal(order.quantity), order.type.value,
+                                              order.time_in_force.value))
+            ids.append(order.id)
+            count += 1
+        level_records.append(_LEVEL.pack(decimal(price_level.price), count))
+
+    id_mode, id_block = _encode_ids(ids)
+    return [_SIDE.pack(len(level_records), len(order_records), id_mode), *level_records, *order_records, id_block]
+
+def _encode_stops(stops : list[Order], decimal, agent_index : dict[int, int]) -> list[bytes] :
+    records = [
+        _STOP.pack(_agent_of(order, agent_index), decimal(order.quantity), order.type.value, order.side.value,
+                   order.time_in_force.value, decimal(order.trigger), decimal(order.offer))
+        for order in stops
+    ]
+    id_mode, id_block = _encode_ids([order.id for order in stops])
+    return [_STOPS.pack(len(records), id_mode), *records, id_block]
+
+def _encode_auction(in_auction : bool, queued : list[Order], decimal, agent_index : dict[int, int]) -> list[bytes] :
+    records = [
+        _QUEUED.pack(_agent_of(order, agent_index), decimal(order.quantity), order.side.value, order.time_in_force.value)
+        for order in queued
+    ]
+    id_mode, id_block = _encode_ids([order.id for order in queued])
+    return [_AUCTION.pack(in_auction, len(records), id_mode), *records, id_block]
+
+
+def save_snapshot(market : Market, path : str) -> None :
+    decimal = _DecimalTable()
+    agents = list(market.traders.items())
+    agent_index = {id(agent) : i for i, (_, agent) in enumerate(agents)}
+    body : list[bytes] = []
+
+    for agent_id, agent in agents :
+        body.append(_AGENT.pack(agent_id.bytes, decimal(agent.cash), len(agent.portfolio)))
+        for asset_id, quantity in agent.portfolio.items() :
+            body.append(_POSITION.pack(asset_id.bytes, decimal(quantity)))
+
+    for asset_id, asset in market.assets.items() :
+        body.append(_ASSET.pack(asset_id.bytes, decimal(asset.price)))
+
+    for asset_id, orderbook in market.orderbook_asset_map.items() :
+        body.append(asset_id.bytes)
+        for tree in (orderbook.buy_side_tree, orderbook.sell_side_tree) :
+            levels = [price_level for price_level in tree if not price_level.is_empty()]
+            body.extend(_encode_side(levels, decimal, agent_index))
+        body.extend(_encode_stops(orderbook.stops.orders(), decimal, agent_index))
+        queued = [*orderbook._auction_market_buys, *orderbook._auction_market_sells]
+        body.extend(_encode_auction(orderbook.in_auction, queued, decimal, agent_index))
+
+    table = []
+    for key in decimal.values :
+        raw = key.encode()
+        table.append(_U16.pack(len(raw)) + raw)
+
+    with open(path, "wb") as f :
+        f.write(_HEADER.pack(MAGIC, len(table), len(agents), len(market.assets), len(market.orderbook_asset_map)))
+        f.write(b"".join(table))
+        f.write(b"".join(body))
+
+
+def _decode_side(data : memoryview, offset : int, decimals : list[Decimal], agents : list, asset, side : OrderSide, level_type : type) -> tuple[list[PriceLevel], int] :
+    n_levels, n_orders, id_mode = _SIDE.unpack_from(data, offset)
+    offset += _SIDE.size
+
+    level_records = list(_LEVEL.iter_unpack(data[offset : offset + n_levels * _LEVEL.size]))
+    offset += n_levels * _LEVEL.size
+    order_records = list(_ORDER.iter_unpack(data[offset : offset + n_orders * _ORDER.size]))
+    offset += n_orders * _ORDER.size
+
+    ids, offset = _decode_ids(data, offset, n_orders, id_mode)
+
+    levels : list[PriceLevel] = []
+    waiting = OrderStatus.WAITING
+    i = 0
+    for price_idx, count in level_records :
+        price = decimals[price_idx]
+        price_level = level_type(price=price)
+        insert_order = price_level.insert_order
+        for _ in range(count) :
+            agent_idx, quantity_idx, type_value, tif_value = order_records[i]
+            order = Order(
+                type=_ORDER_TYPES[type_value],
+                side=side,
+                offer=price,
+                asset=asset,
+                quantity=decimals[quantity_idx],
+                id=ids[i],
+                agent=agents[agent_idx],
+                status=waiting,
+                time_in_force=_TIMES_IN_FORCE[tif_value]
+            )
+            insert_order(order)
+            i += 1
+        levels.append(price_level)
+
+    return levels, offset
+
+def _decode_stops(data : memoryview, offset : int, decimals : list[Decimal], agents : list, asset) -> tuple[TriggerIndex, int] :
+    n_stops, id_mode = _STOPS.unpack_from(data, offset)
+    offset += _STOPS.size
+    records = list(_STOP.iter_unpack(data[offset : offset + n_stops * _STOP.size]))
+    offset += n_stops * _STOP.size
+    ids, offset = _decode_ids(data, offset, n_stops, id_mode)
+
+    stops = TriggerIndex()
+    for (agent_idx, quantity_idx, type_value, side_value, tif_value, trigger_idx, offer_idx), order_id in zip(records, ids) :
+        stops.add(Order(
+            type=_ORDER_TYPES[type_value],
+            side=_ORDER_SIDES[side_value],
+            offer=decimals[offer_idx],
+            asset=asset,
+            quantity=decimals[quantity_idx],
+            id=order_id,
+            agent=agents[agent_idx],
+            trigger=decimals[trigger_idx],
+            time_in_force=_TIMES_IN_FORCE[tif_value]
+        ))
+    return stops, offset
+
+def _decode_auction(data : memoryview, offset : int, decimals : list[Decimal], agents : list, asset) -> tuple[bool, list[Order], int] :
+    in_auction, n_queued, id_mode = _AUCTION.unpack_from(data, offset)
+    offset += _AUCTION.size
+    records = list(_QUEUED.iter_unpack(data[offset : offset + n_queued * _QUEUED.size]))
+    offset += n_queued * _QUEUED.size
+    ids, offset = _decode_ids(data, offset, n_queued, id_mode)
+
+    queued = [
+        Order(
+            type=OrderType.Market,
+            side=_ORDER_SIDES[side_value],
+            offer=Decimal(0),
+            asset=asset,
+            quantity=decimals[quantity_idx],
+            id=order_id,
+            agent=agents[agent_idx],
+            time_in_force=_TIMES_IN_FORCE[tif_value]
+        )
+        for (agent_idx, quantity_idx, side_value, tif_value), order_id in zip(records, ids)
+    ]
+    return bool(in_auction), queued, offset
+
+
+def load_snapshot(market : Market, path : str) -> None :
+    """
+    Restore a snapshot into `market`, whose traders and assets must carry the same ids as
+    the market that was saved. Balances and prices are overwritten and every book is rebuilt,
+    then republished to the market's publisher and signal cache.
+    """
+    with open(path, "rb") as f :
+        data = memoryview(f.read())
+
+    magic, n_decimals, n_agents, n_assets, n_books = _HEADER.unpack_from(data, 0)
+    if magic != MAGIC :
+        raise ValueError(f"{path} is not an exchange snapshot")
+    offset = _HEADER.size
+
+    decimals : list[Decimal] = []
+    for _ in range(n_decimals) :
+        (length,) = _U16.unpack_from(data, offset)
+        offset += _U16.size
+        decimals.append(Decimal(bytes(data[offset : offset + length]).decode()))
+        offset += length
+
+    agents = []
+    for _ in range(n_agents) :
+        raw_id, cash_idx, n_positions = _AGENT.unpack_from(data, offset)
+        offset += _AGENT.size
+        agent = market.traders.get(UUID(bytes=raw_id))
+        if agent is None :
+            raise KeyError(f"Snapshot agent {UUID(bytes=raw_id)} is not a trader of this market")
+        agent.cash = decimals[cash_idx]
+        agent.portfolio = {}
+        for _ in range(n_positions) :
+            raw_asset, quantity_idx = _POSITION.unpack_from(data, offset)
+            offset += _POSITION.size
+            agent.portfolio[UUID(bytes=raw_asset)] = decimals[quantity_idx]
+        agents.append(agent)
+
+    for _ in range(n_assets) :
+        raw_id, price_idx = _ASSET.unpack_from(data, offset)
+        offset += _ASSET.size
+        market.assets[UUID(bytes=raw_id)].price = decimals[price_idx]
+
+    for _ in range(n_books) :
+        asset_id = UUID(bytes=bytes(data[offset : offset + 16]))
+        offset += 16
+        asset = market.assets[asset_id]
+        orderbook = market.orderbook_asset_map.get(asset_id)
+        if orderbook is None :
+            orderbook = market.orderbook_asset_map[asset_id] = market.create_orderbook(asset)
+
+        buy_levels, offset = _decode_side(data, offset, decimals, agents, asset, OrderSide.Buy, orderbook.level_type)
+        sell_levels, offset = _decode_side(data, offset, decimals, agents, asset, OrderSide.Sell, orderbook.level_type)
+        stops, offset = _decode_stops(data, offset, decimals, agents, asset)
+        in_auction, queued, offset = _decode_auction(data, offset, decimals, agents, asset)
+        with market._book_lock(asset_id) :
+            orderbook.restore(buy_levels, sell_levels, stops, in_auction, queued)
+            # shared memory rows and signals still describe the book that was replaced
+            market._book_changed(asset_id)
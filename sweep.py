@@ -0,0 +1,135 @@
+# Monte Carlo parameter sweeps : every (parameter combination, seed) pair is an independent
+# seeded simulation run in a worker process, summaries are yielded as runs complete
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from decimal import Decimal
+from itertools import product
+from typing import Iterator
+from simulation import setup_market, simulate_step, NUM_AGENTS, SIMULATION_STEPS
+import math
+import random
+
+@dataclass(frozen=True)
+class RunConfig :
+    seed : int
+    num_agents : int = NUM_AGENTS
+    steps : int = SIMULATION_STEPS
+    behavior_mix : tuple[tuple[str, float], ...] | None = None
+    mm_spread : Decimal = Decimal(2)
+    mm_size : Decimal = Decimal(5)
+
+@dataclass
+class RunSummary :
+    config : RunConfig
+    final_price : float
+    volatility : float # std of per-step log returns
+    volume : float
+    trades : int
+    spread_mean : float | None
+    spread_min : float | None
+    spread_max : float | None
+    pnl_quantiles : dict[float, float] = field(default_factory=dict)
+    pnl_by_behavior : dict[str, float] = field(default_factory=dict) # mean pnl
+
+PNL_QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95)
+
+def expand_grid(grid : dict[str, list], seeds : range | list[int]) -> list[RunConfig] :
+    """
+    Cartesian product of the grid values crossed with the seeds. Grid keys are RunConfig
+    fields, a `behavior_mix` value may be given as a dict of behavior name -> weight.
+    """
+    keys = list(grid)
+    configs = []
+    for values in product(*(grid[key] for key in keys)) :
+        params = dict(zip(keys, values))
+        if isinstance(params.get("behavior_mix"), dict) :
+            params["behavior_mix"] = tuple(sorted(params["behavior_mix"].items()))
+        for seed in seeds :
+            configs.append(RunConfig(seed=seed, **params))
+    return configs
+
+def _quantile(values : list[float], q : float) -> float :
+    position = q * (len(values) - 1)
+    lo = math.floor(position)
+    hi = math.ceil(position)
+    return values[lo] + (values[hi] - values[lo]) * (position - lo)
+
+def run_one(config : RunConfig) -> RunSummary :
+    random.seed(config.seed)
+    behavior_mix = dict(config.behavior_mix) if config.behavior_mix else None
+    behavior_kwargs = {"MarketMaker" : {"spread" : config.mm_spread, "size" : config.mm_size}}
+    market, agents, asset = setup_market(config.num_agents, behavior_mix, behavior_kwargs)
+    orderbook = market.orderbook_asset_map[asset.id]
+
+    start_price = asset.price
+    start_equity = [agent.cash + agent.portfolio.get(asset.id, Decimal(0)) * start_price for agent in agents]
+
+    log_returns = []
+    spreads = []
+    previous = float(start_price)
+    for _ in range(config.steps) :
+        simulate_step(market, agents, asset)
+
+        price = float(asset.price)
+        if previous > 0 and price > 0 :
+            log_returns.append(math.log(price / previous))
+        previous = price
+
+        best_bid = orderbook.get_best_bid()
+        best_ask = orderbook.get_best_ask()
+        if best_bid and best_ask :
+            spreads.append(float(best_ask.price - best_bid.price))
+
+    volatility = 0.0
+    if len(log_returns) > 1 :
+        mean = sum(log_returns) / len(log_returns)
+        volatility = math.sqrt(sum((r - mean) ** 2 for r in log_returns) / (len(log_returns) - 1))
+
+    final_price = asset.price
+    pnl = []
+    by_behavior : dict[str, list[float]] = {}
+    for agent, equity in zip(agents, start_equity) :
+        value = float(agent.cash + agent.portfolio.get(asset.id, Decimal(0)) * final_price - equity)
+        pnl.append(value)
+        by_behavior.setdefault(agent.behavior.__class__.__name__, []).append(value)
+    pnl.sort()
+
+    return RunSummary(
+        config=config,
+        final_price=float(final_price),
+        volatility=volatility,
+        volume=sum(float(trade.quantity) for trade in market.history),
+        trades=len(market.history),
+        spread_mean=sum(spreads) / len(spreads) if spreads else None,
+        spread_min=min(spreads) if spreads else None,
+        spread_max=max(spreads) if spreads else None,
+        pnl_quantiles={q : _quantile(pnl, q) for q in PNL_QUANTILES} if pnl else {},
+        pnl_by_behavior={name : sum(values) / len(values) for name, values in by_behavior.items()},
+    )
+
+def sweep(configs : list[RunConfig], processes : int | None = None) -> Iterator[RunSummary] :
+    # runs share nothing, so throughput scales with the number of worker processes
+    if processes == 1 :
+        for config in configs :
+            yield run_one(config)
+        return
+
+    with ProcessPoolExecutor(max_workers=processes) as pool :
+        futures = [pool.submit(run_one, config) for config in configs]
+        for future in as_completed(futures) :
+            yield future.result()
+
+if __name__ == "__main__" :
+    grid = {
+        "num_agents" : [100, 200],
+        "mm_spread" : [Decimal(1), Decimal(2), Decimal(4)],
+        "behavior_mix" : [
+            {"RandomTrader" : 1, "MarketMaker" : 1, "MomentumTrader" : 1},
+            {"RandomTrader" : 2, "MarketMaker" : 1, "MomentumTrader" : 1},
+        ],
+    }
+    for summary in sweep(expand_grid(grid, range(4))) :
+        config = summary.config
+        print(f"seed={config.seed} agents={config.num_agents} spread={config.mm_spread} mix={config.behavior_mix} "
+              f"price={summary.final_price:.2f} vol={summary.volatility:.4f} volume={summary.volume:.0f} "
+              f"spread={summary.spread_mean} median_pnl={summary.pnl_quantiles.get(0.5)}")
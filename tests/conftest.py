@@ -0,0 +1,82 @@
+from decimal import Decimal
+from uuid import uuid4
+from agent import Agent
+from generics import Asset, Order, OrderSide, OrderType, TimeInForce
+from market import Market
+import pytest
+
+@pytest.fixture
+def asset() -> Asset :
+    return Asset(type="stock", id=uuid4(), price=Decimal(100), quantity=Decimal(0))
+
+@pytest.fixture
+def agents(asset) -> dict :
+    return {uuid4() : Agent(Decimal(10 ** 6), {asset.id : Decimal(1000)}) for _ in range(4)}
+
+@pytest.fixture
+def market(agents, asset) -> Market :
+    return Market(agents, {asset.id : asset})
+
+@pytest.fixture
+def make_order(asset, agents) :
+    default_agent = next(iter(agents.values()))
+
+    def make(side : OrderSide, offer, quantity, agent : Agent | None = None, type : OrderType = OrderType.Limit,
+             time_in_force : TimeInForce = TimeInForce.GoodTillCancel, trigger=None) -> Order :
+        return Order(
+            type=type,
+            side=side,
+            offer=Decimal(offer),
+            asset=asset,
+            quantity=Decimal(quantity),
+            id=str(uuid4()),
+            agent=agent or default_agent,
+            trigger=None if trigger is None else Decimal(trigger),
+            time_in_force=time_in_force
+        )
+
+    return make
+
+def _check_subtree(node) -> tuple[int, Decimal, Decimal] :
+    # (height, quantity, notional) of the subtree, asserting every AVL and augmentation invariant on the way
+    if node is None :
+        return -1, Decimal(0), Decimal(0)
+    left_height, left_quantity, left_notional = _check_subtree(node.left)
+    right_height, right_quantity, right_notional = _check_subtree(node.right)
+    if node.left :
+        assert node.left.parent is node
+        assert node.left.value.price < node.value.price
+    if node.right :
+        assert node.right.parent is node
+        assert node.right.value.price > node.value.price
+    assert abs(left_height - right_height) <= 1
+    assert node.height == 1 + max(left_height, right_height)
+    assert node.subtree_quantity == left_quantity + right_quantity + node.value.quantity
+    assert node.subtree_notional == left_notional + right_notional + node.value.quantity * node.value.price
+    return node.height, node.subtree_quantity, node.subtree_notional
+
+@pytest.fixture
+def check_tree() :
+    def check(tree) -> None :
+        if tree.root is not None :
+            assert tree.root.parent is None
+        _check_subtree(tree.root)
+        prices = [level.price for level in tree]
+        assert prices == sorted(prices) and len(set(prices)) == len(prices)
+    return check
+
+@pytest.fixture
+def check_book(check_tree) :
+    def check(book) -> None :
+        resting = set()
+        for tree in (book.buy_side_tree, book.sell_side_tree) :
+            check_tree(tree)
+            for level in tree :
+                orders = [order for _, order in level]
+                assert orders, f"empty level at {level.price} left in the tree"
+                assert level.quantity == sum((order.quantity for order in orders), Decimal(0))
+                resting.update(order.id for order in orders)
+        assert resting == set(book.order_map)
+        indexed = {order_id for orders in book.agent_orders.values() for order_id in orders}
+        assert indexed == resting | {order.id for order in book.stops.orders()}
+    return check
@@ -0,0 +1,101 @@
+from decimal import Decimal
+from generics import OrderSide, OrderStatus, OrderType, TimeInForce
+from orderbook import OrderBook
+import pytest
+
+@pytest.fixture
+def book(asset) -> OrderBook :
+    book = OrderBook(asset_type=asset.type)
+    book.start_auction()
+    return book
+
+def test_orders_do_not_match_during_call(book, make_order) :
+    assert book.match(make_order(OrderSide.Buy, 101, 5)) == []
+    assert book.match(make_order(OrderSide.Sell, 99, 5)) == []
+    assert book.get_best_bid().price == 101 and book.get_best_ask().price == 99
+
+def test_price_maximizes_volume(book, make_order, check_book) :
+    bids = [make_order(OrderSide.Buy, price, 5) for price in (100, 101, 102)]
+    asks = [make_order(OrderSide.Sell, price, 4) for price in (99, 100, 101)]
+    for order in bids + asks :
+        book.match(order)
+
+    # executable volume is 4, 8, 10 and 5 at 99, 100, 101 and 102
+    assert book.equilibrium_price() == (Decimal(101), Decimal(10))
+
+    trades = book.uncross()
+    assert sum(trade.quantity for trade in trades) == 10
+    assert all(trade.amount_exchanged == trade.quantity * 101 for trade in trades)
+    # the best priced orders execute first on both sides
+    assert [order.status for order in bids] == [OrderStatus.WAITING, OrderStatus.FILLED, OrderStatus.FILLED]
+    assert [order.status for order in asks] == [OrderStatus.FILLED, OrderStatus.FILLED, OrderStatus.WAITING]
+    assert (book.get_best_bid().price, book.get_best_bid().quantity) == (100, 5)
+    assert (book.get_best_ask().price, book.get_best_ask().quantity) == (101, 2)
+    assert not book.in_auction
+    check_book(book)
+
+@pytest.mark.parametrize("reference, expected", [(None, 100), (Decimal(90), 100), (Decimal("100.2"), Decimal("100.2")), (Decimal(103), 101)])
+def test_ties_go_to_reference(book, make_order, reference, expected) :
+    book.match(make_order(OrderSide.Buy, 101, 5))
+    book.match(make_order(OrderSide.Sell, 100, 5))
+    # same volume and imbalance at every price from 100 to 101
+    assert book.equilibrium_price(reference) == (Decimal(expected), Decimal(5))
+
+def test_ties_go_to_smaller_imbalance(book, make_order) :
+    book.match(make_order(OrderSide.Buy, 101, 5))
+    book.match(make_order(OrderSide.Buy, 100, 1))
+    book.match(make_order(OrderSide.Sell, 100, 5))
+    # volume 5 at both prices, demand 6 at 100 against 5 at 101
+    assert book.equilibrium_price(Decimal(100)) == (Decimal(101), Decimal(5))
+
+def test_allocation_follows_time_priority(book, make_order, check_book) :
+    first = make_order(OrderSide.Buy, 101, 5)
+    second = make_order(OrderSide.Buy, 101, 5)
+    for order in (first, second, make_order(OrderSide.Sell, 100, 6)) :
+        book.match(order)
+
+    trades = book.uncross(Decimal(101))
+    assert [(trade.quantity, trade.buyer) for trade in trades] == [(5, first.agent), (1, second.agent)]
+    assert first.status == OrderStatus.FILLED
+    assert second.quantity == 4 and book.get_order(second.id) is second
+    check_book(book)
+
+def test_market_orders_execute_first(book, make_order, check_book) :
+    market = make_order(OrderSide.Buy, 0, 3, type=OrderType.Market)
+    limit = make_order(OrderSide.Buy, 100, 5)
+    for order in (limit, market, make_order(OrderSide.Sell, 100, 4)) :
+        book.match(order)
+
+    trades = book.uncross(Decimal(100))
+    assert [trade.quantity for trade in trades] == [3, 1]
+    assert market.status == OrderStatus.FILLED
+    assert limit.quantity == 4
+    check_book(book)
+
+def test_unfilled_orders_expire(book, make_order, check_book) :
+    market = make_order(OrderSide.Sell, 0, 10, type=OrderType.Market)
+    ioc = make_order(OrderSide.Sell, 102, 5, time_in_force=TimeInForce.ImmediateOrCancel)
+    fok = make_order(OrderSide.Sell, 100, 1, time_in_force=TimeInForce.FillOrKill)
+    for order in (market, ioc, fok, make_order(OrderSide.Buy, 101, 4)) :
+        book.match(order)
+    assert fok.status == OrderStatus.CANCELED
+
+    trades = book.uncross(Decimal(101))
+    assert sum(trade.quantity for trade in trades) == 4
+    assert market.status == OrderStatus.CANCELED and market.quantity == 6
+    assert ioc.status == OrderStatus.CANCELED
+    assert book.get_best_ask() is None and book.get_best_bid() is None
+    check_book(book)
+
+def test_market_uncross_settles(market, asset, agents, make_order) :
+    buyer, seller, *_ = agents.values()
+    cash = sum(agent.cash for agent in agents.values())
+    market.start_auction()
+    market.buy(asset, buyer, make_order(OrderSide.Buy, 102, 5, buyer))
+    market.sell(asset, seller, make_order(OrderSide.Sell, 98, 3, seller))
+
+    trades = market.uncross()
+    assert [trade.quantity for trade in trades] == [3]
+    assert asset.price == Decimal(100) # the last price breaks the tie between 98 and 102
+    assert sum(agent.cash for agent in agents.values()) == cash
+    assert buyer.portfolio[asset.id] == 1003 and seller.portfolio[asset.id] == 997
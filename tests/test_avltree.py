@@ -0,0 +1,85 @@
+from decimal import Decimal
+from datastructures import AVLTree
+from generics import PriceLevel, TreeNode
+import pytest
+import random
+
+def level(price, quantity=1) -> PriceLevel :
+    return PriceLevel(price=Decimal(price), quantity=Decimal(quantity))
+
+def prices(levels) -> list[Decimal] :
+    return [price_level.price for price_level in levels]
+
+def test_random_insert_delete(check_tree) :
+    rng = random.Random(0)
+    tree = AVLTree()
+    resting : dict[Decimal, Decimal] = {}
+    for step in range(3000) :
+        price = Decimal(rng.randint(0, 400))
+        if price in resting and rng.random() < 0.6 :
+            assert tree.delete(price)
+            del resting[price]
+        elif price not in resting :
+            quantity = Decimal(rng.randint(1, 9))
+            tree.insert(TreeNode(value=level(price, quantity)))
+            resting[price] = quantity
+        if step % 50 == 0 :
+            check_tree(tree)
+            assert prices(tree) == sorted(resting)
+            assert tree.total_quantity() == sum(resting.values(), Decimal(0))
+
+    for price in rng.sample(sorted(resting), len(resting)) :
+        assert tree.delete(price)
+        check_tree(tree)
+    assert tree.root is None
+    assert not tree.delete(Decimal(1))
+
+def test_delete_keeps_level_objects(check_tree) :
+    levels = [level(price) for price in range(32)]
+    tree = AVLTree()
+    for price_level in levels :
+        tree.insert(TreeNode(value=price_level))
+    # the root has two children, its predecessor moves up into its place
+    root_price = tree.root.value.price
+    assert tree.delete(root_price)
+    check_tree(tree)
+    assert tree.search(root_price) is None
+    for price_level in levels :
+        if price_level.price != root_price :
+            assert tree.search(price_level.price) is price_level
+
+def test_add_quantity_updates_paths(check_tree) :
+    tree = AVLTree.from_sorted([level(price, 2) for price in range(10)])
+    price_level = tree.search(Decimal(4))
+    price_level.quantity += 5
+    tree.add_quantity(Decimal(4), Decimal(5))
+    check_tree(tree)
+    assert tree.quantity_up_to(Decimal(4)) == 15
+    assert tree.quantity_from(Decimal(4)) == 17
+    assert tree.quantity_up_to(Decimal("-1")) == 0
+    with pytest.raises(KeyError) :
+        tree.add_quantity(Decimal(42), Decimal(1))
+
+@pytest.mark.parametrize("size", [0, 1, 2, 7, 100])
+def test_from_sorted(check_tree, size) :
+    tree = AVLTree.from_sorted([level(price) for price in range(size)])
+    check_tree(tree)
+    assert prices(tree) == [Decimal(price) for price in range(size)]
+    tree.insert(TreeNode(value=level(size)))
+    check_tree(tree)
+
+def test_iterator_start_bounds() :
+    tree = AVLTree.from_sorted([level(price) for price in range(0, 100, 10)])
+
+    assert prices(tree.ascending(Decimal(30))) == [Decimal(p) for p in range(30, 100, 10)]
+    assert prices(tree.ascending(Decimal(31))) == [Decimal(p) for p in range(40, 100, 10)]
+    assert prices(tree.ascending(Decimal(-5))) == prices(tree)
+    assert prices(tree.ascending(Decimal(91))) == []
+
+    assert prices(tree.descending(Decimal(30))) == [Decimal(p) for p in range(30, -1, -10)]
+    assert prices(tree.descending(Decimal(29))) == [Decimal(p) for p in range(20, -1, -10)]
+    assert prices(tree.descending(Decimal(500))) == prices(reversed(tree))
+    assert prices(tree.descending(Decimal(-1))) == []
+
+    assert tree.min_level().price == 0 and tree.max_level().price == 90
+    assert AVLTree().min_level() is None and prices(AVLTree().descending()) == []
@@ -0,0 +1,97 @@
+from dataclasses import replace
+from decimal import Decimal
+from uuid import uuid4
+from agent import Agent
+from backtest import Backtest, ExternalLiquidity
+from behaviors import Behavior, MarketMaker, MomentumTrader, RandomTrader
+from generics import Asset, Order, OrderSide, OrderType, Tick
+from market import Market
+from tickfile import read_ticks, write_ticks
+import os
+import pytest
+import random
+
+START = {"AAA" : Decimal(100), "BBB" : Decimal(50)}
+POSITION = Decimal(50)
+AGENTS = 12
+
+def write_file(path : str) -> None :
+    rng = random.Random(0)
+    prices = {symbol : float(price) for symbol, price in START.items()}
+    ticks = []
+    for i in range(400) :
+        symbol = "AAA" if i % 2 == 0 else "BBB"
+        if i > 3 : # both symbols open at their starting price
+            prices[symbol] = max(1.0, prices[symbol] + rng.uniform(-0.3, 0.3))
+        ticks.append(Tick(symbol, Decimal(f"{prices[symbol]:.2f}"), float(i)))
+    write_ticks(path, ticks)
+
+def run(path : str, chunk_size : int) :
+    random.seed(7)
+    symbols = {symbol : Asset(type="stock", id=uuid4(), price=price, quantity=Decimal(0)) for symbol, price in START.items()}
+    behaviors = [RandomTrader(), MarketMaker(), MomentumTrader(memory=3, threshold=Decimal("0.1"))]
+    agents = [Agent(Decimal(10 ** 5), {asset.id : POSITION for asset in symbols.values()}, behavior=behaviors[i % 3]) for i in range(AGENTS)]
+    liquidity = Agent(Decimal(0), {})
+    market = Market({uuid4() : agent for agent in agents + [liquidity]}, {asset.id : asset for asset in symbols.values()})
+    stats = Backtest(market, agents, symbols, ExternalLiquidity(liquidity)).run(path, chunk_size=chunk_size)
+    return stats, symbols, liquidity
+
+@pytest.fixture
+def tick_file(tmp_path) -> str :
+    path = str(tmp_path / "ticks.csv")
+    write_file(path)
+    return path
+
+def test_stats(tick_file) :
+    chunk_size = 512
+    assert os.path.getsize(tick_file) > 4 * chunk_size
+    stats, symbols, liquidity = run(tick_file, chunk_size)
+    recorded = {tick.symbol : float(tick.price) for tick in read_ticks(tick_file)}
+
+    assert stats.ticks == 400
+    assert set(stats.trades) == set(START) and all(count > 0 for count in stats.trades.values())
+    for symbol in START :
+        assert stats.first_price[symbol] == float(START[symbol])
+        assert stats.last_price[symbol] == recorded[symbol]
+        # each symbol trades near its own price, the vwaps are not blended
+        assert abs(stats.vwap[symbol] - stats.notional[symbol] / stats.volume[symbol]) < 1e-9
+        assert abs(stats.vwap[symbol] - float(START[symbol])) < 10
+    assert sum(group.agents for group in stats.pnl_by_behavior.values()) == AGENTS
+
+    # trades move value between participants only, so every agent's PnL plus the liquidity's
+    # adds up to the whole starting inventory revalued at the final (last traded) prices
+    liquidity_pnl = float(liquidity.cash + sum((quantity * symbols[symbol].price
+                                                 for symbol in START for asset_id, quantity in liquidity.portfolio.items()
+                                                 if asset_id == symbols[symbol].id), Decimal(0)))
+    revaluation = sum(float(AGENTS * POSITION * (symbols[symbol].price - START[symbol])) for symbol in START)
+    total = sum(group.mean_pnl * group.agents for group in stats.pnl_by_behavior.values())
+    assert total + liquidity_pnl == pytest.approx(revaluation, abs=1e-6)
+
+def test_chunk_size_does_not_change_results(tick_file) :
+    small, _, _ = run(tick_file, 256)
+    whole, _, _ = run(tick_file, 1 << 20)
+    assert replace(small, elapsed=0) == replace(whole, elapsed=0)
+
+class BuyOnce(Behavior) :
+    def __init__(self) -> None :
+        self.done = False
+
+    def decide(self, agent, asset, signals=None) :
+        if self.done :
+            return None
+        self.done = True
+        return Order(OrderType.Market, OrderSide.Buy, asset.price, asset, Decimal(1), str(uuid4()), agent)
+
+def test_pnl_includes_trades_before_every_symbol_ticked(tmp_path) :
+    path = str(tmp_path / "ticks.csv")
+    write_ticks(path, [Tick("AAA", Decimal(100), 0.0), Tick("AAA", Decimal(100), 1.0), Tick("BBB", Decimal(50), 2.0)])
+    symbols = {symbol : Asset(type="stock", id=uuid4(), price=price, quantity=Decimal(0)) for symbol, price in START.items()}
+    buyer = Agent(Decimal(1000), {}, behavior=BuyOnce())
+    liquidity = Agent(Decimal(0), {})
+    market = Market({uuid4() : buyer, uuid4() : liquidity}, {asset.id : asset for asset in symbols.values()})
+
+    stats = Backtest(market, [buyer], symbols, ExternalLiquidity(liquidity)).run(path)
+
+    # bought one AAA at the ask, half a spread above where it is marked
+    assert stats.trades["AAA"] == 1
+    assert stats.pnl_by_behavior["BuyOnce"].mean_pnl == pytest.approx(-0.01)
@@ -0,0 +1,117 @@
+from uuid import uuid4
+from bars import BarAggregator, BarSeries, Resolution, STEP, TIME, TRADES
+from simulation import run_simulation, setup_market
+import math
+import numpy as np
+import pytest
+import random
+
+class Clock :
+    def __init__(self, now : float = 0.0) -> None :
+        self.now = now
+
+    def __call__(self) -> float :
+        return self.now
+
+def test_trade_bars() :
+    bars = BarSeries(Resolution(TRADES, 3))
+    for price, quantity in ((10, 1), (12, 2), (9, 1), (11, 4), (13, 1)) :
+        bars.add(price, quantity)
+
+    arrays = bars.as_arrays()
+    assert list(arrays["start"]) == [0, 3]
+    assert list(arrays["open"]) == [10, 11]
+    assert list(arrays["high"]) == [12, 13]
+    assert list(arrays["low"]) == [9, 11]
+    assert list(arrays["close"]) == [9, 13]
+    assert list(arrays["volume"]) == [4, 5]
+    assert list(arrays["trades"]) == [3, 2]
+    assert arrays["vwap"][0] == pytest.approx((10 + 24 + 9) / 4)
+    assert bars.last("vwap") == pytest.approx((44 + 13) / 5)
+
+def test_step_bars() :
+    bars = BarSeries(Resolution(STEP, 2))
+    bars.add(5, 1)
+    bars.step()
+    bars.add(7, 3)
+    bars.step()
+    bars.step()
+    bars.step()
+    bars.add(6, 2)
+
+    arrays = bars.as_arrays()
+    assert list(arrays["start"]) == [0, 2, 4]
+    assert list(arrays["volume"]) == [4, 0, 2]
+    assert list(arrays["close"][[0, 2]]) == [7, 6]
+    # a bar without trades has no prices
+    assert all(math.isnan(arrays[name][1]) for name in ("open", "high", "low", "close", "vwap"))
+    assert arrays["vwap"][0] == pytest.approx(26 / 4)
+
+    # only STEP series count steps
+    trades = BarSeries(Resolution(TRADES, 10))
+    trades.step()
+    assert len(trades) == 1
+
+def test_time_bars() :
+    clock = Clock(12.5)
+    bars = BarSeries(Resolution(TIME, 5), clock=clock)
+    bars.add(100, 1)
+    clock.now = 14.9
+    bars.add(102, 1)
+    clock.now = 27.0 # skips the 15 bucket entirely
+    bars.add(101, 2)
+
+    arrays = bars.as_arrays()
+    assert list(arrays["start"]) == [10, 25]
+    assert list(arrays["open"]) == [100, 101]
+    assert list(arrays["high"]) == [102, 101]
+    assert list(arrays["volume"]) == [2, 2]
+
+def test_ring_wraps() :
+    bars = BarSeries(Resolution(TRADES, 1), capacity=4)
+    for i in range(10) :
+        bars.add(float(i), 1)
+
+    arrays = bars.as_arrays()
+    assert len(bars) == 4
+    assert list(arrays["start"]) == [6, 7, 8, 9]
+    assert list(arrays["close"]) == [6, 7, 8, 9]
+    assert bars.last("close") == 9
+
+def test_late_asset_lines_up() :
+    bars = BarAggregator({"step" : Resolution(STEP, 2)})
+    early, late = uuid4(), uuid4()
+    bars.add(early, 1, 1)
+    for _ in range(3) :
+        bars.step()
+    bars.add(late, 2, 1)
+    bars.step()
+
+    assert list(bars.series(early, "step").as_arrays()["start"]) == [0, 2, 4]
+    assert list(bars.series(late, "step").as_arrays()["start"]) == [2, 4]
+
+def test_rejects_bad_resolutions() :
+    with pytest.raises(ValueError) :
+        Resolution("minute")
+    with pytest.raises(ValueError) :
+        Resolution(TRADES, 0)
+
+def test_step_volume_in_simulation() :
+    random.seed(3)
+    market, agents, asset = setup_market(num_agents=60)
+    market.attach_bars(BarAggregator({STEP : Resolution(STEP), "ten" : Resolution(TRADES, 10)}))
+
+    traded = []
+    seen = 0
+    volume_history = []
+    for _, _, _, volume_history, _, _ in run_simulation(market, agents, asset, steps=20) :
+        traded.append(float(sum(trade.quantity for trade in market.history[seen:])))
+        seen = len(market.history)
+
+    assert sum(traded) > 0
+    assert volume_history == pytest.approx(traded)
+    step_bars = market.bars.series(asset.id, STEP).as_arrays()
+    # the bar opened by the last end_step() has no trades yet
+    assert list(step_bars["volume"][:-1]) == pytest.approx(traded)
+    assert step_bars["volume"][-1] == 0
+    assert np.nansum(market.bars.series(asset.id, "ten").as_arrays()["volume"]) == pytest.approx(sum(traded))
@@ -0,0 +1,84 @@
+from decimal import Decimal
+from datafeed import FileDataFeed
+from datastructures import TickBuffer
+from generics import Tick
+from tickfile import iter_tick_chunks, read_ticks, write_ticks
+import pytest
+
+def tick(symbol : str, price, timestamp : float = 0.0) -> Tick :
+    return Tick(symbol=symbol, price=Decimal(price), timestamp=timestamp)
+
+def test_buffer_coalesces_per_symbol() :
+    buffer = TickBuffer(capacity=4)
+    for price in (1, 2, 3) :
+        buffer.push(tick("A", price))
+    buffer.push(tick("B", 10))
+    buffer.push(tick("A", 4))
+
+    # A was queued first and is delivered once, with its newest price
+    assert [(t.symbol, t.price) for t in buffer.drain()] == [("A", 4), ("B", 10)]
+    assert buffer.received == 5 and buffer.dropped == 0
+    assert buffer.drain() == []
+
+    buffer.push(tick("A", 5))
+    assert [t.price for t in buffer.drain()] == [5]
+
+def test_buffer_drops_when_full() :
+    buffer = TickBuffer(capacity=2)
+    for symbol in ("A", "B", "C") :
+        buffer.push(tick(symbol, 1))
+
+    assert buffer.dropped == 1
+    assert len(buffer) == 2
+    # the dropped symbol is not queued but its price is still current
+    assert buffer.price("C") == 1
+    assert [t.symbol for t in buffer.drain(limit=1)] == ["A"]
+    buffer.push(tick("C", 2))
+    assert [(t.symbol, t.price) for t in buffer.drain()] == [("B", 1), ("C", 2)]
+
+def test_buffer_rejects_empty_capacity() :
+    with pytest.raises(ValueError) :
+        TickBuffer(capacity=0)
+
+def test_chunks_end_on_line_boundaries(tmp_path) :
+    path = str(tmp_path / "ticks.csv")
+    ticks = [tick("AB" if i % 2 else "C", f"{100 + i}.25", float(i)) for i in range(200)]
+    assert write_ticks(path, ticks) == 200
+    with open(path, "a") as f :
+        f.write("\n# comment\n")
+
+    for chunk_size in (1, 7, 64, 1000, 1 << 20) :
+        chunks = list(iter_tick_chunks(path, chunk_size))
+        assert [t for chunk in chunks for t in chunk] == ticks
+        if chunk_size < 100 :
+            assert len(chunks) > 1
+    assert list(read_ticks(path, chunk_size=13)) == ticks
+
+def test_empty_tick_file(tmp_path) :
+    path = tmp_path / "empty.csv"
+    path.write_text("")
+    assert list(iter_tick_chunks(str(path))) == []
+
+def test_file_feed_replays_tracked_symbols(tmp_path) :
+    path = str(tmp_path / "ticks.csv")
+    write_ticks(path, [tick("A", 1, 0.0), tick("X", 9, 0.0), tick("B", 2, 0.001), tick("A", 3, 0.002)])
+    feed = FileDataFeed(path, ["A", "B"], speed=None)
+    assert feed.get_current_price("A") is None
+
+    feed.start()
+    feed.join(timeout=5)
+
+    assert feed.finished
+    assert feed.get_current_price("A") == 3
+    assert feed.get_current_price("B") == 2
+    assert feed.get_current_price("X") is None
+    assert {(t.symbol, t.price) for t in feed.poll()} == {("A", 3), ("B", 2)}
+
+def test_file_feed_paced_replay(tmp_path) :
+    path = str(tmp_path / "ticks.csv")
+    write_ticks(path, [tick("A", 1, 0.0), tick("A", 2, 10.0)])
+    feed = FileDataFeed(path, ["A"], speed=1000.0) # 10 recorded seconds in 10ms
+    feed.start()
+    feed.join(timeout=5)
+    assert feed.finished and feed.get_current_price("A") == 2
+    feed.stop()
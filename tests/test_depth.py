@@ -0,0 +1,163 @@
+from decimal import Decimal
+from uuid import uuid4
+from datastructures import DepthIndex
+from generics import Asset, OrderSide
+from market import Market
+from orderbook import DEFAULT_TICK_SIZE, OrderBook
+import random
+
+def test_far_prices_stay_small() :
+    # a fat finger order far from the book must not allocate a slot per tick in between
+    depth = DepthIndex(Decimal("0.01"))
+    for price in (Decimal("100.01"), Decimal("100.02"), Decimal(50000), Decimal("0.01")) :
+        depth.add(price, Decimal(1))
+
+    assert depth.depth_to(Decimal("100.01")) == 2
+    assert depth.cost_to_fill(Decimal(3)) == (Decimal(3), Decimal("200.04"))
+    assert depth.price_at_depth(Decimal(4)) == Decimal(50000)
+    assert depth.total() == 4
+    assert len(depth._ticks) == 4
+    assert len(depth._quantity_tree._tree) <= 4 * depth._quantity_tree.bits
+
+def test_off_grid_prices_share_the_tick_below() :
+    # on both sides a price counts in the bucket of the tick at or below it, and a query
+    # covers the whole bucket of its price
+    bids = DepthIndex(Decimal("0.05"), descending=True)
+    bids.add(Decimal("90.05"), Decimal(1))
+    bids.add(Decimal("90.01"), Decimal(1))
+    assert bids.depth_to(Decimal("90.05")) == 1
+    assert bids.depth_to(Decimal("90.04")) == 2
+    assert bids.depth_to(Decimal("90.00")) == 2
+    assert bids.depth_to(Decimal("89.99")) == 2
+
+    asks = DepthIndex(Decimal("0.05"))
+    asks.add(Decimal("90.01"), Decimal(1))
+    asks.add(Decimal("90.06"), Decimal(1))
+    assert asks.depth_to(Decimal("89.99")) == 0
+    assert asks.depth_to(Decimal("90.00")) == 1
+    assert asks.depth_to(Decimal("90.05")) == 2
+
+def test_new_ticks_match_a_scan() :
+    rng = random.Random(1)
+    depth = DepthIndex(Decimal(1))
+    levels : dict[int, int] = {}
+    for _ in range(2000) :
+        price = rng.randint(1, 5000)
+        if levels and rng.random() < 0.3 :
+            price = rng.choice(list(levels))
+            quantity = -levels.pop(price)
+        else :
+            quantity = rng.randint(1, 9)
+            levels[price] = levels.get(price, 0) + quantity
+        depth.add(Decimal(price), Decimal(quantity))
+
+        query = rng.randint(0, 5001)
+        assert depth.depth_to(Decimal(query)) == sum(q for p, q in levels.items() if p <= query)
+    assert len(depth._ticks) == len(levels)
+
+def test_span_grows_to_far_ticks() :
+    depth = DepthIndex(Decimal("1e-8"))
+    depth.add(Decimal(1), Decimal(1))
+    depth.add(Decimal(10000), Decimal(2))
+    depth.add(Decimal("1e-8"), Decimal(3))
+
+    assert depth.depth_to(Decimal(1)) == 4
+    assert depth.depth_to(Decimal(9999)) == 4
+    assert depth.depth_to(Decimal(10000)) == 6
+    assert depth.cost_to_fill(Decimal(5)) == (Decimal(5), Decimal("3e-8") + Decimal(1) + Decimal(10000))
+    assert depth.price_at_depth(Decimal(6)) == Decimal(10000)
+
+def test_far_order_rests_with_every_index(asset, make_order, check_book) :
+    book = OrderBook(asset_type=asset.type, tick_size=Decimal("1e-8"), depth_index=True)
+    near = make_order(OrderSide.Sell, 1, 1)
+    far = make_order(OrderSide.Sell, 10000, 1)
+    book.insert(near)
+    book.insert(far)
+
+    assert book.get_order(far.id) is far
+    assert book.depth_to(OrderSide.Sell, Decimal(10000)) == 2
+    check_book(book)
+
+def test_exact_queries_without_index(asset, make_order, check_book) :
+    # without a DepthIndex the book answers from the trees, per level and exactly
+    rng = random.Random(2)
+    book = OrderBook(asset_type=asset.type)
+    assert book.bid_depth is None and book.ask_depth is None
+    resting = []
+    for _ in range(400) :
+        if resting and rng.random() < 0.4 :
+            book.cancel(resting.pop(rng.randrange(len(resting))).id)
+            continue
+        order = make_order(OrderSide.Sell, Decimal(rng.randint(9000, 9999)) / 100, rng.randint(1, 9))
+        book.insert(order)
+        resting.append(order)
+
+        price = Decimal(rng.randint(9000, 9999)) / 100
+        assert book.depth_to(OrderSide.Sell, price) == sum((o.quantity for o in resting if o.offer <= price), Decimal(0))
+    check_book(book)
+
+    levels = sorted((o.offer, o.quantity) for o in resting)
+    total = sum((size for _, size in levels), Decimal(0))
+    for quantity in (Decimal(1), Decimal(37), total) :
+        left, notional = quantity, Decimal(0)
+        for price, size in levels :
+            take = min(left, size)
+            notional += take * price
+            left -= take
+            if left == 0 :
+                break
+        assert book.cost_to_fill(OrderSide.Sell, quantity) == notional
+        assert book.price_at_depth(OrderSide.Sell, quantity) == price
+    assert book.cost_to_fill(OrderSide.Sell, total + 1) is None
+    assert book.price_at_depth(OrderSide.Sell, total + 1) is None
+
+def test_exact_bid_queries_without_index(asset, make_order) :
+    book = OrderBook(asset_type=asset.type)
+    for price, quantity in ((99, 2), (98, 3), (97, 4)) :
+        book.insert(make_order(OrderSide.Buy, price, quantity))
+
+    assert book.depth_to(OrderSide.Buy, Decimal(98)) == 5
+    assert book.cost_to_fill(OrderSide.Buy, Decimal(4)) == 2 * 99 + 2 * 98
+    assert book.price_at_depth(OrderSide.Buy, Decimal(6)) == 97
+    assert book.impact_cost(OrderSide.Buy, Decimal(4)) == Decimal(99) - Decimal(2 * 99 + 2 * 98) / 4
+
+def test_matches_resting_levels(asset, make_order) :
+    rng = random.Random(0)
+    book = OrderBook(asset_type=asset.type, tick_size=Decimal("0.05"), depth_index=True)
+    resting = []
+    for _ in range(500) :
+        if resting and rng.random() < 0.4 :
+            book.cancel(resting.pop(rng.randrange(len(resting))).id)
+            continue
+        order = make_order(OrderSide.Buy, Decimal(rng.randint(9000, 9999)) / 100, rng.randint(1, 9))
+        book.insert(order)
+        resting.append(order)
+
+        if rng.random() < 0.2 :
+            price = Decimal(rng.randint(9000, 9999)) / 100
+            # bids are bucketed on the tick at or below their price and the query covers its whole bucket
+            bucket = (price // Decimal("0.05")) * Decimal("0.05")
+            expected = sum((o.quantity for o in resting if o.offer >= bucket), Decimal(0))
+            assert book.depth_to(OrderSide.Buy, price) == expected
+
+    quantity = Decimal(40)
+    levels = sorted(((o.offer, o.quantity) for o in resting), reverse=True)
+    left, notional = quantity, Decimal(0)
+    for price, size in levels :
+        take = min(left, size)
+        notional += take * price
+        left -= take
+    # levels of one bucket fill at their average price, compare at the bucket scale
+    assert abs(book.cost_to_fill(OrderSide.Buy, quantity) - notional) <= quantity * Decimal("0.05")
+    assert book.bid_depth.total() == sum((o.quantity for o in resting), Decimal(0))
+
+def test_tick_size_per_asset(agents) :
+    coarse = Asset(type="stock", id=uuid4(), price=Decimal(100), quantity=Decimal(0))
+    fine = Asset(type="stock", id=uuid4(), price=Decimal(100), quantity=Decimal(0))
+    market = Market(agents, {coarse.id : coarse, fine.id : fine}, tick_sizes={coarse.id : Decimal("0.5")}, depth_index=True)
+    late = Asset(type="stock", id=uuid4(), price=Decimal(1), quantity=Decimal(0))
+    market.add_asset(late, tick_size=Decimal("0.0001"))
+
+    assert market.orderbook_asset_map[coarse.id].tick_size == Decimal("0.5")
+    assert market.orderbook_asset_map[fine.id].tick_size == DEFAULT_TICK_SIZE
+    assert market.orderbook_asset_map[late.id].ask_depth.tick_size == Decimal("0.0001")
@@ -0,0 +1,52 @@
+from decimal import Decimal
+from uuid import uuid4
+from agent import Agent
+from generics import Asset
+from leaderboard import Leaderboard
+import pytest
+import random
+
+def current(agent : Agent, assets : dict) -> float :
+    return float(agent.cash) + sum(float(quantity) * float(assets[asset_id].price) for asset_id, quantity in agent.portfolio.items())
+
+@pytest.fixture
+def population() -> tuple[list[Agent], dict] :
+    rng = random.Random(0)
+    assets = {}
+    for _ in range(3) :
+        asset = Asset(type="stock", id=uuid4(), price=Decimal(100), quantity=Decimal(0))
+        assets[asset.id] = asset
+    agents = [
+        Agent(Decimal(rng.randint(0, 10 ** 5)), {asset_id : Decimal(rng.randint(-50, 50)) for asset_id in rng.sample(list(assets), 2)})
+        for _ in range(2000)
+    ]
+    return agents, assets
+
+@pytest.mark.parametrize("move", [Decimal("0.01"), Decimal(1), Decimal(50)])
+def test_queries_follow_price_moves(population, move) :
+    agents, assets = population
+    board = Leaderboard(agents, assets)
+    rng = random.Random(1)
+    for _ in range(20) :
+        asset = assets[rng.choice(list(assets))]
+        asset.price += move * rng.choice([-1, 1])
+        trader = rng.choice(agents)
+        trader.cash += Decimal(rng.randint(-1000, 1000))
+        board.update(trader)
+
+        values = sorted(current(agent, assets) for agent in agents)
+        for p in (0, 10, 50, 99, 100) :
+            index = min(int(p / 100 * len(values)), len(values) - 1)
+            assert board.percentile(p) == pytest.approx(values[index])
+        agent = rng.choice(agents)
+        equity = current(agent, assets)
+        assert board.rank(agent) == sum(1 for other in agents if current(other, assets) > equity)
+        assert [float(equity) for _, equity in board.top(5)] == pytest.approx(values[::-1][:5])
+
+def test_percentile_bounds(population) :
+    agents, assets = population
+    board = Leaderboard(agents, assets)
+    with pytest.raises(ValueError) :
+        board.percentile(101)
+    with pytest.raises(ValueError) :
+        Leaderboard([], assets).percentile(50)
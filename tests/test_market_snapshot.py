@@ -0,0 +1,66 @@
+from decimal import Decimal
+from uuid import uuid4
+from agent import Agent
+from generics import Asset, Order, OrderSide, OrderType, TimeInForce
+from market import Market
+import numpy as np
+import pytest
+import random
+
+def make_assets(n : int) -> list[Asset] :
+    return [Asset(type="stock", id=uuid4(), price=Decimal(100), quantity=Decimal(0)) for _ in range(n)]
+
+def resting(asset : Asset, agent : Agent, side : OrderSide, offer, quantity) -> Order :
+    return Order(type=OrderType.Limit, side=side, offer=Decimal(offer), asset=asset, quantity=Decimal(quantity),
+                 id=str(uuid4()), agent=agent, time_in_force=TimeInForce.GoodTillCancel)
+
+def test_matches_top_of_book() :
+    assets = make_assets(3)
+    agent = Agent(Decimal(10 ** 6), {asset.id : Decimal(1000) for asset in assets})
+    market = Market({uuid4() : agent}, {asset.id : asset for asset in assets})
+    rng = random.Random(0)
+    # a deep book, a book shallower than the snapshot and an empty book
+    for asset, levels in zip(assets, (12, 2, 0)) :
+        for _ in range(levels * 3) :
+            market.place(asset, resting(asset, agent, OrderSide.Buy, rng.randint(100 - 2 * levels, 99), rng.randint(1, 9)))
+            market.place(asset, resting(asset, agent, OrderSide.Sell, rng.randint(101, 100 + 2 * levels), rng.randint(1, 9)))
+    assets[1].price = Decimal("100.5")
+
+    depth = 5
+    snapshot = market.snapshot(depth)
+    assert snapshot.asset_ids == [asset.id for asset in assets]
+    for i, asset in enumerate(assets) :
+        book = market.orderbook_asset_map[asset.id]
+        assert snapshot.last_price[i] == float(asset.price)
+        for top, prices, quantities, best in (
+            (book.get_top_bids(depth), snapshot.bid_prices[i], snapshot.bid_quantities[i], snapshot.best_bid[i]),
+            (book.get_top_asks(depth), snapshot.ask_prices[i], snapshot.ask_quantities[i], snapshot.best_ask[i]),
+        ) :
+            assert prices.shape == quantities.shape == (depth,)
+            assert list(prices[:len(top)]) == [float(price) for price, _ in top]
+            assert list(quantities[:len(top)]) == [float(quantity) for _, quantity in top]
+            # levels past the end of the book are padded with nan prices and zero quantities
+            assert np.isnan(prices[len(top):]).all()
+            assert (quantities[len(top):] == 0).all()
+            assert (np.isnan(best) and not top) or best == float(top[0][0])
+
+    assert len(market.orderbook_asset_map[assets[0].id].get_top_bids(depth)) == depth
+    assert len(market.orderbook_asset_map[assets[1].id].get_top_bids(depth)) < depth
+    assert np.isnan(snapshot.bid_prices[2]).all() and np.isnan(snapshot.ask_prices[2]).all()
+
+def test_counts_volume_and_trades() :
+    assets = make_assets(2)
+    seller, buyer = (Agent(Decimal(10 ** 6), {asset.id : Decimal(1000) for asset in assets}) for _ in range(2))
+    market = Market({uuid4() : seller, uuid4() : buyer}, {asset.id : asset for asset in assets})
+    market.place(assets[1], resting(assets[1], seller, OrderSide.Sell, 101, 5))
+    market.place(assets[1], resting(assets[1], buyer, OrderSide.Buy, 101, 3))
+
+    snapshot = market.snapshot(1)
+    assert list(snapshot.volume) == [0, 3]
+    assert list(snapshot.trades) == [0, 1]
+    assert list(snapshot.ask_quantities[:, 0]) == [0, 2]
+
+@pytest.mark.parametrize("depth", [0, -1])
+def test_rejects_depth_below_one(market, depth) :
+    with pytest.raises(ValueError) :
+        market.snapshot(depth)
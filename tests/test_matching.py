@@ -0,0 +1,90 @@
+from decimal import Decimal
+from generics import ArrayPriceLevel, OrderSide, OrderStatus, OrderType, PriceLevel
+from matching import FifoPolicy, ProRataPolicy
+from orderbook import OrderBook
+import pytest
+import random
+
+@pytest.fixture(params=[PriceLevel, ArrayPriceLevel])
+def level_type(request) -> type :
+    return request.param
+
+def make_level(level_type, make_order, sizes) :
+    price_level = level_type(price=Decimal(100))
+    orders = [make_order(OrderSide.Sell, 100, size) for size in sizes]
+    for order in orders :
+        price_level.insert_order(order)
+    return price_level, orders
+
+def amounts(allocation, orders) -> list[Decimal] :
+    taken = {order.id : quantity for _, order, quantity in allocation}
+    return [taken.get(order.id, Decimal(0)) for order in orders]
+
+def test_fifo_fills_oldest_first(level_type, make_order) :
+    price_level, orders = make_level(level_type, make_order, [3, 4, 5])
+    assert amounts(FifoPolicy().allocate(price_level, Decimal(5)), orders) == [3, 2, 0]
+
+def test_pro_rata_shares(level_type, make_order) :
+    price_level, orders = make_level(level_type, make_order, [10, 30, 60])
+    assert amounts(ProRataPolicy().allocate(price_level, Decimal(50)), orders) == [5, 15, 30]
+
+def test_rounding_lots_go_to_oldest(level_type, make_order) :
+    price_level, orders = make_level(level_type, make_order, [1, 1, 1])
+    # each share is 2/3 of a lot, the two rounded off lots go to the two oldest
+    assert amounts(ProRataPolicy().allocate(price_level, Decimal(2)), orders) == [1, 1, 0]
+
+def test_sub_lot_remainder(level_type, make_order) :
+    price_level, orders = make_level(level_type, make_order, ["2.5", "2.5"])
+    allocation = ProRataPolicy().allocate(price_level, Decimal("4.5"))
+    assert amounts(allocation, orders) == [Decimal("2.5"), Decimal(2)]
+
+@pytest.mark.parametrize("lot", [Decimal(1), Decimal(10), Decimal("0.5")])
+def test_random_levels_sum_and_determinism(level_type, make_order, lot) :
+    rng = random.Random(int(lot * 10))
+    policy = ProRataPolicy(lot)
+    for _ in range(50) :
+        sizes = [Decimal(rng.randint(1, 400)) / 4 for _ in range(rng.randint(1, 40))]
+        price_level, orders = make_level(level_type, make_order, sizes)
+        quantity = Decimal(rng.randint(1, 2 * int(sum(sizes)))) / 2
+
+        allocation = policy.allocate(price_level, quantity)
+        taken = amounts(allocation, orders)
+        assert sum(taken) == min(quantity, price_level.quantity)
+        assert all(0 <= amount <= order.quantity for amount, order in zip(taken, orders))
+        assert all(amount > 0 for _, _, amount in allocation)
+        # queue order, and the same answer every time for the same level
+        assert [order.id for _, order, _ in allocation] == [order.id for order in orders if order.id in {o.id for _, o, _ in allocation}]
+        assert policy.allocate(price_level, quantity) == allocation
+
+        lots = [int(size // lot) for size in sizes]
+        if quantity < price_level.quantity and sum(lots) :
+            take = min(int(quantity // lot), sum(lots))
+            for amount, size_lots in zip(taken, lots) :
+                # never less than its rounded down share of whole lots
+                assert amount >= size_lots * take // sum(lots) * lot
+
+def test_huge_lot_counts(level_type, make_order) :
+    # lots * take would overflow a 64 bit integer
+    price_level, orders = make_level(level_type, make_order, [10 ** 12, 3 * 10 ** 12])
+    allocation = ProRataPolicy().allocate(price_level, Decimal(2 * 10 ** 12))
+    assert amounts(allocation, orders) == [Decimal(5 * 10 ** 11), Decimal(15 * 10 ** 11)]
+
+def test_book_with_pro_rata(asset, agents, make_order, check_book) :
+    first, second, taker, _ = agents.values()
+    book = OrderBook(asset_type=asset.type, policy=ProRataPolicy())
+    small = make_order(OrderSide.Sell, 100, 10, first)
+    large = make_order(OrderSide.Sell, 100, 30, second)
+    book.insert(small)
+    book.insert(large)
+    book.insert(make_order(OrderSide.Sell, 101, 10, first))
+
+    order = make_order(OrderSide.Buy, 0, 44, taker, OrderType.Market)
+    trades = book.match(order)
+
+    # the first level is taken whole, the next one only for the remainder
+    assert [(trade.seller, trade.quantity) for trade in trades] == [(first, 10), (second, 30), (first, 4)]
+    assert small.status == OrderStatus.FILLED and large.status == OrderStatus.FILLED
+    order = make_order(OrderSide.Buy, 101, 2, taker)
+    assert [trade.quantity for trade in book.match(order)] == [2]
+    assert book.get_best_ask().quantity == 4
+    check_book(book)
@@ -0,0 +1,220 @@
+from dataclasses import replace
+from decimal import Decimal
+from uuid import uuid4
+from generics import Asset, ArrayPriceLevel, OrderSide, OrderStatus, OrderType, PriceLevel, TimeInForce
+from market import Market
+from orderbook import OrderBook
+import pytest
+
+@pytest.fixture(params=[PriceLevel, ArrayPriceLevel])
+def book(request, asset, make_order) -> OrderBook :
+    # asks of 5 at 100, 101, 102 and 103
+    book = OrderBook(asset_type=asset.type, level_type=request.param)
+    for price in (100, 101, 102, 103) :
+        book.insert(make_order(OrderSide.Sell, price, 5))
+    return book
+
+def priced(trades) -> list[tuple[Decimal, Decimal]] :
+    return [(trade.quantity, trade.amount_exchanged / trade.quantity) for trade in trades]
+
+def ask_levels(book : OrderBook) -> list[tuple[Decimal, Decimal]] :
+    return [(level.price, level.quantity) for level in book.sell_side_tree]
+
+def test_limit_sweeps_crossing_levels(book, make_order, check_book) :
+    order = make_order(OrderSide.Buy, 102, 12)
+    trades = book.match(order)
+
+    assert priced(trades) == [(5, 100), (5, 101), (2, 102)]
+    assert order.status == OrderStatus.FILLED
+    assert ask_levels(book) == [(102, 3), (103, 5)]
+    assert book.get_best_bid() is None
+    check_book(book)
+
+def test_limit_remainder_rests_at_its_price(book, make_order, check_book) :
+    order = make_order(OrderSide.Buy, 101, 14)
+    trades = book.match(order)
+
+    assert priced(trades) == [(5, 100), (5, 101)]
+    assert order.status == OrderStatus.WAITING
+    assert book.get_best_bid().price == 101 and book.get_best_bid().quantity == 4
+    assert book.get_order(order.id) is order
+    assert ask_levels(book) == [(102, 5), (103, 5)]
+    check_book(book)
+
+def test_market_order_takes_best_level_first(book, make_order, check_book) :
+    order = make_order(OrderSide.Buy, 0, 7, type=OrderType.Market)
+    trades = book.match(order)
+
+    assert priced(trades) == [(5, 100), (2, 101)]
+    assert order.status == OrderStatus.FILLED
+    check_book(book)
+
+def test_fill_or_kill_rejected(book, make_order, check_book) :
+    order = make_order(OrderSide.Buy, 101, 11, time_in_force=TimeInForce.FillOrKill)
+    assert book.match(order) == []
+
+    assert order.status == OrderStatus.CANCELED
+    assert order.quantity == 11
+    assert ask_levels(book) == [(100, 5), (101, 5), (102, 5), (103, 5)]
+    assert book.get_best_bid() is None
+    check_book(book)
+
+def test_fill_or_kill_filled(book, make_order, check_book) :
+    order = make_order(OrderSide.Buy, 101, 10, time_in_force=TimeInForce.FillOrKill)
+    trades = book.match(order)
+
+    assert priced(trades) == [(5, 100), (5, 101)]
+    assert order.status == OrderStatus.FILLED
+    assert ask_levels(book) == [(102, 5), (103, 5)]
+    check_book(book)
+
+def test_immediate_or_cancel_remainder_discarded(book, make_order, check_book) :
+    order = make_order(OrderSide.Buy, 101, 15, time_in_force=TimeInForce.ImmediateOrCancel)
+    trades = book.match(order)
+
+    assert priced(trades) == [(5, 100), (5, 101)]
+    assert order.status == OrderStatus.CANCELED
+    assert order.quantity == 5
+    assert book.get_best_bid() is None
+    assert book.get_order(order.id) is None
+    check_book(book)
+
+def test_emptied_levels_removed(book, make_order, check_book) :
+    book.match(make_order(OrderSide.Buy, 103, 20))
+
+    assert book.sell_side_tree.root is None
+    assert book.get_best_ask() is None
+    assert book.sell_side_tree.total_quantity() == 0
+    for price in (100, 101, 102, 103) :
+        assert book.sell_side_tree.search(Decimal(price)) is None
+    assert book.depth_to(OrderSide.Sell, Decimal(103)) == 0
+    check_book(book)
+
+def test_cancel_removes_emptied_level(book, make_order, check_book) :
+    order = make_order(OrderSide.Sell, 99, 3)
+    book.insert(order)
+    assert book.cancel(order.id)
+
+    assert order.status == OrderStatus.CANCELED
+    assert book.sell_side_tree.search(Decimal(99)) is None
+    assert book.get_best_ask().price == 100
+    check_book(book)
+
+def test_fillable_quantity(book, make_order) :
+    assert book.fillable_quantity(make_order(OrderSide.Buy, 101, 1)) == 10
+    assert book.fillable_quantity(make_order(OrderSide.Buy, 99, 1)) == 0
+    assert book.fillable_quantity(make_order(OrderSide.Buy, 0, 1, type=OrderType.Market)) == 20
+
+@pytest.mark.parametrize("order_type", [OrderType.GoodTillCancel, OrderType.Stop, OrderType.StopLimit])
+def test_rejects_unmatchable_types(book, make_order, order_type, check_book) :
+    order = make_order(OrderSide.Buy, 100, 10, type=order_type, trigger=100)
+    assert book.fillable_quantity(order) == 0
+    assert book.match(order) == []
+
+    assert order.status == OrderStatus.CANCELED
+    assert ask_levels(book) == [(100, 5), (101, 5), (102, 5), (103, 5)]
+    check_book(book)
+
+def test_cancel_all_keeps_shared_levels(book, agents, make_order, check_book) :
+    # the fixture's asks belong to the first agent, the second one quotes around them
+    owner, quoter = list(agents.values())[:2]
+    shared = [make_order(OrderSide.Sell, 101, 2, quoter) for _ in range(3)]
+    alone = make_order(OrderSide.Sell, 99, 4, quoter)
+    bid = make_order(OrderSide.Buy, 95, 6, quoter)
+    stop = make_order(OrderSide.Buy, 0, 1, quoter, OrderType.Stop, trigger=110)
+    for order in (*shared, alone, bid) :
+        book.insert(order)
+    book.add_stop(stop)
+    assert len(book.agent_orders[id(quoter)]) == 6
+    assert book.depth_to(OrderSide.Sell, Decimal(101)) == 20
+    check_book(book)
+
+    assert book.cancel(shared[0].id)
+    assert book.depth_to(OrderSide.Sell, Decimal(101)) == 18
+    assert shared[0].id not in book.agent_orders[id(quoter)]
+    check_book(book)
+
+    canceled = book.cancel_all(quoter)
+
+    assert {order.id for order in canceled} == {order.id for order in (*shared[1:], alone, bid, stop)}
+    assert all(order.status == OrderStatus.CANCELED for order in canceled)
+    assert id(quoter) not in book.agent_orders
+    assert len(book.agent_orders[id(owner)]) == 4
+    assert ask_levels(book) == [(100, 5), (101, 5), (102, 5), (103, 5)]
+    assert book.sell_side_tree.search(Decimal(99)) is None
+    assert book.get_best_bid() is None
+    assert len(book.stops) == 0
+    assert book.depth_to(OrderSide.Sell, Decimal(101)) == 10
+    assert book.depth_to(OrderSide.Buy, Decimal(95)) == 0
+    assert book.cancel_all(quoter) == []
+    check_book(book)
+
+def test_cancel_all_empties_levels(book, agents, make_order, check_book) :
+    owner = next(iter(agents.values()))
+    canceled = book.cancel_all(owner)
+
+    assert len(canceled) == 4
+    assert book.sell_side_tree.root is None
+    assert book.order_map == {} and book.agent_orders == {}
+    assert book.depth_to(OrderSide.Sell, Decimal(103)) == 0
+    check_book(book)
+
+def test_market_cancel_all_and_disconnect(agents, asset, make_order, check_book) :
+    other = Asset(type="stock", id=uuid4(), price=Decimal(50), quantity=Decimal(0))
+    market = Market(agents, {asset.id : asset, other.id : other}, depth_index=True)
+    books = market.orderbook_asset_map
+    owner, quoter = list(agents.values())[:2]
+
+    market.sell(asset, owner, make_order(OrderSide.Sell, 105, 5, owner))
+    quotes = [make_order(OrderSide.Sell, 105, 1, quoter), make_order(OrderSide.Buy, 95, 2, quoter)]
+    other_quotes = [replace(make_order(OrderSide.Buy, price, 3, quoter), asset=other) for price in (48, 49)]
+    stop = replace(make_order(OrderSide.Sell, 0, 1, quoter, OrderType.Stop, trigger=40), asset=other)
+    for order in (*quotes, *other_quotes, stop) :
+        submit = market.buy if order.side == OrderSide.Buy else market.sell
+        assert submit(order.asset, quoter, order) == OrderStatus.WAITING
+
+    canceled = market.cancel_all(quoter, asset)
+
+    assert {order.id for order in canceled} == {order.id for order in quotes}
+    assert id(quoter) not in books[asset.id].agent_orders
+    assert books[asset.id].depth_to(OrderSide.Sell, Decimal(105)) == 5
+    assert books[asset.id].depth_to(OrderSide.Buy, Decimal(95)) == 0
+    assert len(books[other.id].agent_orders[id(quoter)]) == 3
+    assert books[other.id].depth_to(OrderSide.Buy, Decimal(48)) == 6
+
+    canceled = market.disconnect(quoter)
+
+    assert {order.id for order in canceled} == {order.id for order in (*other_quotes, stop)}
+    assert all(order.status == OrderStatus.CANCELED for order in (*quotes, *other_quotes, stop))
+    assert books[other.id].get_best_bid() is None and len(books[other.id].stops) == 0
+    assert books[other.id].depth_to(OrderSide.Buy, Decimal(48)) == 0
+    assert all(id(quoter) not in book.agent_orders for book in books.values())
+    assert len(books[asset.id].agent_orders[id(owner)]) == 1
+    assert market.cancel_all(quoter) == []
+    for book in books.values() :
+        check_book(book)
+
+def test_array_level_skips_tombstones(make_order) :
+    price_level = ArrayPriceLevel(price=Decimal(100))
+    orders = [make_order(OrderSide.Sell, 100, 1) for _ in range(40)]
+    for order in orders :
+        price_level.insert_order(order)
+
+    # a mid-queue cancel leaves a tombstone, fills from the front move the head past it
+    for order in (orders[5], *orders[:5], orders[6]) :
+        order.status = OrderStatus.CANCELED
+        price_level.remove_order(order)
+    assert [order for _, order in price_level] == orders[7:]
+    assert price_level.slots[price_level.head] is orders[7]
+
+    # compaction once the dead slots outnumber the live ones keeps FIFO order
+    for order in orders[7:21] :
+        order.status = OrderStatus.FILLED
+        price_level.remove_order(order)
+    assert price_level.head == 0 and price_level.slots == orders[21:]
+    assert [order for _, order in price_level] == orders[21:]
+
+    for order in orders[21:] :
+        order.status = OrderStatus.FILLED
+        price_level.remove_order(order)
+    assert price_level.is_empty() and list(price_level) == []
@@ -0,0 +1,78 @@
+from decimal import Decimal
+from uuid import uuid4
+from agent import Agent
+from behaviors import MomentumTrader
+from generics import OrderSide
+from market import Market
+from signals import SignalCache
+from simulation import setup_market, simulate_step
+import math
+import pytest
+import random
+
+def test_momentum_and_volatility(asset) :
+    signals = SignalCache({asset.id : asset}, max_window=4, volatility_window=2)
+    for price in (100, 101, 103, 102) :
+        asset.price = Decimal(price)
+        signals.sample(asset.id)
+
+    assert signals.momentum(asset.id, 3) == Decimal(-1) # 102 against 103
+    assert signals.momentum(asset.id, 5) == Decimal(2)  # 102 against 100
+    expected = math.sqrt(math.log(103 / 101) ** 2 + math.log(102 / 103) ** 2)
+    assert signals.volatility(asset.id) == pytest.approx(expected)
+    with pytest.raises(ValueError) :
+        signals.momentum(asset.id, 6) # only 4 samples plus the current price are kept
+
+def test_top_of_book(asset) :
+    signals = SignalCache({asset.id : asset})
+    assert signals.mid(asset.id) is None and signals.imbalance(asset.id) is None
+    assert signals.momentum(asset.id, 3) is None
+
+    signals.on_book(asset.id, Decimal(99), Decimal(30), Decimal(101), Decimal(10))
+    assert signals.mid(asset.id) == Decimal(100)
+    assert signals.microprice(asset.id) == Decimal("100.5")
+    assert signals.imbalance(asset.id) == 0.5
+
+def test_momentum_trader_without_signals(asset) :
+    trader = MomentumTrader(memory=3, threshold=Decimal(1))
+    agent = Agent(Decimal(10 ** 6), {asset.id : Decimal(100)}, behavior=trader)
+
+    assert trader.decide(agent, asset) is None
+    asset.price = Decimal(102)
+    # two prices are not a window of three yet
+    assert trader.decide(agent, asset) is None
+    order = trader.decide(agent, asset)
+    assert order is not None and order.side == OrderSide.Buy
+
+def test_momentum_trader_same_with_and_without_signals(asset) :
+    alone = MomentumTrader(memory=3, threshold=Decimal(1))
+    cached = MomentumTrader(memory=3, threshold=Decimal(1))
+    agent = Agent(Decimal(10 ** 6), {asset.id : Decimal(100)})
+    signals = SignalCache({asset.id : asset}, max_window=4)
+
+    sides = []
+    for price in (100, 101, 103, 102, 100, 100, 100) :
+        asset.price = Decimal(price)
+        decisions = [alone.decide(agent, asset), cached.decide(agent, asset, signals)]
+        assert [order is None for order in decisions] == [decisions[0] is None] * 2
+        sides.append(decisions[0] and decisions[0].side)
+        assert decisions[1] is None or decisions[1].side == sides[-1]
+        signals.step()
+    assert sides == [None, None, OrderSide.Buy, OrderSide.Buy, OrderSide.Sell, OrderSide.Sell, None]
+
+def test_simulate_step_samples_signals() :
+    random.seed(0)
+    market, agents, asset = setup_market(num_agents=20)
+    for _ in range(3) :
+        simulate_step(market, agents, asset)
+    assert len(market.signals._of(asset.id).samples) == 3
+
+def test_attach_rejects_short_cache(asset) :
+    agents = {uuid4() : Agent(Decimal(0), {}, behavior=MomentumTrader(memory=10))}
+    market = Market(agents, {asset.id : asset})
+    with pytest.raises(ValueError) :
+        market.attach_signals(SignalCache(market.assets, max_window=8))
+    assert market.signals is None
+
+    market.attach_signals(SignalCache(market.assets, max_window=9))
+    assert market.signals is not None
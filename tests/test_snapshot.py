@@ -0,0 +1,99 @@
+from decimal import Decimal
+from generics import ArrayPriceLevel, OrderSide, OrderStatus, OrderType, PriceLevel, TimeInForce
+from market import Market
+from orderbook import OrderBook
+from snapshot import load_snapshot, save_snapshot
+import pytest
+import random
+
+def book_state(book : OrderBook) -> list :
+    return [
+        [(level.price, [(order.id, order.quantity, id(order.agent), order.type, order.time_in_force) for _, order in level]) for level in tree]
+        for tree in (book.buy_side_tree, book.sell_side_tree)
+    ]
+
+def stop_state(book : OrderBook) -> list :
+    return sorted((order.id, order.side, order.trigger, order.offer, order.quantity, id(order.agent), order.time_in_force) for order in book.stops.orders())
+
+@pytest.mark.parametrize("level_type", [PriceLevel, ArrayPriceLevel])
+def test_round_trip(tmp_path, agents, asset, make_order, level_type) :
+    market = Market(agents, {asset.id : asset}, level_type=level_type)
+    book = market.orderbook_asset_map[asset.id]
+    traders = list(agents.values())
+    rng = random.Random(0)
+    for i in range(300) :
+        side = OrderSide.Buy if i % 2 else OrderSide.Sell
+        offer = rng.randint(90, 99) if side == OrderSide.Buy else rng.randint(101, 110)
+        order = make_order(side, offer, Decimal(rng.randint(1, 20)) / 4, rng.choice(traders))
+        if i % 5 == 0 :
+            order.id = f"order-{i}" # not a uuid, stored as text
+        book.insert(order)
+    market.buy(asset, traders[0], make_order(OrderSide.Buy, 0, 1, traders[0], OrderType.Stop, trigger=120))
+    market.sell(asset, traders[1], make_order(OrderSide.Sell, 80, 2, traders[1], OrderType.StopLimit, trigger=85))
+    market.buy(asset, traders[2], make_order(OrderSide.Buy, 125, 3, traders[2], OrderType.StopLimit,
+                                             TimeInForce.ImmediateOrCancel, trigger=121))
+    traders[2].cash = Decimal("1234.5")
+    asset.price = Decimal("100.25")
+
+    books = book_state(book)
+    stops = stop_state(book)
+    balances = [(agent.cash, dict(agent.portfolio)) for agent in traders]
+
+    path = tmp_path / "market.snap"
+    save_snapshot(market, str(path))
+    for agent in traders :
+        agent.cash = Decimal(0)
+        agent.portfolio = {}
+    asset.price = Decimal(1)
+    market.orderbook_asset_map[asset.id] = OrderBook(asset_type=asset.type, level_type=level_type)
+    load_snapshot(market, str(path))
+
+    restored = market.orderbook_asset_map[asset.id]
+    assert book_state(restored) == books
+    assert stop_state(restored) == stops
+    assert [(agent.cash, agent.portfolio) for agent in traders] == balances
+    assert asset.price == Decimal("100.25")
+    assert len(restored.order_map) == 300
+    assert restored.get_best_bid().price == books[0][-1][0]
+    assert restored.get_best_ask().price == books[1][0][0]
+
+def test_auction_state_round_trip(tmp_path, market, asset, agents, make_order) :
+    buyer, seller = list(agents.values())[:2]
+    market.start_auction()
+    ioc = make_order(OrderSide.Buy, 99, 5, buyer, time_in_force=TimeInForce.ImmediateOrCancel)
+    market.buy(asset, buyer, ioc)
+    market.buy(asset, buyer, make_order(OrderSide.Buy, 98, 5, buyer))
+    market.sell(asset, seller, make_order(OrderSide.Sell, 0, 3, seller, OrderType.Market))
+
+    path = str(tmp_path / "auction.snap")
+    save_snapshot(market, path)
+
+    # a fresh market over the same traders and assets, in continuous mode until the load
+    fresh = Market(agents, {asset.id : asset})
+    load_snapshot(fresh, path)
+    book = fresh.orderbook_asset_map[asset.id]
+    assert book.in_auction
+    restored = book.get_order(ioc.id)
+    assert restored.time_in_force == TimeInForce.ImmediateOrCancel
+    assert [(order.agent, order.quantity, order.type) for order in book._auction_market_sells] == [(seller, 3, OrderType.Market)]
+    assert book._auction_market_buys == []
+
+    # the queued market sell executes against the best bid, the uncross then expires the IOC remainder
+    trades = fresh.uncross()
+    assert [(trade.quantity, trade.amount_exchanged) for trade in trades] == [(3, 3 * 99)]
+    assert not book.in_auction
+    assert restored.status == OrderStatus.CANCELED
+    assert [(level.price, level.quantity) for level in book.buy_side_tree] == [(98, 5)]
+
+def test_continuous_book_stays_continuous(tmp_path, market, agents, asset) :
+    path = str(tmp_path / "continuous.snap")
+    save_snapshot(market, path)
+    market.start_auction()
+    load_snapshot(market, path)
+    assert not market.orderbook_asset_map[asset.id].in_auction
+
+def test_rejects_other_files(tmp_path, market) :
+    path = tmp_path / "other.bin"
+    path.write_bytes(b"NOTASNAP" + bytes(16))
+    with pytest.raises(ValueError) :
+        load_snapshot(market, str(path))
@@ -0,0 +1,101 @@
+from decimal import Decimal
+from datastructures import TriggerIndex
+from generics import OrderSide, OrderStatus, OrderType
+
+def fills(market, agent) -> list[tuple[Decimal, Decimal]] :
+    # (quantity, price) of every trade the agent bought in
+    return [(trade.quantity, trade.amount_exchanged / trade.quantity) for trade in market.history if trade.buyer is agent]
+
+def test_stop_cascade(market, asset, agents, make_order) :
+    maker, first, second, taker = agents.values()
+    for price in (101, 102, 103, 104) :
+        market.sell(asset, maker, make_order(OrderSide.Sell, price, 5, maker))
+
+    stop = make_order(OrderSide.Buy, 0, 5, first, OrderType.Stop, trigger=101)
+    stop_limit = make_order(OrderSide.Buy, 103, 5, second, OrderType.StopLimit, trigger=102)
+    far = make_order(OrderSide.Buy, 0, 1, second, OrderType.Stop, trigger=150)
+    for order in (stop, stop_limit, far) :
+        assert market.buy(asset, order.agent, order) == OrderStatus.WAITING
+    book = market.orderbook_asset_map[asset.id]
+    assert len(book.stops) == 3
+
+    # the taker lifts 101, the stop at 101 takes the rest of it and 102, which fires the stop limit
+    market.buy(asset, taker, make_order(OrderSide.Buy, 101, 1, taker))
+
+    assert fills(market, first) == [(Decimal(4), Decimal(101)), (Decimal(1), Decimal(102))]
+    assert fills(market, second) == [(Decimal(4), Decimal(102)), (Decimal(1), Decimal(103))]
+    assert stop.status == OrderStatus.FILLED and stop_limit.status == OrderStatus.FILLED
+    assert asset.price == Decimal(103)
+    assert [order.id for order in book.stops.orders()] == [far.id]
+
+def test_sell_stop_fires_on_fall(market, asset, agents, make_order) :
+    maker, seller, _, taker = agents.values()
+    market.buy(asset, maker, make_order(OrderSide.Buy, 99, 5, maker))
+    market.buy(asset, maker, make_order(OrderSide.Buy, 98, 5, maker))
+    stop = make_order(OrderSide.Sell, 0, 3, seller, OrderType.Stop, trigger=99)
+    market.sell(asset, seller, stop)
+
+    market.sell(asset, taker, make_order(OrderSide.Sell, 99, 4, taker))
+
+    assert stop.status == OrderStatus.FILLED
+    assert asset.price == Decimal(98)
+    assert market.orderbook_asset_map[asset.id].get_best_bid().quantity == Decimal(3)
+
+def test_canceled_stop_does_not_fire(market, asset, agents, make_order) :
+    maker, owner, _, taker = agents.values()
+    market.sell(asset, maker, make_order(OrderSide.Sell, 101, 5, maker))
+    stop = make_order(OrderSide.Buy, 0, 5, owner, OrderType.Stop, trigger=101)
+    market.buy(asset, owner, stop)
+    book = market.orderbook_asset_map[asset.id]
+
+    assert book.cancel(stop.id)
+    market.buy(asset, taker, make_order(OrderSide.Buy, 101, 1, taker))
+
+    assert stop.status == OrderStatus.CANCELED
+    assert fills(market, owner) == []
+    assert book.get_best_ask().quantity == Decimal(4)
+
+def test_amended_trigger_replaces_old_entry(make_order) :
+    stops = TriggerIndex()
+    stop = make_order(OrderSide.Buy, 0, 1, type=OrderType.Stop, trigger=105)
+    stops.add(stop)
+
+    # amend : cancel, move the trigger, add the same order again
+    assert stops.cancel(stop.id) is stop
+    stop.trigger = Decimal(120)
+    stops.add(stop)
+
+    assert stops.release(Decimal(106)) == []
+    assert len(stops) == 1
+    assert stops.release(Decimal(120)) == [stop]
+    assert len(stops) == 0
+
+def test_release_order(make_order) :
+    stops = TriggerIndex()
+    buys = [make_order(OrderSide.Buy, 0, 1, type=OrderType.Stop, trigger=trigger) for trigger in (103, 101, 102, 101)]
+    sells = [make_order(OrderSide.Sell, 0, 1, type=OrderType.Stop, trigger=trigger) for trigger in (97, 99, 98)]
+    for order in buys + sells :
+        stops.add(order)
+
+    # lowest buy trigger first, ties in the order they were added
+    assert stops.release(Decimal(102)) == [buys[1], buys[3], buys[2]]
+    # highest sell trigger first
+    assert stops.release(Decimal(98)) == [sells[1], sells[2]]
+    assert sorted(order.trigger for order in stops.orders()) == [Decimal(97), Decimal(103)]
+
+def test_canceled_entries_are_compacted(make_order) :
+    stops = TriggerIndex()
+    kept = make_order(OrderSide.Sell, 0, 1, type=OrderType.Stop, trigger=50)
+    stops.add(kept)
+    for i in range(10_000) :
+        stop = make_order(OrderSide.Buy, 0, 1, type=OrderType.Stop, trigger=1000 + i)
+        stops.add(stop)
+        stops.cancel(stop.id)
+        # amending in place leaves a dead entry behind too
+        kept.trigger = Decimal(50 - i % 3)
+        stops.add(kept)
+
+    assert len(stops) == 1
+    assert len(stops._buy) + len(stops._sell) <= 2
+    assert stops.release(Decimal(10 ** 6)) == []
+    assert stops.release(Decimal(1)) == [kept]
@@ -0,0 +1,24 @@
+from decimal import Decimal
+from sweep import RunConfig, expand_grid, run_one, sweep
+
+def key(summary) :
+    return (summary.config.seed, summary.config.mm_spread)
+
+def test_expand_grid() :
+    configs = expand_grid({"mm_spread" : [Decimal(1), Decimal(2)], "behavior_mix" : [{"RandomTrader" : 1, "MarketMaker" : 2}]}, range(3))
+    assert len(configs) == 6
+    assert configs[0] == RunConfig(seed=0, mm_spread=Decimal(1), behavior_mix=(("MarketMaker", 2), ("RandomTrader", 1)))
+
+def test_same_seed_same_run() :
+    config = RunConfig(seed=3, num_agents=30, steps=15)
+    first = run_one(config)
+    assert first.trades > 0
+    assert run_one(config) == first
+    assert run_one(RunConfig(seed=4, num_agents=30, steps=15)) != first
+
+def test_process_pool_matches_serial() :
+    configs = expand_grid({"num_agents" : [30], "steps" : [15], "mm_spread" : [Decimal(1), Decimal(4)]}, range(2))
+    serial = sorted(sweep(configs, processes=1), key=key)
+    pooled = sorted(sweep(configs, processes=2), key=key)
+    assert len(pooled) == len(configs)
+    assert pooled == serial
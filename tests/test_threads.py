@@ -0,0 +1,61 @@
+from decimal import Decimal
+from uuid import uuid4
+from agent import Agent
+from generics import Asset, Order, OrderSide, OrderStatus, OrderType, TimeInForce
+from market import Market
+import random
+
+def make_world(thread_safe : bool) -> tuple[Market, list[Order]] :
+    # the same seeded order flow over several assets, crossing often enough to trade
+    rng = random.Random(7)
+    assets = [Asset(type="stock", id=uuid4(), price=Decimal(100), quantity=Decimal(0)) for _ in range(4)]
+    agents = [Agent(Decimal(10 ** 6), {asset.id : Decimal(1000) for asset in assets}) for _ in range(12)]
+    market = Market({uuid4() : agent for agent in agents}, {asset.id : asset for asset in assets},
+                    thread_safe=thread_safe, max_workers=4)
+
+    orders = []
+    for _ in range(2000) :
+        side = rng.choice((OrderSide.Buy, OrderSide.Sell))
+        market_order = rng.random() < 0.2
+        orders.append(Order(
+            type=OrderType.Market if market_order else OrderType.Limit,
+            side=side,
+            offer=Decimal(0) if market_order else Decimal(rng.randint(95, 105)),
+            asset=rng.choice(assets),
+            quantity=Decimal(rng.randint(1, 5)),
+            id=str(uuid4()),
+            agent=rng.choice(agents),
+            time_in_force=rng.choice((TimeInForce.GoodTillCancel, TimeInForce.ImmediateOrCancel))
+        ))
+    return market, orders
+
+def totals(market : Market) -> tuple[Decimal, dict] :
+    agents = market.traders.values()
+    cash = sum((agent.cash for agent in agents), Decimal(0))
+    positions = {asset_id : sum((agent.portfolio.get(asset_id, Decimal(0)) for agent in agents), Decimal(0))
+                 for asset_id in market.assets}
+    return cash, positions
+
+def test_submit_batch_across_threads(check_book) :
+    serial, serial_orders = make_world(thread_safe=False)
+    expected = serial.submit_batch(serial_orders)
+
+    market, orders = make_world(thread_safe=True)
+    before = totals(market)
+    try :
+        statuses = market.submit_batch(orders)
+    finally :
+        market.close()
+
+    # every book sees its own orders in submission order, so each status is the one the order
+    # returned when run serially; resting orders may be filled later by the rest of the batch
+    assert len(statuses) == len(orders)
+    assert statuses == expected
+    assert all(order.status != OrderStatus.WAITING for order, status in zip(orders, statuses) if status != OrderStatus.WAITING)
+    assert OrderStatus.FILLED in statuses and OrderStatus.WAITING in statuses
+
+    assert totals(market) == before
+    assert len(market.history) == int(market._trades.sum()) == len(serial.history)
+    assert [float(asset.price) for asset in market.assets.values()] == [float(asset.price) for asset in serial.assets.values()]
+    for book in market.orderbook_asset_map.values() :
+        check_book(book)
@@ -0,0 +1,91 @@
+from decimal import Decimal
+from uuid import uuid4
+from generics import Asset, OrderSide
+from market import Market
+from snapshot import load_snapshot, save_snapshot
+from topofbook import TopOfBookPublisher, TopOfBookReader
+import math
+import pytest
+import topofbook
+
+@pytest.fixture
+def publisher() :
+    publisher = TopOfBookPublisher(capacity=2)
+    yield publisher
+    publisher.close()
+    publisher.unlink()
+
+@pytest.fixture
+def reader(publisher) :
+    reader = TopOfBookReader(publisher.name)
+    yield reader
+    reader.close()
+
+def test_round_trip(market, asset, agents, make_order, publisher, reader) :
+    seller, buyer = list(agents.values())[:2]
+    market.attach_publisher(publisher)
+    assert reader.asset_ids() == [asset.id]
+    empty = reader.read(asset.id)
+    assert math.isnan(empty.best_bid) and math.isnan(empty.best_ask)
+    assert empty.bid_quantity == empty.ask_quantity == 0 and empty.trades == 0
+
+    market.sell(asset, seller, make_order(OrderSide.Sell, 101, 5, seller))
+    market.buy(asset, buyer, make_order(OrderSide.Buy, 101, 2, buyer))
+    top = reader.read(asset.id)
+    assert math.isnan(top.best_bid) and top.bid_quantity == 0
+    assert (top.best_ask, top.ask_quantity) == (101.0, 3.0)
+    assert (top.last_price, top.last_quantity, top.volume, top.trades) == (101.0, 2.0, 2.0, 1)
+
+    # a row added after the reader attached is picked up on the next lookup
+    late = Asset(type="stock", id=uuid4(), price=Decimal(50), quantity=Decimal(0))
+    market.add_asset(late)
+    assert reader.read(late.id).last_price == 50.0
+    assert reader.asset_ids() == [asset.id, late.id]
+    assert list(reader.read_all()["best_ask"][:1]) == [101.0]
+    assert reader.read(uuid4()) is None
+
+def test_capacity_overflow(publisher) :
+    first, second = uuid4(), uuid4()
+    assert publisher.add_asset(first) == 0
+    assert publisher.add_asset(second) == 1
+    assert publisher.add_asset(first) == 0
+    with pytest.raises(ValueError) :
+        publisher.add_asset(uuid4())
+
+def test_reader_retries_while_row_is_written(publisher, reader, monkeypatch) :
+    asset_id = uuid4()
+    publisher.add_asset(asset_id)
+    publisher.publish(asset_id, 99.0, 1.0, 101.0, 1.0, 100.0, 1.0, 1.0, 1)
+
+    # leave the row mid-update, the reader must spin until the writer finishes it
+    row = publisher._rows[asset_id]
+    publisher._sequence[row] += 1
+    publisher._body[row] = (98.0, 2.0, 102.0, 2.0, 100.0, 1.0, 1.0, 1)
+    waits = []
+
+    def finish_write(_) :
+        waits.append(int(publisher._sequence[row]))
+        if len(waits) == 3 :
+            publisher._sequence[row] += 1
+
+    monkeypatch.setattr(topofbook.time, "sleep", finish_write)
+    top = reader.read(asset_id)
+
+    assert len(waits) == 3 and all(sequence & 1 for sequence in waits)
+    assert (top.best_bid, top.bid_quantity, top.best_ask) == (98.0, 2.0, 102.0)
+
+def test_load_snapshot_republishes(tmp_path, agents, asset, make_order, publisher, reader) :
+    saved = Market(agents, {asset.id : asset})
+    maker = next(iter(agents.values()))
+    saved.place(asset, make_order(OrderSide.Buy, 99, 4, maker))
+    saved.place(asset, make_order(OrderSide.Sell, 102, 6, maker))
+    path = tmp_path / "market.snap"
+    save_snapshot(saved, path)
+
+    market = Market(agents, {asset.id : asset})
+    market.attach_publisher(publisher)
+    assert math.isnan(reader.read(asset.id).best_bid)
+    load_snapshot(market, path)
+
+    top = reader.read(asset.id)
+    assert (top.best_bid, top.bid_quantity, top.best_ask, top.ask_quantity) == (99.0, 4.0, 102.0, 6.0)
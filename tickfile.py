@@ -0,0 +1,57 @@
+# Recorded tick files : one tick per line as `timestamp,symbol,price`
+# blank lines and lines starting with `#` are ignored
+from decimal import Decimal
+from typing import Iterable, Iterator
+from generics import Tick
+import mmap
+import os
+
+DEFAULT_CHUNK_SIZE = 1 << 22 # 4 MiB
+
+def parse_tick(line : str) -> Tick | None :
+    line = line.strip()
+    if not line or line.startswith("#") :
+        return None
+    timestamp, symbol, price = line.split(",")[:3]
+    return Tick(symbol=symbol, price=Decimal(price), timestamp=float(timestamp))
+
+def iter_tick_chunks(path : str, chunk_size : int = DEFAULT_CHUNK_SIZE) -> Iterator[list[Tick]] :
+    """
+    Memory-map a tick file and yield its ticks in batches of roughly `chunk_size` bytes.
+
+    Chunks always end on a line boundary, only one decoded chunk is alive at a time so
+    files much larger than memory stream through in bounded space.
+    """
+    if os.path.getsize(path) == 0 :
+        return
+
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm :
+        size = len(mm)
+        start = 0
+        while start < size :
+            end = min(start + chunk_size, size)
+            if end < size :
+                newline = mm.find(b"\n", end)
+                end = size if newline == -1 else newline + 1
+
+            ticks : list[Tick] = []
+            for line in mm[start:end].decode().splitlines() :
+                tick = parse_tick(line)
+                if tick is not None :
+                    ticks.append(tick)
+
+            if ticks :
+                yield ticks
+            start = end
+
+def read_ticks(path : str, chunk_size : int = DEFAULT_CHUNK_SIZE) -> Iterator[Tick] :
+    for chunk in iter_tick_chunks(path, chunk_size) :
+        yield from chunk
+
+def write_ticks(path : str, ticks : Iterable[Tick]) -> int :
+    count = 0
+    with open(path, "w") as f :
+        for tick in ticks :
+            f.write(f"{tick.timestamp},{tick.symbol},{tick.price}\n")
+            count += 1
+    return count
@@ -0,0 +1,198 @@
+# Top of book for every asset of a Market in a multiprocessing.shared_memory block, so other
+# processes (dashboards, loggers, strategies) can read it zero-copy without pickling or IPC.
+#
+# Layout (little endian) :
+#   header   MAGIC, u32 capacity, u32 assets
+#   ids      16 bytes uuid per row, `capacity` rows
+#   records  one RECORD per row : u64 sequence then the float64 / u64 fields below
+#
+# Each record is guarded by its own sequence lock. The single writer of a row makes the
+# sequence odd, writes the fields and makes it even again. Readers copy the fields between two
+# reads of the sequence and retry when it was odd or changed, which means they saw a torn write.
+# Missing prices are nan.
+from dataclasses import dataclass
+from multiprocessing import shared_memory
+from uuid import UUID
+import numpy as np
+import struct
+import time
+
+MAGIC = b"EXTOB001"
+
+_HEADER = struct.Struct("<8sII")
+_COUNT_OFFSET = 12
+_ID_SIZE = 16
+
+RECORD = np.dtype([
+    ("sequence", "<u8"),
+    ("best_bid", "<f8"),
+    ("bid_quantity", "<f8"),
+    ("best_ask", "<f8"),
+    ("ask_quantity", "<f8"),
+    ("last_price", "<f8"),
+    ("last_quantity", "<f8"),
+    ("volume", "<f8"),
+    ("trades", "<u8"),
+])
+# RECORD without its sequence, laid over the same bytes
+_BODY = np.dtype({
+    "names" : list(RECORD.names[1:]),
+    "formats" : [RECORD.fields[name][0] for name in RECORD.names[1:]],
+    "offsets" : [RECORD.fields[name][1] - 8 for name in RECORD.names[1:]],
+    "itemsize" : RECORD.itemsize - 8,
+})
+
+@dataclass
+class TopOfBook :
+    asset_id : UUID
+    best_bid : float
+    bid_quantity : float
+    best_ask : float
+    ask_quantity : float
+    last_price : float
+    last_quantity : float
+    volume : float
+    trades : int
+
+def _records_offset(capacity : int) -> int :
+    return _HEADER.size + capacity * _ID_SIZE
+
+def _views(buf, capacity : int) -> tuple[np.ndarray, np.ndarray] :
+    # the sequence column and the remaining fields of every record, both backed by `buf`
+    offset = _records_offset(capacity)
+    sequence = np.ndarray((capacity,), dtype="<u8", buffer=buf, offset=offset, strides=(RECORD.itemsize,))
+    body = np.ndarray((capacity,), dtype=_BODY, buffer=buf, offset=offset + 8, strides=(RECORD.itemsize,))
+    return sequence, body
+
+
+class TopOfBookPublisher :
+
+    """
+    TopOfBookPublisher owns the shared memory block and writes one row per asset.
+
+    Rows are fixed once the block is created, `capacity` bounds the number of assets.
+    Every row must have a single writer at a time, Market publishes a row under its book lock.
+
+    Public Methods:
+        - add_asset(asset_id): Assign the next row to asset_id and return it.
+        - publish(asset_id, ...): Write a full record for asset_id under its sequence lock.
+        - close(): Detach from the block.
+        - unlink(): Destroy the block, once every reader is done with it.
+    """
+
+    def __init__(self, capacity : int, name : str | None = None) -> None :
+        size = _records_offset(capacity) + capacity * RECORD.itemsize
+        self._shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        self.name = self._shm.name
+        self.capacity = capacity
+        self._rows : dict[UUID, int] = {}
+
+        _HEADER.pack_into(self._shm.buf, 0, MAGIC, capacity, 0)
+        self._sequence, self._body = _views(self._shm.buf, capacity)
+        self._sequence[:] = 0
+
+    def add_asset(self, asset_id : UUID) -> int :
+        row = self._rows.get(asset_id)
+        if row is not None :
+            return row
+        row = len(self._rows)
+        if row == self.capacity :
+            raise ValueError(f"Top of book block is full ({self.capacity} assets)")
+
+        nan = float("nan")
+        self._body[row] = (nan, 0.0, nan, 0.0, nan, 0.0, 0.0, 0)
+        offset = _HEADER.size + row * _ID_SIZE
+        self._shm.buf[offset:offset + _ID_SIZE] = asset_id.bytes
+        # readers only look at rows below the count, publish it last
+        struct.pack_into("<I", self._shm.buf, _COUNT_OFFSET, row + 1)
+        self._rows[asset_id] = row
+        return row
+
+    def publish(self, asset_id : UUID, best_bid : float, bid_quantity : float, best_ask : float,
+                ask_quantity : float, last_price : float, last_quantity : float, volume : float, trades : int) -> None :
+        row = self._rows[asset_id]
+        sequence = self._sequence
+        start = int(sequence[row]) + 1
+        sequence[row] = start
+        self._body[row] = (best_bid, bid_quantity, best_ask, ask_quantity, last_price, last_quantity, volume, trades)
+        sequence[row] = start + 1
+
+    def close(self) -> None :
+        # the numpy views hold exports of the buffer, drop them before closing
+        self._sequence = self._body = None
+        self._shm.close()
+
+    def unlink(self) -> None :
+        self._shm.unlink()
+
+
+class TopOfBookReader :
+
+    """
+    TopOfBookReader attaches to a block created by TopOfBookPublisher, possibly in another process.
+
+    Public Methods:
+        - asset_ids(): Assets published so far, in row order.
+        - read(asset_id): Consistent TopOfBook for one asset, None when it is not published.
+        - read_all(): Structured array with one consistent record per asset, in asset_ids() order.
+        - close(): Detach from the block.
+    """
+
+    def __init__(self, name : str) -> None :
+        self._shm = shared_memory.SharedMemory(name=name)
+        magic, capacity, _ = _HEADER.unpack_from(self._shm.buf, 0)
+        if magic != MAGIC :
+            self._shm.close()
+            raise ValueError(f"{name} is not a top of book block")
+        self.capacity = capacity
+        self._sequence, self._body = _views(self._shm.buf, capacity)
+        self._ids : list[UUID] = []
+        self._rows : dict[UUID, int] = {}
+
+    def _refresh(self) -> None :
+        count = struct.unpack_from("<I", self._shm.buf, _COUNT_OFFSET)[0]
+        buf = self._shm.buf
+        for row in range(len(self._ids), count) :
+            offset = _HEADER.size + row * _ID_SIZE
+            asset_id = UUID(bytes=bytes(buf[offset:offset + _ID_SIZE]))
+            self._ids.append(asset_id)
+            self._rows[asset_id] = row
+
+    def asset_ids(self) -> list[UUID] :
+        self._refresh()
+        return list(self._ids)
+
+    def _read_row(self, row : int) :
+        sequence = self._sequence
+        while True :
+            before = int(sequence[row])
+            if not before & 1 :
+                body = self._body[row].copy()
+                if int(sequence[row]) == before :
+                    return body
+            # the writer is mid-update, let it finish
+            time.sleep(0)
+
+    def read(self, asset_id : UUID) -> TopOfBook | None :
+        row = self._rows.get(asset_id)
+        if row is None :
+            self._refresh()
+            row = self._rows.get(asset_id)
+            if row is None :
+                return None
+        body = self._read_row(row)
+        return TopOfBook(asset_id, *(float(body[name]) for name in _BODY.names[:-1]), int(body["trades"]))
+
+    def read_all(self) -> np.ndarray :
+        self._refresh()
+        out = np.empty(len(self._ids), dtype=_BODY)
+        for row in range(len(self._ids)) :
+            out[row] = self._read_row(row)
+        return out
+
+    def close(self) -> None :
+        self._sequence = self._body = None
+        self._shm.close()
+
+
+__all__ = ["TopOfBook", "TopOfBookPublisher", "TopOfBookReader", "RECORD"]